@@ -1,5 +1,10 @@
 from django.contrib import admin
-from .models import MenuItem, Order, OrderItem, Payment, UserProfile
+from .models import MenuItem, Order, OrderItem, Payment, UserProfile, Job, UserOrderStats
+from .jobs import enqueue
+from .events import record_status_events
+from .pagination import EstimatedCountPaginator
+from .lookup import search_orders
+from .exports import ORDER_COLUMNS, PAYMENT_COLUMNS, export_response
 
 
 @admin.register(MenuItem)
@@ -29,12 +34,50 @@ class MenuItemAdmin(admin.ModelAdmin):
     )
 
 
+class LargeTableAdminMixin:
+    """Changelist settings for tables that grow to millions of rows.
+
+    Estimated counts above ADMIN_EXACT_COUNT_LIMIT, no second unfiltered
+    count, and a date hierarchy on the indexed created_at built from
+    first/last index lookups (see templatetags/bakery_admin.py). Pages are
+    kept to 50 rows: rendering the list_editable forms is the main cost
+    once the queries are indexed.
+    """
+    paginator = EstimatedCountPaginator
+    list_per_page = 50
+    show_full_result_count = False
+    date_hierarchy = 'created_at'
+    change_list_template = 'admin/bakery/large_table_change_list.html'
+
+
+class ExportActionsMixin:
+    """Actions streaming the selected rows (or every filtered row, with "Select all") as a download"""
+    export_columns = None
+    export_name = None
+    
+    def export_csv(self, request, queryset):
+        return export_response(request, queryset, self.export_columns, 'csv', self.export_name)
+    export_csv.short_description = 'Export selected as CSV'
+    
+    def export_ndjson(self, request, queryset):
+        return export_response(request, queryset, self.export_columns, 'ndjson', self.export_name)
+    export_ndjson.short_description = 'Export selected as NDJSON'
+
+
 class OrderItemInline(admin.TabularInline):
     """Inline display of order items within orders"""
     model = OrderItem
     extra = 0
+    autocomplete_fields = ['menu_item']
     readonly_fields = ['subtotal']
     fields = ['menu_item', 'quantity', 'price', 'subtotal']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('menu_item')
+    
+    def subtotal(self, obj):
+        # The blank "Add another" row has no price yet
+        return obj.subtotal if obj.price is not None else '-'
 
 
 class PaymentInline(admin.StackedInline):
@@ -54,12 +97,15 @@ class PaymentInline(admin.StackedInline):
 
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(LargeTableAdminMixin, ExportActionsMixin, admin.ModelAdmin):
     """Admin interface for Orders with comprehensive tracking"""
     list_display = ['order_id', 'user', 'status', 'total_amount', 'delivery_fee', 
                     'grand_total', 'created_at']
+    list_select_related = ['user']
+    raw_id_fields = ['user']
     list_filter = ['status', 'created_at', 'confirmed_at', 'delivered_at']
-    search_fields = ['order_id', 'user__username', 'user__email', 'delivery_phone']
+    # Searched through the OrderLookup index (usernames are the emails)
+    search_fields = ['order_id', 'user__email', 'delivery_phone', 'payment__transaction_id']
     list_editable = ['status']
     ordering = ['-created_at']
     readonly_fields = ['order_id', 'grand_total', 'created_at', 'updated_at', 
@@ -83,43 +129,61 @@ class OrderAdmin(admin.ModelAdmin):
     )
     
     actions = ['mark_as_confirmed', 'mark_as_preparing', 'mark_as_ready', 
-               'mark_as_delivered', 'mark_as_cancelled']
+               'mark_as_delivered', 'mark_as_cancelled', 'export_csv', 'export_ndjson']
+    export_columns = ORDER_COLUMNS
+    export_name = 'orders'
+    
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return search_orders(queryset, search_term), False
+    
+    def save_model(self, request, obj, form, change):
+        """Stream status edits from the change form and the list_editable column"""
+        super().save_model(request, obj, form, change)
+        if change and 'status' in form.changed_data:
+            record_status_events([obj])
+    
+    def queue_status_update(self, request, queryset, new_status):
+        """Hand the status change to a background job so the changelist returns at once"""
+        order_ids = list(queryset.values_list('id', flat=True))
+        if enqueue('update_order_status', order_ids=order_ids, status=new_status):
+            self.message_user(request, f'{len(order_ids)} orders queued to be marked as {new_status}')
+        else:
+            self.message_user(request, f'{len(order_ids)} orders marked as {new_status}')
     
     def mark_as_confirmed(self, request, queryset):
-        from django.utils import timezone
-        updated = queryset.update(status='confirmed', confirmed_at=timezone.now())
-        self.message_user(request, f'{updated} orders marked as confirmed')
+        self.queue_status_update(request, queryset, 'confirmed')
     mark_as_confirmed.short_description = 'Mark selected orders as Confirmed'
     
     def mark_as_preparing(self, request, queryset):
-        updated = queryset.update(status='preparing')
-        self.message_user(request, f'{updated} orders marked as preparing')
+        self.queue_status_update(request, queryset, 'preparing')
     mark_as_preparing.short_description = 'Mark selected orders as Preparing'
     
     def mark_as_ready(self, request, queryset):
-        updated = queryset.update(status='ready')
-        self.message_user(request, f'{updated} orders marked as ready')
+        self.queue_status_update(request, queryset, 'ready')
     mark_as_ready.short_description = 'Mark selected orders as Ready'
     
     def mark_as_delivered(self, request, queryset):
-        from django.utils import timezone
-        updated = queryset.update(status='delivered', delivered_at=timezone.now())
-        self.message_user(request, f'{updated} orders marked as delivered')
+        self.queue_status_update(request, queryset, 'delivered')
     mark_as_delivered.short_description = 'Mark selected orders as Delivered'
     
     def mark_as_cancelled(self, request, queryset):
-        updated = queryset.update(status='cancelled')
-        self.message_user(request, f'{updated} orders marked as cancelled')
+        self.queue_status_update(request, queryset, 'cancelled')
     mark_as_cancelled.short_description = 'Mark selected orders as Cancelled'
 
 
 @admin.register(Payment)
-class PaymentAdmin(admin.ModelAdmin):
+class PaymentAdmin(LargeTableAdminMixin, ExportActionsMixin, admin.ModelAdmin):
     """Admin interface for Payment management"""
     list_display = ['transaction_id', 'order', 'payment_method', 'payment_status', 
                     'amount', 'has_screenshot', 'created_at']
+    # Order.__str__ includes the customer's username
+    list_select_related = ['order__user']
+    raw_id_fields = ['order']
     list_filter = ['payment_method', 'payment_status', 'created_at', 'paid_at']
-    search_fields = ['transaction_id', 'order__order_id', 'upi_id']
+    # Searched through the OrderLookup index
+    search_fields = ['transaction_id', 'upi_id', 'order__order_id', 'order__user__email', 'order__delivery_phone']
     list_editable = ['payment_status']
     ordering = ['-created_at']
     readonly_fields = ['transaction_id', 'created_at', 'updated_at', 'paid_at', 'payment_screenshot_preview']
@@ -140,7 +204,14 @@ class PaymentAdmin(admin.ModelAdmin):
         }),
     )
     
-    actions = ['mark_as_completed', 'mark_as_failed', 'mark_as_refunded']
+    actions = ['mark_as_completed', 'mark_as_failed', 'mark_as_refunded', 'export_csv', 'export_ndjson']
+    export_columns = PAYMENT_COLUMNS
+    export_name = 'payments'
+    
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return search_orders(queryset, search_term, field='order_id'), False
     
     def has_screenshot(self, obj):
         return bool(obj.payment_screenshot)
@@ -154,20 +225,24 @@ class PaymentAdmin(admin.ModelAdmin):
     payment_screenshot_preview.allow_tags = True
     payment_screenshot_preview.short_description = 'Screenshot Preview'
     
+    def queue_status_update(self, request, queryset, new_status):
+        """Hand the status change to a background job so the changelist returns at once"""
+        payment_ids = list(queryset.values_list('id', flat=True))
+        if enqueue('update_payment_status', payment_ids=payment_ids, status=new_status):
+            self.message_user(request, f'{len(payment_ids)} payments queued to be marked as {new_status}')
+        else:
+            self.message_user(request, f'{len(payment_ids)} payments marked as {new_status}')
+    
     def mark_as_completed(self, request, queryset):
-        from django.utils import timezone
-        updated = queryset.update(payment_status='completed', paid_at=timezone.now())
-        self.message_user(request, f'{updated} payments marked as completed')
+        self.queue_status_update(request, queryset, 'completed')
     mark_as_completed.short_description = 'Mark selected payments as Completed'
     
     def mark_as_failed(self, request, queryset):
-        updated = queryset.update(payment_status='failed')
-        self.message_user(request, f'{updated} payments marked as failed')
+        self.queue_status_update(request, queryset, 'failed')
     mark_as_failed.short_description = 'Mark selected payments as Failed'
     
     def mark_as_refunded(self, request, queryset):
-        updated = queryset.update(payment_status='refunded')
-        self.message_user(request, f'{updated} payments marked as refunded')
+        self.queue_status_update(request, queryset, 'refunded')
     mark_as_refunded.short_description = 'Mark selected payments as Refunded'
 
 
@@ -178,6 +253,8 @@ class UserProfileAdmin(admin.ModelAdmin):
     list_filter = ['city', 'state', 'created_at']
     search_fields = ['user__username', 'user__email', 'phone', 'city']
     ordering = ['-created_at']
+    list_select_related = ['user']
+    raw_id_fields = ['user']
     readonly_fields = ['created_at', 'updated_at']
     
     fieldsets = (
@@ -195,3 +272,26 @@ class UserProfileAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """Admin interface for background jobs"""
+    list_display = ['name', 'status', 'attempts', 'run_at', 'duration_ms', 'created_at']
+    list_filter = ['status', 'name']
+    ordering = ['-created_at']
+    readonly_fields = ['created_at', 'started_at', 'finished_at', 'duration_ms', 'locked_by', 'last_error']
+
+
+@admin.register(UserOrderStats)
+class UserOrderStatsAdmin(admin.ModelAdmin):
+    """Read-only view of per-user order counters (rebuild with manage.py rebuild_order_stats)"""
+    list_display = ['user', 'total_orders', 'pending_orders', 'completed_orders',
+                    'cancelled_orders', 'total_spent', 'updated_at']
+    search_fields = ['user__username', 'user__email']
+    ordering = ['-total_spent']
+    list_select_related = ['user']
+    readonly_fields = list_display
+    
+    def has_add_permission(self, request):
+        return False
@@ -2,6 +2,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from . import api_views 
 from .views import upi_payment_view 
+from .async_api import async_get_view
 
 # Create router and register viewsets
 router = DefaultRouter()
@@ -21,9 +22,18 @@ urlpatterns = [
     path('auth/login/', api_views.login_api, name='api_login'),
     path('auth/logout/', api_views.logout_api, name='api_logout'),
     path('auth/user/', api_views.current_user_api, name='api_current_user'),
+    path('auth/cache-stats/', api_views.auth_cache_stats_api, name='api_auth_cache_stats'),
+    path('db/pool-stats/', api_views.db_pool_stats_api, name='api_db_pool_stats'),
+    
+    # Cart
+    path('cart/quote/', api_views.cart_quote_api, name='api_cart_quote'),
     
     # Dashboard
-    path('dashboard/stats/', api_views.dashboard_stats_api, name='api_dashboard_stats'),
+    path('dashboard/stats/', async_get_view(api_views.dashboard_stats_api, api_views.adashboard_stats),
+         name='api_dashboard_stats'),
+    
+    # Reports
+    path('reports/sales/', api_views.sales_report_api, name='api_sales_report'),
 
     path('dashboard/upi-payments/', upi_payment_view, name='upi-payment'),
 ]
@@ -1,16 +1,36 @@
+import os
+
 from rest_framework import viewsets, status, filters, mixins, generics
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.authtoken.models import Token
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth import authenticate
-from django.db.models import Q, Sum, Count
+from django.contrib.auth.models import User
 from django.utils import timezone
 from .models import MenuItem, Order, Payment, UserProfile
+from .pagination import KeysetPagination
+from .idempotency import idempotent
+from .events import record_status_events
+from .cache import (
+    acatalog_cache_key, aget_cached, aset_cached, catalog_cache_key, etag_matches, get_cached, set_cached
+)
+from .search import get_search_backend
+from .lookup import search_orders
+from .exports import EXPORT_FORMATS, ORDER_COLUMNS, PAYMENT_COLUMNS, export_response, filter_export
 from .serializers import (
     MenuItemSerializer, OrderSerializer, PaymentSerializer, UserProfileSerializer,
-    UserSerializer, UserRegistrationSerializer, OrderCreateSerializer, PaymentCreateSerializer
+    UserSerializer, UserRegistrationSerializer, OrderCreateSerializer, PaymentCreateSerializer,
+    CartQuoteSerializer, UserOrderStatsSerializer, SalesReportQuerySerializer
 )
+from .stats import aget_user_stats, get_user_stats
+from .rollups import sales_report
+from .order_rows import aserialize_orders, order_values, serialize_orders
+from .auth_cache import auth_cache_stats, get_profile
+from .db_pool import pool_stats
+from .async_api import AsyncReadMixin
 
 
 # Base Mixins for common functionality
@@ -42,9 +62,84 @@ class StatusUpdateMixin:
         return instance
 
 
+class CatalogCacheMixin:
+    """Mixin to serve public catalog reads from the versioned menu cache"""
+    
+    def cached_response(self, request, build_response):
+        """Return a cached response with a strong ETag, building it on a miss"""
+        # Staff see unavailable items too, so they always bypass the shared cache
+        if request.user.is_staff:
+            return build_response()
+        
+        key = catalog_cache_key(self.action, request)
+        entry = get_cached(key)
+        if entry is None:
+            response = build_response()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            entry = set_cached(key, response.data)
+        return self.entry_response(request, entry)
+    
+    async def acached_response(self, request, build_response):
+        """cached_response() for a coroutine build_response"""
+        if request.user.is_staff:
+            return await build_response()
+        
+        key = await acatalog_cache_key(self.action, request)
+        entry = await aget_cached(key)
+        if entry is None:
+            response = await build_response()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            entry = await aset_cached(key, response.data)
+        return self.entry_response(request, entry)
+    
+    def entry_response(self, request, entry):
+        """200 with the cached data, or 304 if the client already has it"""
+        etag, data = entry
+        if etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        return Response(data, headers={'ETag': etag})
+
+
+class ExportMixin:
+    """Mixin adding a streaming CSV/NDJSON export (admin only)"""
+    export_columns = None
+    export_status_field = 'status'
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def export(self, request):
+        """Stream every matching row; ?type=csv|ndjson&status=&since=&until="""
+        export_format = request.query_params.get('type', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return Response({'error': f"type must be one of {', '.join(EXPORT_FORMATS)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            queryset = filter_export(self.queryset.model.objects.all(), request.query_params,
+                                     self.export_status_field)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return export_response(request, queryset, self.export_columns, export_format, self.basename + 's')
+
+
+class MenuSearchFilter(filters.SearchFilter):
+    """Search filter backed by the database full-text index, ranked by relevance"""
+    
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        if not query.strip():
+            return queryset
+        
+        backend = get_search_backend()
+        queryset = backend.search(queryset, query)
+        
+        # Rank by relevance unless the client asked for an explicit ordering
+        if backend.rank_ordering and not request.query_params.get('ordering'):
+            queryset = queryset.order_by(backend.rank_ordering, 'name')
+        return queryset
 
 
-class MenuItemViewSet(viewsets.ModelViewSet):
+class MenuItemViewSet(AsyncReadMixin, CatalogCacheMixin, viewsets.ModelViewSet):
     """
     ViewSet for Menu Items with full CRUD operations
     - List/Retrieve: Available to all users
@@ -52,10 +147,11 @@ class MenuItemViewSet(viewsets.ModelViewSet):
     """
     queryset = MenuItem.objects.all()
     serializer_class = MenuItemSerializer
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [filters.OrderingFilter, MenuSearchFilter]
     search_fields = ['name', 'description', 'category']
     ordering_fields = ['name', 'price', 'created_at']
     ordering = ['category', 'name']
+    async_actions = {'list': 'alist', 'retrieve': 'aretrieve', 'categories': 'acategories'}
     
     def get_permissions(self):
         """Allow read operations for all, write operations for admin only"""
@@ -77,11 +173,38 @@ class MenuItemViewSet(viewsets.ModelViewSet):
         
         return queryset
     
+    async def afilter_queryset(self, queryset):
+        # Picking the search backend may query the database (once per process)
+        if self.request.query_params.get('search', '').strip():
+            await sync_to_async(get_search_backend)()
+        return self.filter_queryset(queryset)
+    
+    def list(self, request, *args, **kwargs):
+        """List menu items, served from the catalog cache"""
+        return self.cached_response(request, lambda: super(MenuItemViewSet, self).list(request, *args, **kwargs))
+    
+    async def alist(self, request, *args, **kwargs):
+        async def build_response():
+            items = [item async for item in await self.afilter_queryset(self.get_queryset())]
+            return Response(self.get_serializer(items, many=True).data)
+        return await self.acached_response(request, build_response)
+    
+    async def aretrieve(self, request, *args, **kwargs):
+        return Response(self.get_serializer(await self.aget_object()).data)
+    
     @action(detail=False, methods=['get'])
     def categories(self, request):
         """Get list of available categories"""
-        categories = self.get_queryset().values_list('category', flat=True).distinct()
-        return Response({'categories': list(categories)})
+        def build_response():
+            categories = self.get_queryset().values_list('category', flat=True).distinct()
+            return Response({'categories': list(categories)})
+        return self.cached_response(request, build_response)
+    
+    async def acategories(self, request):
+        async def build_response():
+            categories = self.get_queryset().values_list('category', flat=True).distinct()
+            return Response({'categories': [category async for category in categories]})
+        return await self.acached_response(request, build_response)
     
     @action(detail=True, methods=['patch'], permission_classes=[IsAdminUser])
     def toggle_availability(self, request, pk=None):
@@ -92,14 +215,17 @@ class MenuItemViewSet(viewsets.ModelViewSet):
         return Response({'id': item.id, 'name': item.name, 'available': item.available})
 
 
-class OrderViewSet(UserFilteredQuerySetMixin, StatusUpdateMixin, viewsets.ModelViewSet):
+class OrderViewSet(AsyncReadMixin, UserFilteredQuerySetMixin, StatusUpdateMixin, ExportMixin, viewsets.ModelViewSet):
     """ViewSet for Orders with tracking and management"""
     queryset = Order.objects.select_related('user', 'payment').prefetch_related('items__menu_item')
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
     filter_backends = [filters.OrderingFilter]
     ordering_fields = ['created_at', 'total_amount', 'status']
     ordering = ['-created_at']
+    export_columns = ORDER_COLUMNS
+    async_actions = {'current': 'acurrent', 'history': 'ahistory'}
     
     def get_queryset(self):
         """Filter by status if provided"""
@@ -113,6 +239,7 @@ class OrderViewSet(UserFilteredQuerySetMixin, StatusUpdateMixin, viewsets.ModelV
         """Use different serializer for create action"""
         return OrderCreateSerializer if self.action == 'create' else OrderSerializer
     
+    @idempotent
     def create(self, request):
         """Create new order with items and payment"""
         serializer = self.get_serializer(data=request.data, context={'request': request})
@@ -132,6 +259,7 @@ class OrderViewSet(UserFilteredQuerySetMixin, StatusUpdateMixin, viewsets.ModelV
             )
         
         self.perform_status_update(order, 'cancelled')
+        record_status_events([order])
         
         # Update payment status if exists
         if hasattr(order, 'payment'):
@@ -157,37 +285,73 @@ class OrderViewSet(UserFilteredQuerySetMixin, StatusUpdateMixin, viewsets.ModelV
                          'delivered_at' if new_status == 'delivered' else None
         
         self.perform_status_update(order, new_status, timestamp_field)
+        record_status_events([order])
         
         return Response({
             'message': 'Order status updated',
             'order': self.get_serializer(order).data
         })
     
+    def paginated_response(self, queryset):
+        """Serialize one keyset page of the queryset from rows, as OrderSerializer would (see order_rows.py)"""
+        page = self.paginate_queryset(order_values(queryset))
+        return self.get_paginated_response(serialize_orders(page))
+    
+    async def apaginated_response(self, queryset):
+        page = await self.paginator.apaginate_queryset(order_values(queryset), self.request, view=self)
+        return self.get_paginated_response(await aserialize_orders(page))
+    
     @action(detail=False, methods=['get'])
     def current(self, request):
         """Get current active orders"""
-        orders = self.get_queryset().filter(status__in=['pending', 'confirmed', 'preparing', 'ready'])
-        return Response(self.get_serializer(orders, many=True).data)
+        orders = self.get_queryset().filter(status__in=Order.ACTIVE_STATUSES)
+        return self.paginated_response(orders)
+    
+    async def acurrent(self, request):
+        return await self.apaginated_response(self.get_queryset().filter(status__in=Order.ACTIVE_STATUSES))
     
     @action(detail=False, methods=['get'])
     def history(self, request):
         """Get order history (delivered/cancelled)"""
-        orders = self.get_queryset().filter(status__in=['delivered', 'cancelled'])
-        return Response(self.get_serializer(orders, many=True).data)
+        orders = self.get_queryset().filter(status__in=Order.HISTORY_STATUSES)
+        return self.paginated_response(orders)
+    
+    async def ahistory(self, request):
+        return await self.apaginated_response(self.get_queryset().filter(status__in=Order.HISTORY_STATUSES))
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def lookup(self, request):
+        """Find orders by order id, customer email, phone, or transaction/UPI id (admin only)"""
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+        return self.paginated_response(search_orders(self.get_queryset(), query))
 
 
-class PaymentViewSet(UserFilteredQuerySetMixin, viewsets.ModelViewSet):
+class PaymentViewSet(UserFilteredQuerySetMixin, ExportMixin, viewsets.ModelViewSet):
     """ViewSet for Payment management"""
     queryset = Payment.objects.select_related('order', 'order__user')
     serializer_class = PaymentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
     basename = 'payment'
+    export_columns = PAYMENT_COLUMNS
+    export_status_field = 'payment_status'
+    
+    def get_queryset(self):
+        """Filter by payment status if provided"""
+        queryset = super().get_queryset()
+        status_filter = self.request.query_params.get('status')
+        if status_filter:
+            queryset = queryset.filter(payment_status=status_filter)
+        return queryset
     
     def get_serializer_class(self):
         """Use different serializer for create action"""
         return PaymentCreateSerializer if self.action == 'process' else PaymentSerializer
     
     @action(detail=False, methods=['post'])
+    @idempotent
     def process(self, request):
         """Process a payment for an order"""
         serializer = self.get_serializer(data=request.data, context={'request': request})
@@ -217,12 +381,11 @@ class UserProfileViewSet(UserFilteredQuerySetMixin, mixins.RetrieveModelMixin,
     @action(detail=False, methods=['get', 'put', 'patch'])
     def me(self, request):
         """Get or update current user's profile"""
-        profile, _ = UserProfile.objects.get_or_create(user=request.user)
-        
         if request.method == 'GET':
-            return Response(self.get_serializer(profile).data)
+            return Response(self.get_serializer(get_profile(request.user)).data)
         
-        # PUT or PATCH
+        # PUT or PATCH: update the stored row, as the cached copy may be stale
+        profile, _ = UserProfile.objects.get_or_create(user=request.user)
         serializer = self.get_serializer(profile, data=request.data, partial=request.method == 'PATCH')
         serializer.is_valid(raise_exception=True)
         serializer.save()
@@ -279,15 +442,31 @@ def logout_api(request):
         return Response({'error': 'Logout failed'}, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def auth_cache_stats_api(request):
+    """Authentication cache hit rates of the worker answering (admin only)"""
+    return Response({'pid': os.getpid(), 'timeout': settings.AUTH_CACHE_TIMEOUT, **auth_cache_stats()})
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def db_pool_stats_api(request):
+    """Database pool size, checkouts and wait times of the worker answering (admin only)"""
+    return Response({'enabled': settings.DB_POOL, **pool_stats()})
+
+
 @api_view(['GET', 'PUT', 'PATCH'])
 @permission_classes([IsAuthenticated])
 def current_user_api(request):
     """Get or update current user information"""
     if request.method == 'GET':
+        request.user.profile = get_profile(request.user)
         return Response(UserSerializer(request.user).data)
     
-    # PUT or PATCH
-    serializer = UserSerializer(request.user, data=request.data, partial=request.method == 'PATCH')
+    # PUT or PATCH: update the stored row, as the cached user may be stale
+    user = User.objects.get(pk=request.user.pk)
+    serializer = UserSerializer(user, data=request.data, partial=request.method == 'PATCH')
     serializer.is_valid(raise_exception=True)
     serializer.save()
     return Response(serializer.data)
@@ -297,20 +476,38 @@ def current_user_api(request):
 @permission_classes([IsAuthenticated])
 def dashboard_stats_api(request):
     """Get dashboard statistics for current user"""
-    orders = Order.objects.filter(user=request.user)
-    
-    # Use aggregation for better performance
-    stats_data = orders.aggregate(
-        total_orders=Count('id'),
-        pending_orders=Count('id', filter=Q(status='pending')),
-        completed_orders=Count('id', filter=Q(status='delivered')),
-        cancelled_orders=Count('id', filter=Q(status='cancelled')),
-        total_spent=Sum('grand_total', filter=Q(status='delivered')) or 0
-    )
+    # Counters are maintained incrementally, so this is one primary key lookup
+    stats_data = UserOrderStatsSerializer(get_user_stats(request.user)).data
     
     # Add recent orders
-    recent_orders = orders.select_related('payment').prefetch_related('items__menu_item')[:5]
-    stats_data['recent_orders'] = OrderSerializer(recent_orders, many=True).data
+    orders = Order.objects.filter(user=request.user)
+    stats_data['recent_orders'] = serialize_orders(order_values(orders)[:5])
     
     return Response(stats_data)
 
+
+async def adashboard_stats(request):
+    """dashboard_stats_api's GET with the async ORM"""
+    stats_data = UserOrderStatsSerializer(await aget_user_stats(request.user)).data
+    orders = Order.objects.filter(user=request.user)
+    stats_data['recent_orders'] = await aserialize_orders(order_values(orders)[:5])
+    return Response(stats_data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def sales_report_api(request):
+    """Revenue and units by day, category or menu item (admin only)"""
+    # Read from the rollup tables kept by refresh_sales_rollups, never from OrderItem
+    query = SalesReportQuerySerializer(data=request.query_params)
+    query.is_valid(raise_exception=True)
+    return Response(sales_report(**query.validated_data))
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def cart_quote_api(request):
+    """Price a cart server-side (subtotal, delivery fee, grand total)"""
+    serializer = CartQuoteSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    return Response(serializer.validated_data['quote'].as_dict())
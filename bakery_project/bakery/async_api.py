@@ -0,0 +1,121 @@
+"""
+Async-native GET handlers for the read-heavy API endpoints.
+
+DRF views are synchronous, so under an ASGI server Django runs each of
+them on a thread and a slow client holds that thread for as long as it
+takes to send its request and read the response. The menu, current and
+history orders, and dashboard endpoints also have coroutine twins
+(alist, acurrent, adashboard_stats, ...) that query with the async ORM, so
+their GETs run on the event loop.
+
+With ASYNC_API on (off unless set, and only for ASGI servers), the router
+gets an async view for every URL whose GET action has a twin. Other methods
+on the same URL (POST, PATCH, ...) still run the usual sync action, in a
+thread. Under WSGI the setting stays off and the URLs get the plain sync
+views, so no event loop is started per request.
+
+The twins only stay on the event loop if every middleware can run async;
+one sync-only middleware makes Django run the whole stack below it
+through async_to_sync. WhiteNoise and the snapshot middleware therefore
+use the dual-mode classes in bakery/middleware.py.
+
+Authentication is the one step that stays synchronous: DRF's
+authenticators and Django's session user are sync, so they run in a
+thread (most requests are answered from the auth cache there). Everything
+else in initial() (content negotiation, permissions) is in memory.
+"""
+from functools import update_wrapper
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from django.utils.decorators import classonlymethod
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+def async_api_enabled():
+    return getattr(settings, 'ASYNC_API', False)
+
+
+class AsyncDispatchMixin:
+    """APIView.dispatch() for a coroutine handler"""
+
+    async def async_dispatch(self, request, handler, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.perform_authentication)(request)
+            self.initial(request, *args, **kwargs)
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+class AsyncReadMixin(AsyncDispatchMixin):
+    """Viewset mixin routing GETs to coroutine twins of the actions (see async_actions)"""
+    # Sync action name -> name of its coroutine twin
+    async_actions = {}
+
+    @classonlymethod
+    def as_view(cls, actions=None, **initkwargs):
+        view = super().as_view(actions, **initkwargs)
+        twin = cls.async_actions.get((actions or {}).get('get'))
+        if twin is None or not async_api_enabled():
+            return view
+
+        sync_view = sync_to_async(view)
+        action_map = {**actions, 'head': actions.get('head', actions['get'])}
+
+        async def async_view(request, *args, **kwargs):
+            if request.method not in SAFE_METHODS:
+                return await sync_view(request, *args, **kwargs)
+            self = cls(**initkwargs)
+            self.action_map = action_map
+            self.request = request
+            self.args = args
+            self.kwargs = kwargs
+            return await self.async_dispatch(request, getattr(self, twin), *args, **kwargs)
+
+        # cls, initkwargs, actions and csrf_exempt, as the router and DRF expect
+        return update_wrapper(async_view, view)
+
+    async def afilter_queryset(self, queryset):
+        return self.filter_queryset(queryset)
+
+    async def aget_object(self):
+        """get_object() with the async ORM"""
+        queryset = await self.afilter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await queryset.aget(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except queryset.model.DoesNotExist:
+            raise Http404(f'No {queryset.model._meta.object_name} matches the given query.')
+        except (TypeError, ValueError, ValidationError):
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+
+def async_get_view(sync_view, handler):
+    """The @api_view function view sync_view, with GETs served by the coroutine handler(request)"""
+    if not async_api_enabled():
+        return sync_view
+
+    view_class = type(sync_view.cls.__name__, (AsyncDispatchMixin, sync_view.cls), {})
+    sync_fallback = sync_to_async(sync_view)
+
+    async def async_view(request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            return await sync_fallback(request, *args, **kwargs)
+        return await view_class(**sync_view.initkwargs).async_dispatch(request, handler, *args, **kwargs)
+
+    return update_wrapper(async_view, sync_view)
@@ -0,0 +1,154 @@
+"""
+Per-worker cache for the authentication hot path.
+
+Every authenticated API call resolves its credentials to a user: a Token
+row joined to auth_user for token auth, or a django_session row and then
+an auth_user row for session auth, and the profile endpoints add a
+UserProfile lookup on top. These rows change rarely, so each worker keeps
+them for AUTH_CACHE_TIMEOUT seconds in the process-local 'auth' cache:
+
+- token key -> (user id, created)    CachedTokenAuthentication
+- session key -> session data        SessionStore (the SESSION_ENGINE)
+- user id -> user                    CachedModelBackend.get_user()
+- user id -> profile                 get_profile()
+
+Entries are dropped in the worker that makes a change (signals.py): logout
+deletes the token or the session, and password, staff and active flag
+changes all save the user. Other workers keep what they cached until it
+expires, so a revoked token or session can still be used on another worker
+for up to AUTH_CACHE_TIMEOUT seconds; keep it short. QuerySet.update()
+sends no signals and is likewise only covered by the timeout.
+
+Hits and misses are counted per worker; see auth_cache_stats().
+"""
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.sessions.backends import db
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .models import UserProfile
+
+AUTH_CACHE = 'auth'
+KINDS = ['token', 'session', 'user', 'profile']
+
+_counts = Counter()
+_counts_lock = threading.Lock()
+
+
+def cached(kind, key, load):
+    """The cached value for kind:key, calling load() on a miss (None results are not cached)"""
+    value = caches[AUTH_CACHE].get(f'{kind}:{key}')
+    with _counts_lock:
+        _counts[kind, value is not None] += 1
+    if value is None:
+        value = load()
+        if value is not None:
+            prime(kind, key, value)
+    return value
+
+
+def prime(kind, key, value):
+    caches[AUTH_CACHE].set(f'{kind}:{key}', value, getattr(settings, 'AUTH_CACHE_TIMEOUT', 30))
+
+
+def invalidate(kind, key):
+    caches[AUTH_CACHE].delete(f'{kind}:{key}')
+
+
+def user_changed(user_id):
+    """Drop a user and their profile (which is cached with the user attached)"""
+    invalidate('user', user_id)
+    invalidate('profile', user_id)
+
+
+def auth_cache_stats():
+    """This worker's hits, misses and hit rate per kind of lookup"""
+    with _counts_lock:
+        counts = _counts.copy()
+    stats = {}
+    for kind in KINDS:
+        hits, misses = counts[kind, True], counts[kind, False]
+        stats[kind] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 3) if hits + misses else None,
+        }
+    return stats
+
+
+def reset_auth_cache_stats():
+    with _counts_lock:
+        _counts.clear()
+
+
+def get_cached_user(user_id):
+    """The active user with this id, or None"""
+    return cached('user', user_id, lambda: ModelBackend().get_user(user_id))
+
+
+def get_profile(user):
+    """The user's UserProfile, created on first use"""
+    profile = cached('profile', user.pk, lambda: UserProfile.objects.get_or_create(user=user)[0])
+    profile.user = user
+    return profile
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend whose get_user() (every session request) reads the auth cache"""
+
+    def get_user(self, user_id):
+        return get_cached_user(user_id)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication with token -> user served from the auth cache"""
+
+    def authenticate_credentials(self, key):
+        loaded = {}
+
+        def load_token():
+            # One query for the token and its user on a miss, as TokenAuthentication does
+            token = Token.objects.select_related('user').filter(key=key).first()
+            if token is None:
+                return None
+            loaded['user'] = token.user
+            if token.user.is_active:
+                prime('user', token.user_id, token.user)
+            return token.user_id, token.created
+
+        entry = cached('token', key, load_token)
+        if entry is None:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        user_id, created = entry
+        user = loaded['user'] if 'user' in loaded else get_cached_user(user_id)
+        if user is None or not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        # request.auth; enough for logout to delete it (the key is the primary key)
+        return user, Token(key=key, user=user, created=created)
+
+
+class SessionStore(db.SessionStore):
+    """Database sessions whose loads are served from the auth cache"""
+
+    def load(self):
+        if not self.session_key:
+            return super().load()
+        # Missing or expired sessions come back empty and are not cached
+        return cached('session', self.session_key, lambda: db.SessionStore.load(self) or None) or {}
+
+    def save(self, must_create=False):
+        super().save(must_create)
+        invalidate('session', self.session_key)
+
+    def delete(self, session_key=None):
+        session_key = session_key or self.session_key
+        super().delete(session_key)
+        if session_key:
+            invalidate('session', session_key)
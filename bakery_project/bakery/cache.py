@@ -0,0 +1,95 @@
+"""
+Versioned response cache for the public menu API.
+
+Every cached menu response is keyed by the current catalog version. Any change
+to a MenuItem bumps the version, so all category/search variants cached under
+the old version stop being read at once and simply age out of the cache.
+"""
+import hashlib
+import json
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+CATALOG_VERSION_KEY = 'menu:catalog_version'
+
+
+def get_catalog_version():
+    """Return the current catalog version, initialising it if missing"""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Seed from the clock so a version evicted from the cache can never
+        # come back as a number that still has entries cached under it.
+        cache.add(CATALOG_VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+async def aget_catalog_version():
+    version = await cache.aget(CATALOG_VERSION_KEY)
+    if version is None:
+        await cache.aadd(CATALOG_VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = await cache.aget(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    """Invalidate every cached menu response"""
+    try:
+        return cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        return get_catalog_version()
+
+
+def request_digest(view_name, request):
+    params = urlencode(sorted(request.query_params.lists()), doseq=True)
+    fmt = getattr(request.accepted_renderer, 'format', '')
+    return hashlib.md5(f'{view_name}|{fmt}|{params}'.encode()).hexdigest()
+
+
+def catalog_cache_key(view_name, request):
+    """Build the cache key for a menu view, its query params and output format"""
+    return f'menu:{get_catalog_version()}:{request_digest(view_name, request)}'
+
+
+async def acatalog_cache_key(view_name, request):
+    return f'menu:{await aget_catalog_version()}:{request_digest(view_name, request)}'
+
+
+def make_etag(data):
+    """Strong ETag for a response payload"""
+    payload = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True).encode()
+    return '"%s"' % hashlib.sha1(payload).hexdigest()
+
+
+def etag_matches(request, etag):
+    """Check the request's If-None-Match header against an ETag"""
+    header = request.headers.get('If-None-Match', '')
+    if header.strip() == '*':
+        return True
+    return etag in [tag.strip() for tag in header.split(',')]
+
+
+def get_cached(key):
+    """Return (etag, data) for a cached response, or None"""
+    return cache.get(key)
+
+
+async def aget_cached(key):
+    return await cache.aget(key)
+
+
+def set_cached(key, data):
+    """Store response data and return its (etag, data) entry"""
+    entry = (make_etag(data), data)
+    cache.set(key, entry, getattr(settings, 'MENU_CACHE_TIMEOUT', 300))
+    return entry
+
+
+async def aset_cached(key, data):
+    entry = (make_etag(data), data)
+    await cache.aset(key, entry, getattr(settings, 'MENU_CACHE_TIMEOUT', 300))
+    return entry
@@ -0,0 +1,66 @@
+"""
+Checkout write path shared by the web checkout and the orders API.
+
+The order, its items and its payment are written in one transaction: either
+all rows exist or none do, and the whole checkout pays for a single commit.
+With a priced quote in hand the write path is exactly three INSERTs (order,
+one multi-row insert for the items, payment), and ids come back through
+RETURNING on backends that support it (Postgres, SQLite 3.35+) instead of
+separate lookups. The staff OrderLookup row is written once, after the
+payment, rather than by each row's post_save signal.
+"""
+import uuid
+
+from django.db import transaction
+
+from .lookup import defer_lookup_writes, save_order_lookup
+from .models import Order, OrderItem, Payment
+
+
+def new_order_id():
+    return f"ORD-{uuid.uuid4().hex[:8].upper()}"
+
+
+def new_transaction_id():
+    return f"TXN-{uuid.uuid4().hex[:12].upper()}"
+
+
+def place_order(user, quote, delivery_address='', delivery_phone='', delivery_notes='',
+                payment_method='cod', upi_id='', payment_screenshot=None):
+    """Create an order with its items and (unless COD) its payment, atomically"""
+    payment = None
+    with transaction.atomic(), defer_lookup_writes():
+        order = Order.objects.create(
+            user=user,
+            order_id=new_order_id(),
+            status='pending',
+            total_amount=quote.subtotal,
+            delivery_fee=quote.delivery_fee,
+            delivery_address=delivery_address,
+            delivery_phone=delivery_phone,
+            delivery_notes=delivery_notes
+        )
+
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                menu_item=line['menu_item'],
+                quantity=line['quantity'],
+                price=line['price']
+            ) for line in quote.lines
+        ])
+
+        if payment_method != 'cod':
+            payment = Payment.objects.create(
+                order=order,
+                payment_method=payment_method,
+                payment_status='pending',
+                transaction_id=new_transaction_id(),
+                amount=order.grand_total,
+                upi_id=upi_id,
+                payment_screenshot=payment_screenshot
+            )
+
+        save_order_lookup(order, payment)
+
+    return order
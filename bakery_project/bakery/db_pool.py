@@ -0,0 +1,277 @@
+"""
+Per-worker PostgreSQL connection pool.
+
+Django opens one connection per thread and keeps it for CONN_MAX_AGE, so a
+worker holds as many connections as it has threads, and every worker that
+starts adds its own; a burst of workers can run the database out of
+max_connections. With DB_POOL=True the database ENGINE is
+bakery.pooled_postgresql: Django closes its connection at the end of every
+request (CONN_MAX_AGE=0) and the close hands it back to this pool instead.
+
+Each worker process keeps at most max_size connections, shared by its
+threads:
+
+- min_size connections are opened in the background and kept open.
+- A checkout with none idle opens one if the pool is below max_size, and
+  otherwise waits up to timeout seconds for one to come back (PoolTimeout).
+- Connections idle for more than check_after seconds are tested with
+  SELECT 1 before they are handed out; broken ones are replaced.
+- Connections are rolled back if returned mid-transaction, and dropped if
+  that fails or they were closed.
+- A reaper thread closes connections idle for more than max_idle seconds,
+  down to min_size.
+
+Session state other than the transaction (SET, temp tables, advisory
+locks) stays with the connection; Django's own settings (time zone, role)
+are applied again on every checkout.
+
+Checkouts, waits and wait time are counted per pool; see pool_stats().
+"""
+import os
+import threading
+import time
+from collections import deque
+
+try:
+    from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+except ImportError:
+    TRANSACTION_STATUS_IDLE = 0
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(Exception):
+    """No connection came free within the pool's timeout"""
+
+
+class ConnectionPool:
+    """A bounded pool of connections made by connect()"""
+
+    def __init__(self, connect, name='default', database=None, min_size=0, max_size=10, timeout=10.0,
+                 max_idle=300.0, check_after=30.0):
+        if not 0 <= min_size <= max_size or max_size < 1:
+            raise ValueError(f'Invalid pool size {min_size}..{max_size}')
+        self.connect = connect
+        self.name = name
+        self.database = database
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.check_after = check_after
+        self.idle = deque()     # (connection, returned at), most recently returned last
+        self.size = 0           # idle + checked out + being opened
+        self.closed = False
+        self.condition = threading.Condition()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self.condition:
+            self.stats = dict.fromkeys([
+                'checkouts', 'waits', 'timeouts', 'opened', 'closed', 'failed_checks', 'discarded',
+            ], 0)
+            self.wait_total = self.wait_max = 0.0
+
+    def getconn(self, connect=None):
+        """Check out a connection, opening one (with connect or the pool's) if there is room"""
+        start = time.monotonic()
+        waited = False
+        while True:
+            with self.condition:
+                while not self.idle and self.size >= self.max_size:
+                    remaining = self.timeout - (time.monotonic() - start)
+                    if self.closed or remaining <= 0:
+                        self.stats['timeouts'] += 1
+                        raise PoolTimeout(f'No connection available in pool {self.name!r} '
+                                          f'within {self.timeout}s ({self.max_size} in use)')
+                    waited = True
+                    self.condition.wait(remaining)
+                if self.idle:
+                    conn, returned_at = self.idle.pop()
+                else:
+                    conn, returned_at = None, None
+                    self.size += 1
+
+            if conn is None:
+                conn = self._open(connect)
+            elif not self._usable(conn, time.monotonic() - returned_at):
+                self._discard(conn, 'failed_checks')
+                continue
+
+            self._record_checkout(time.monotonic() - start, waited)
+            return conn
+
+    def putconn(self, conn):
+        """Return a checked-out connection; it is closed instead if unusable or the pool is closed"""
+        if self.closed:
+            self._discard(conn)
+            return
+        if not self._reset(conn):
+            self._discard(conn, 'discarded')
+            return
+        with self.condition:
+            self.idle.append((conn, time.monotonic()))
+            self.condition.notify()
+
+    def reap(self):
+        """Close connections idle for longer than max_idle, keeping min_size open"""
+        expired = []
+        with self.condition:
+            cutoff = time.monotonic() - self.max_idle
+            # The oldest idle connections are at the left
+            while self.idle and self.size - len(expired) > self.min_size and self.idle[0][1] <= cutoff:
+                expired.append(self.idle.popleft()[0])
+        for conn in expired:
+            self._discard(conn)
+
+    def fill(self):
+        """Open connections until min_size are open"""
+        while True:
+            with self.condition:
+                if self.closed or self.size >= self.min_size:
+                    return
+                self.size += 1
+            self.putconn(self._open())
+
+    def close(self):
+        """Close the idle connections; checked-out ones are closed when returned"""
+        with self.condition:
+            self.closed = True
+            idle = [conn for conn, _ in self.idle]
+            self.idle.clear()
+            self.condition.notify_all()
+        for conn in idle:
+            self._discard(conn)
+
+    def get_stats(self):
+        with self.condition:
+            checkouts = self.stats['checkouts']
+            return {
+                'name': self.name,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'size': self.size,
+                'idle': len(self.idle),
+                'in_use': self.size - len(self.idle),
+                **self.stats,
+                'wait_ms_avg': round(self.wait_total * 1000 / checkouts, 3) if checkouts else None,
+                'wait_ms_max': round(self.wait_max * 1000, 3),
+            }
+
+    def _record_checkout(self, wait, waited):
+        with self.condition:
+            self.stats['checkouts'] += 1
+            self.stats['waits'] += waited
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+    def _open(self, connect=None):
+        """A new connection for a slot already counted in size"""
+        try:
+            conn = (connect or self.connect)()
+        except BaseException:
+            with self.condition:
+                self.size -= 1
+                self.condition.notify()
+            raise
+        with self.condition:
+            self.stats['opened'] += 1
+        return conn
+
+    def _discard(self, conn, reason=None):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self.condition:
+            self.size -= 1
+            self.stats['closed'] += 1
+            if reason:
+                self.stats[reason] += 1
+            self.condition.notify()
+
+    def _usable(self, conn, idle_for):
+        if conn.closed:
+            return False
+        if idle_for < self.check_after:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if not conn.autocommit:
+                conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _reset(self, conn):
+        """Leave no transaction open on a returned connection; False if it can't be reused"""
+        if conn.closed:
+            return False
+        try:
+            if conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            return conn.get_transaction_status() == TRANSACTION_STATUS_IDLE
+        except Exception:
+            return False
+
+
+def start_reaper(pool, interval):
+    """Fill the pool to min_size, then reap idle connections every interval seconds"""
+    def run():
+        while not pool.closed:
+            try:
+                pool.fill()
+                pool.reap()
+            except Exception:
+                # The database may be down; try again next round
+                pass
+            time.sleep(interval)
+
+    threading.Thread(target=run, name=f'db-pool-{pool.name}', daemon=True).start()
+
+
+def get_pool(alias, conn_params, options, connect):
+    """The worker's pool for these connection parameters, created on first use"""
+    key = (alias, tuple(sorted((name, str(value)) for name, value in conn_params.items())))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            database = conn_params.get('database') or conn_params.get('dbname')
+            pool = ConnectionPool(
+                connect, name=f'{alias}:{database}', database=database,
+                min_size=int(options.get('MIN_SIZE', 2)),
+                max_size=int(options.get('MAX_SIZE', 10)),
+                timeout=float(options.get('TIMEOUT', 10)),
+                max_idle=float(options.get('MAX_IDLE', 300)),
+                check_after=float(options.get('CHECK_AFTER', 30)),
+            )
+            _pools[key] = pool
+            start_reaper(pool, max(1.0, min(pool.max_idle, 60.0) / 2))
+        return pool
+
+
+def close_pools(database=None):
+    """Close and forget the worker's pools (only those for the named database, if given)"""
+    with _pools_lock:
+        pools = [(key, pool) for key, pool in _pools.items()
+                 if database is None or pool.database == database]
+        for key, _ in pools:
+            del _pools[key]
+    for _, pool in pools:
+        pool.close()
+
+
+def pool_stats():
+    """Size, checkouts and wait times of this worker's pools"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {'pid': os.getpid(), 'pools': [pool.get_stats() for pool in pools]}
+
+
+def reset_pool_stats():
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.reset_stats()
@@ -0,0 +1,69 @@
+"""
+Reads of GET and HEAD requests on a separate read-only connection.
+
+With the tuned SQLite mode, settings define a READ_DATABASE alias opening
+the same file with mode=ro. ReadOnlyRequestMiddleware marks safe requests,
+and while one is running ReadOnlyRequestRouter sends its reads there. In
+WAL mode readers never wait for the writer, so page and API reads keep
+going while checkouts hold the write lock.
+
+Writes always go to the default database, including those a GET makes
+(sessions, get_or_create, stats rebuilds). Reads inside a transaction on
+the default database stay on it, so a view sees its own uncommitted writes.
+"""
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_read_request = ContextVar('read_request', default=False)
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+class ReadOnlyRequestMiddleware:
+    """Mark GET and HEAD requests so their reads use READ_DATABASE (sync or async)"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _read_request.set(request.method in SAFE_METHODS)
+        try:
+            return self.get_response(request)
+        finally:
+            _read_request.reset(token)
+
+    async def __acall__(self, request):
+        # Threads the view runs on through sync_to_async inherit the mark
+        token = _read_request.set(request.method in SAFE_METHODS)
+        try:
+            return await self.get_response(request)
+        finally:
+            _read_request.reset(token)
+
+
+class ReadOnlyRequestRouter:
+    """Route the reads of marked requests to READ_DATABASE, and every write to the default database"""
+
+    def db_for_read(self, model, **hints):
+        if _read_request.get() and not connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return settings.READ_DATABASE
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Objects read through READ_DATABASE are saved to the default database
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db != settings.READ_DATABASE
@@ -0,0 +1,199 @@
+"""
+Live order status events for the orders page (server-sent events).
+
+Status changes are written as OrderStatusEvent rows by whichever process
+makes them - API views, the admin, or a background worker - so no external
+broker is needed. Each ASGI worker runs one OrderEventHub per event loop:
+a single task polls the table for new rows and fans them out to in-memory
+queues, one per open connection. An idle connection is just a suspended
+coroutine waiting on its queue, so one worker can hold thousands of them
+and the database sees one small query per poll interval however many
+customers are watching.
+
+Browsers reconnect automatically and send Last-Event-ID, which is replayed
+from the table so nothing is missed across reconnects.
+"""
+import asyncio
+import contextvars
+import json
+import logging
+import time
+import weakref
+from collections import defaultdict
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from .models import Order, OrderStatusEvent
+
+logger = logging.getLogger(__name__)
+
+EVENT_FIELDS = ('id', 'user_id', 'order__order_id', 'status', 'created_at')
+STATUS_LABELS = dict(Order.STATUS_CHOICES)
+
+# How long an id missing from a poll may still turn up from a slow transaction
+GAP_TIMEOUT = 10
+
+
+def get_setting(name, default):
+    return getattr(settings, name, default)
+
+
+def record_status_events(orders):
+    """Write a status event for each order (instances or dicts with id/user_id/status)"""
+    events = [
+        OrderStatusEvent(order_id=order['id'], user_id=order['user_id'], status=order['status'])
+        if isinstance(order, dict) else
+        OrderStatusEvent(order_id=order.pk, user_id=order.user_id, status=order.status)
+        for order in orders
+    ]
+    return OrderStatusEvent.objects.bulk_create(events)
+
+
+def prune_status_events():
+    """Delete events older than ORDER_EVENTS_RETENTION_HOURS"""
+    cutoff = timezone.now() - timedelta(hours=get_setting('ORDER_EVENTS_RETENTION_HOURS', 24))
+    deleted, _ = OrderStatusEvent.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
+
+
+def events_since(user_id, last_id):
+    """A user's events after last_id, oldest first"""
+    return list(
+        OrderStatusEvent.objects.filter(user_id=user_id, id__gt=last_id)
+        .order_by('id').values(*EVENT_FIELDS)[:100]
+    )
+
+
+def latest_event_id():
+    return OrderStatusEvent.objects.aggregate(latest=Max('id'))['latest'] or 0
+
+
+def fetch_events(last_id, gap_ids):
+    """Events after last_id plus any earlier ids we are still waiting on"""
+    close_old_connections()
+    condition = Q(id__gt=last_id)
+    if gap_ids:
+        condition |= Q(id__in=gap_ids)
+    return list(OrderStatusEvent.objects.filter(condition).order_by('id').values(*EVENT_FIELDS)[:500])
+
+
+def format_event(event):
+    """Encode an event row as an SSE message"""
+    data = json.dumps({
+        'order_id': event['order__order_id'],
+        'status': event['status'],
+        'status_display': STATUS_LABELS.get(event['status'], event['status']),
+        'changed_at': event['created_at'].isoformat(),
+    })
+    return f"id: {event['id']}\nevent: status\ndata: {data}\n\n"
+
+
+# Database calls from the hub and streams run on the shared thread pool:
+# they outlive the request that started them, so they must not be tied to
+# its thread
+run_in_thread = sync_to_async(thread_sensitive=False)
+
+
+class OrderEventHub:
+    """Polls for new status events and hands them to subscribed connections"""
+
+    def __init__(self):
+        self.subscribers = defaultdict(set)
+        self.task = None
+        self.last_id = None
+        self.gaps = {}
+
+    def subscribe(self, user_id):
+        queue = asyncio.Queue(maxsize=100)
+        self.subscribers[user_id].add(queue)
+        if self.task is None or self.task.done():
+            # A fresh context keeps the poller independent of the subscribing request
+            self.task = asyncio.get_running_loop().create_task(self.run(), context=contextvars.Context())
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        queues = self.subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[user_id]
+
+    def dispatch(self, events):
+        for event in events:
+            for queue in self.subscribers.get(event['user_id'], ()):
+                try:
+                    queue.put_nowait(event)
+                except asyncio.QueueFull:
+                    # The client is not reading; it catches up via Last-Event-ID on reconnect
+                    logger.warning('Dropping order event %s for a slow client', event['id'])
+
+    def track_gaps(self, events):
+        """Advance last_id, remembering skipped ids a concurrent transaction may still commit"""
+        now = time.monotonic()
+        for event in events:
+            self.gaps.pop(event['id'], None)
+            if event['id'] > self.last_id:
+                for missing in range(self.last_id + 1, min(event['id'], self.last_id + 100)):
+                    self.gaps.setdefault(missing, now)
+                self.last_id = event['id']
+        self.gaps = {gap: seen for gap, seen in self.gaps.items() if now - seen < GAP_TIMEOUT}
+
+    async def run(self):
+        interval = get_setting('ORDER_EVENTS_POLL_INTERVAL', 1.0)
+        try:
+            self.last_id = await run_in_thread(latest_event_id)()
+            while self.subscribers:
+                try:
+                    events = await run_in_thread(fetch_events)(self.last_id, list(self.gaps))
+                except DatabaseError:
+                    logger.exception('Polling order events failed')
+                    events = []
+                self.track_gaps(events)
+                self.dispatch(events)
+                await asyncio.sleep(interval)
+        finally:
+            self.gaps = {}
+
+
+_hubs = weakref.WeakKeyDictionary()
+
+
+def get_hub():
+    """The hub for the running event loop"""
+    loop = asyncio.get_running_loop()
+    if loop not in _hubs:
+        _hubs[loop] = OrderEventHub()
+    return _hubs[loop]
+
+
+async def order_event_stream(user_id, last_event_id=None):
+    """Yield SSE messages for one user's orders until ORDER_EVENTS_MAX_AGE passes"""
+    hub = get_hub()
+    queue = hub.subscribe(user_id)
+    keepalive = get_setting('ORDER_EVENTS_KEEPALIVE', 15)
+    # Streams end after a while and the browser reconnects, so connections
+    # dropped without a disconnect notice cannot pile up
+    deadline = time.monotonic() + get_setting('ORDER_EVENTS_MAX_AGE', 300)
+    replayed = set()
+    try:
+        yield f"retry: {get_setting('ORDER_EVENTS_RETRY_MS', 3000)}\n\n"
+        if last_event_id is not None:
+            for event in await run_in_thread(events_since)(user_id, last_event_id):
+                replayed.add(event['id'])
+                yield format_event(event)
+
+        while (remaining := deadline - time.monotonic()) > 0:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=min(keepalive, remaining))
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            if event['id'] not in replayed:
+                yield format_event(event)
+    finally:
+        hub.unsubscribe(user_id, queue)
@@ -0,0 +1,145 @@
+"""
+Streaming CSV and NDJSON exports of orders and payments for accounting.
+
+Rows are read with .values_list().iterator(), which uses a server-side
+cursor on PostgreSQL (fetchmany() chunks on SQLite), and written out a few
+hundred at a time through a StreamingHttpResponse. Neither side ever holds
+more than one chunk, so memory stays flat however large the export is.
+
+Under ASGI a plain generator would be read to the end before the first
+byte is sent, so it is wrapped in an async iterator that pulls each chunk
+through sync_to_async on the request's own thread (where its cursor
+lives).
+"""
+import csv
+from datetime import datetime, time, timedelta
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+# Rows per database round trip, and rows per chunk written to the client
+CHUNK_SIZE = 2000
+ROWS_PER_WRITE = 500
+
+# (column, field) pairs, in file order
+ORDER_COLUMNS = [
+    ('order_id', 'order_id'),
+    ('customer', 'user__email'),
+    ('status', 'status'),
+    ('total_amount', 'total_amount'),
+    ('delivery_fee', 'delivery_fee'),
+    ('payment_method', 'payment__payment_method'),
+    ('payment_status', 'payment__payment_status'),
+    ('transaction_id', 'payment__transaction_id'),
+    ('created_at', 'created_at'),
+    ('confirmed_at', 'confirmed_at'),
+    ('delivered_at', 'delivered_at'),
+]
+
+PAYMENT_COLUMNS = [
+    ('transaction_id', 'transaction_id'),
+    ('order_id', 'order__order_id'),
+    ('customer', 'order__user__email'),
+    ('payment_method', 'payment_method'),
+    ('payment_status', 'payment_status'),
+    ('amount', 'amount'),
+    ('upi_id', 'upi_id'),
+    ('card_last4', 'card_last4'),
+    ('created_at', 'created_at'),
+    ('paid_at', 'paid_at'),
+]
+
+
+def filter_export(queryset, params, status_field='status'):
+    """Apply the status, since and until (inclusive ISO dates) filters; raises ValueError"""
+    filters = {}
+    status = params.get('status')
+    if status:
+        choices = dict(queryset.model._meta.get_field(status_field).choices)
+        if status not in choices:
+            raise ValueError(f'Invalid status: {status}')
+        filters[status_field] = status
+    for param, lookup, offset in [('since', 'created_at__gte', 0), ('until', 'created_at__lt', 1)]:
+        value = params.get(param)
+        if not value:
+            continue
+        try:
+            day = parse_date(value)
+        except ValueError:
+            day = None
+        if day is None:
+            raise ValueError(f'{param} must be a date (YYYY-MM-DD)')
+        # A range on created_at itself, so the created_at index is used
+        filters[lookup] = timezone.make_aware(datetime.combine(day + timedelta(days=offset), time.min))
+    return queryset.filter(**filters)
+
+
+# Spreadsheets run text cells starting with these as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def csv_cell(value):
+    """Quote text a spreadsheet would read as a formula with a leading apostrophe"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+class Echo:
+    """A file-like object for csv.writer that hands each line back"""
+
+    def write(self, value):
+        return value
+
+
+def export_lines(queryset, columns, export_format):
+    """Yield the export as text chunks, header first"""
+    headers = [column for column, _ in columns]
+    rows = (
+        queryset.order_by('created_at', 'id')
+        .values_list(*[field for _, field in columns])
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    if export_format == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(headers)
+        lines = (writer.writerow([csv_cell(value) for value in row]) for row in rows)
+    else:
+        encoder = DjangoJSONEncoder()
+        lines = (encoder.encode(dict(zip(headers, row))) + '\n' for row in rows)
+
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) == ROWS_PER_WRITE:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+async def iterate_in_thread(chunks):
+    """Serve a sync generator to ASGI one chunk at a time"""
+    next_chunk = sync_to_async(next)
+    while (chunk := await next_chunk(chunks, None)) is not None:
+        yield chunk
+
+
+def export_response(request, queryset, columns, export_format, name):
+    """A StreamingHttpResponse downloading the queryset as name-YYYYMMDD.csv or .ndjson"""
+    chunks = export_lines(queryset, columns, export_format)
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        chunks = iterate_in_thread(chunks)
+    response = StreamingHttpResponse(chunks, content_type=EXPORT_FORMATS[export_format])
+    filename = f'{name}-{timezone.localdate():%Y%m%d}.{export_format}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
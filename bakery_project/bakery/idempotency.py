@@ -0,0 +1,132 @@
+"""
+Idempotency-Key support for POST endpoints that create orders and payments.
+
+The first request with a given key claims it by inserting an IdempotencyKey
+row (unique per user), runs the view and stores the response. A retry with
+the same key gets the stored response back without running the view again.
+Error responses are not stored: the key is released so the request can be
+retried, or corrected and sent again, with the same key.
+A duplicate that arrives while the first request is still running polls
+until the response is stored instead of racing it.
+"""
+import hashlib
+import json
+import random
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+
+
+def get_setting(name, default):
+    return getattr(settings, name, default)
+
+
+def request_fingerprint(request):
+    """Hash of what the request asks for, to catch keys reused for a different body"""
+    payload = json.dumps(request.data, cls=DjangoJSONEncoder, sort_keys=True, default=str)
+    return hashlib.sha256(f'{request.method}|{request.path}|{payload}'.encode()).hexdigest()
+
+
+def prune_expired_keys():
+    """Delete expired keys; returns the number removed"""
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lt=timezone.now()).delete()
+    return deleted
+
+
+def claim_key(user, key, fingerprint):
+    """Insert a new in-progress record, or return the existing one.
+
+    Returns (record, created).
+    """
+    now = timezone.now()
+    if random.random() < get_setting('IDEMPOTENCY_PRUNE_PROBABILITY', 0.01):
+        prune_expired_keys()
+
+    try:
+        with transaction.atomic():
+            record = IdempotencyKey.objects.create(
+                user=user,
+                key=key,
+                fingerprint=fingerprint,
+                expires_at=now + timedelta(seconds=get_setting('IDEMPOTENCY_KEY_TTL', 86400))
+            )
+        return record, True
+    except IntegrityError:
+        pass
+
+    record = IdempotencyKey.objects.filter(user=user, key=key).first()
+    lock_timeout = timedelta(seconds=get_setting('IDEMPOTENCY_LOCK_TIMEOUT', 60))
+    abandoned = record and not record.is_complete and record.created_at < now - lock_timeout
+    if record is None or record.expires_at < now or abandoned:
+        # Expired, or left behind by a worker that died mid-request: start over
+        IdempotencyKey.objects.filter(user=user, key=key).delete()
+        return claim_key(user, key, fingerprint)
+    return record, False
+
+
+def wait_for_response(record):
+    """Poll until the first request stores its response; None on timeout"""
+    deadline = time.monotonic() + get_setting('IDEMPOTENCY_WAIT_TIMEOUT', 10)
+    while not record.is_complete:
+        if time.monotonic() > deadline:
+            return None
+        time.sleep(0.05)
+        record = IdempotencyKey.objects.filter(pk=record.pk).first()
+        if record is None:
+            return None
+    return record
+
+
+def idempotent(view_method):
+    """Make a DRF view method replay its response for repeated Idempotency-Key headers"""
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key or not request.user.is_authenticated:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > 255:
+            return Response({'error': f'{HEADER} must be at most 255 characters'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        fingerprint = request_fingerprint(request)
+        record, created = claim_key(request.user, key, fingerprint)
+
+        if not created:
+            if record.fingerprint != fingerprint:
+                return Response({'error': f'{HEADER} was already used for a different request'},
+                                status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+            record = wait_for_response(record)
+            if record is None:
+                return Response({'error': 'A request with this key is still in progress'},
+                                status=status.HTTP_409_CONFLICT)
+            response = Response(json.loads(record.response_body), status=record.status_code)
+            response['Idempotent-Replayed'] = 'true'
+            return response
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            record.delete()
+            raise
+
+        if response.status_code >= 400:
+            # Let the client retry errors (or fix a rejected body) with the same key
+            record.delete()
+        else:
+            record.status_code = response.status_code
+            record.response_body = json.dumps(response.data, cls=DjangoJSONEncoder, separators=(',', ':'))
+            record.save(update_fields=['status_code', 'response_body'])
+        return response
+
+    return wrapper
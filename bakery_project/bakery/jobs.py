@@ -0,0 +1,127 @@
+"""
+Database-backed background jobs.
+
+Jobs are rows in the Job table, so enqueueing inside a request transaction
+is atomic with the rest of the request's writes and no external broker is
+needed. `manage.py run_workers` claims and runs them:
+
+- Postgres claims with SELECT ... FOR UPDATE SKIP LOCKED, so workers never
+  block on each other.
+- SQLite has a single writer, so a conditional UPDATE (... WHERE status =
+  'queued') is already an atomic claim; losing a race just moves on to the
+  next candidate.
+
+Failed jobs are retried with exponential backoff up to max_attempts.
+With JOBS_ASYNC = False, enqueue() runs the job inline instead.
+"""
+import logging
+import random
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+
+def job(name):
+    """Register a function as a background job"""
+    def decorator(func):
+        registry[name] = func
+        return func
+    return decorator
+
+
+def get_setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enqueue(name, delay=0, max_attempts=None, **payload):
+    """Queue a job to run after `delay` seconds"""
+    if name not in registry:
+        raise KeyError(f"Unknown job: {name}")
+    if not get_setting('JOBS_ASYNC', True):
+        registry[name](**payload)
+        return None
+    return Job.objects.create(
+        name=name,
+        payload=payload,
+        run_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or get_setting('JOB_MAX_ATTEMPTS', 5)
+    )
+
+
+def claim_job(worker_id):
+    """Atomically claim the next due job for this worker, or return None"""
+    now = timezone.now()
+    due = Job.objects.filter(status='queued', run_at__lte=now).order_by('run_at', 'id')
+    claim = {'status': 'running', 'locked_by': worker_id, 'started_at': now}
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            job_id = due.select_for_update(skip_locked=True).values_list('id', flat=True).first()
+            if job_id is None:
+                return None
+            Job.objects.filter(pk=job_id).update(**claim)
+        return Job.objects.get(pk=job_id)
+
+    for job_id in due.values_list('id', flat=True)[:10]:
+        if Job.objects.filter(pk=job_id, status='queued').update(**claim):
+            return Job.objects.get(pk=job_id)
+    return None
+
+
+def backoff_seconds(attempts):
+    """Exponential backoff with jitter: base, 2*base, 4*base, ... capped"""
+    base = get_setting('JOB_RETRY_BASE_DELAY', 5)
+    delay = min(base * 2 ** (attempts - 1), get_setting('JOB_RETRY_MAX_DELAY', 3600))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def run_job(claimed):
+    """Run a claimed job and record the outcome; returns True on success"""
+    start = time.perf_counter()
+    claimed.attempts += 1
+    try:
+        func = registry[claimed.name]
+        func(**claimed.payload)
+    except Exception:
+        claimed.last_error = traceback.format_exc()
+        if claimed.attempts < claimed.max_attempts:
+            claimed.status = 'queued'
+            claimed.run_at = timezone.now() + timedelta(seconds=backoff_seconds(claimed.attempts))
+        else:
+            claimed.status = 'failed'
+        logger.exception('Job %s #%s failed (attempt %s)', claimed.name, claimed.pk, claimed.attempts)
+    else:
+        claimed.status = 'succeeded'
+        claimed.last_error = ''
+
+    claimed.duration_ms = int((time.perf_counter() - start) * 1000)
+    claimed.finished_at = timezone.now()
+    claimed.locked_by = ''
+    claimed.save(update_fields=['status', 'attempts', 'last_error', 'run_at', 'duration_ms',
+                                'finished_at', 'locked_by'])
+    return claimed.status == 'succeeded'
+
+
+def requeue_stale_jobs():
+    """Put back jobs whose worker died mid-run (running past the lease)"""
+    lease = timedelta(seconds=get_setting('JOB_LEASE_SECONDS', 600))
+    return Job.objects.filter(status='running', started_at__lt=timezone.now() - lease).update(
+        status='queued', locked_by='', run_at=timezone.now()
+    )
+
+
+def prune_finished_jobs():
+    """Delete succeeded jobs older than JOB_RETENTION_DAYS"""
+    cutoff = timezone.now() - timedelta(days=get_setting('JOB_RETENTION_DAYS', 7))
+    deleted, _ = Job.objects.filter(status='succeeded', finished_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,192 @@
+"""
+Indexed order lookup for staff: find an order by any part of its order id,
+the customer's email, their phone number or the payment's transaction or
+UPI id.
+
+Each order has an OrderLookup row holding those values as one normalized,
+lower-case string (phone numbers reduced to digits). Every search term must
+appear somewhere in it, so "ord-3f2a", "priya@" and "98765" all work. The
+text is indexed for substring matching: an FTS5 trigram table kept in sync
+by triggers on SQLite, a pg_trgm GIN index on Postgres. Other databases
+(or SQLite older than 3.34) scan the lookup table, which is still far
+narrower than the joined order, user and payment tables.
+
+Rows are written by the signals in signals.py (and once per checkout by
+place_order); `manage.py rebuild_order_lookups` backfills or repairs them.
+"""
+import re
+import sqlite3
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Order, OrderLookup
+from .search import sqlite_has_fts5
+
+FTS_TABLE = 'bakery_orderlookup_fts'
+
+# Trigram indexes can't narrow down shorter terms
+MIN_INDEXED_LENGTH = 3
+
+_writes_deferred = ContextVar('lookup_writes_deferred', default=False)
+
+
+def normalize_phone(phone):
+    return re.sub(r'\D', '', phone or '')
+
+
+def lookup_text(order_id, email, phone, transaction_id='', upi_id=''):
+    """The OrderLookup text for an order"""
+    return ' '.join([order_id or '', email or '', normalize_phone(phone), transaction_id or '', upi_id or '']).lower()
+
+
+def tokenize(query):
+    """Search terms from a staff query; terms without letters are read as phone digits"""
+    tokens = []
+    for token in query.lower().split():
+        if not re.search(r'[^\W\d_]', token):
+            token = normalize_phone(token)
+        if token:
+            tokens.append(token)
+    return tokens
+
+
+def sqlite_has_trigram(conn):
+    """FTS5's trigram tokenizer arrived in SQLite 3.34"""
+    return sqlite3.sqlite_version_info >= (3, 34, 0) and sqlite_has_fts5(conn)
+
+
+def save_order_lookup(order, payment=None):
+    """Write the lookup row for an order instance (its user is fetched if not cached)"""
+    text = lookup_text(order.order_id, order.user.email, order.delivery_phone,
+                       *([payment.transaction_id, payment.upi_id] if payment else []))
+    OrderLookup.objects.bulk_create(
+        [OrderLookup(order_id=order.pk, text=text)],
+        update_conflicts=True, unique_fields=['order'], update_fields=['text']
+    )
+
+
+def refresh_order_lookups(orders):
+    """Rebuild the lookup rows for an Order queryset or a list of order ids"""
+    if not hasattr(orders, 'values_list'):
+        orders = Order.objects.filter(id__in=orders)
+    rows = orders.order_by().values_list('id', 'order_id', 'user__email', 'delivery_phone',
+                                         'payment__transaction_id', 'payment__upi_id')
+    lookups = [OrderLookup(order_id=pk, text=lookup_text(*values)) for pk, *values in rows]
+    OrderLookup.objects.bulk_create(
+        lookups, update_conflicts=True, unique_fields=['order'], update_fields=['text'], batch_size=1000
+    )
+    return len(lookups)
+
+
+@contextmanager
+def defer_lookup_writes():
+    """Skip the signal-driven lookup writes inside the block; the caller writes the rows itself"""
+    token = _writes_deferred.set(True)
+    try:
+        yield
+    finally:
+        _writes_deferred.reset(token)
+
+
+def order_saved(order, created):
+    """Keep the lookup row in step with Order.save()"""
+    source = order.lookup_source()
+    if _writes_deferred.get():
+        pass
+    elif created:
+        save_order_lookup(order)
+    elif source != order.stored_lookup_source():
+        refresh_order_lookups([order.pk])
+    order._lookup_source = source
+
+
+def payment_saved(payment, created):
+    """Keep the order's lookup row in step with its payment's transaction and UPI ids"""
+    source = payment.lookup_source()
+    previous = getattr(payment, '_lookup_source', None)
+    if _writes_deferred.get():
+        pass
+    elif created:
+        save_order_lookup(payment.order, payment)
+    elif source != previous:
+        stale = {payment.order_id}
+        if previous:
+            # A payment moved to another order leaves its old order's row too
+            stale.add(previous[0])
+        refresh_order_lookups(stale)
+    payment._lookup_source = source
+
+
+def payment_deleted(payment):
+    """Drop a deleted payment's ids from its order's lookup row"""
+    # Update only: when the order itself is being deleted its lookup row is
+    # already gone, and must not be written again
+    for values in Order.objects.filter(pk=payment.order_id).values_list('order_id', 'user__email', 'delivery_phone'):
+        OrderLookup.objects.filter(order_id=payment.order_id).update(text=lookup_text(*values))
+
+
+def user_saved(user, update_fields):
+    """Refresh a customer's lookup rows when their email changes"""
+    if update_fields is not None and 'email' not in update_fields:
+        return
+    stale = (
+        OrderLookup.objects.filter(order__user=user)
+        .exclude(text__contains=f' {(user.email or "").lower()} ')
+        .values_list('order_id', flat=True)
+    )
+    stale = list(stale)
+    if stale:
+        refresh_order_lookups(stale)
+
+
+class BaseLookupBackend:
+    """LIKE '%term%' on the lookup text (what the pg_trgm index serves)"""
+
+    def matching_order_ids(self, tokens):
+        lookups = OrderLookup.objects.all()
+        for token in tokens:
+            lookups = lookups.filter(text__contains=token)
+        return lookups.values('order_id')
+
+
+class SQLiteTrigramBackend(BaseLookupBackend):
+    """FTS5 trigram table: each term is a substring phrase query"""
+
+    def matching_order_ids(self, tokens):
+        indexed = [token for token in tokens if len(token) >= MIN_INDEXED_LENGTH]
+        if not indexed:
+            return super().matching_order_ids(tokens)
+        match = ' '.join('"{}"'.format(token.replace('"', '""')) for token in indexed)
+        ids = RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match])
+        short = [token for token in tokens if len(token) < MIN_INDEXED_LENGTH]
+        if not short:
+            return ids
+        lookups = OrderLookup.objects.filter(order_id__in=ids)
+        for token in short:
+            lookups = lookups.filter(text__contains=token)
+        return lookups.values('order_id')
+
+
+_backend = None
+
+
+def get_lookup_backend():
+    """Return the lookup backend for the default database connection"""
+    global _backend
+    if _backend is None:
+        if connection.vendor == 'sqlite' and sqlite_has_trigram(connection):
+            _backend = SQLiteTrigramBackend()
+        else:
+            _backend = BaseLookupBackend()
+    return _backend
+
+
+def search_orders(queryset, query, field='id'):
+    """Narrow a queryset to orders matching query; `field` holds the order id (e.g. 'order_id' for payments)"""
+    tokens = tokenize(query)
+    if not tokens:
+        return queryset
+    return queryset.filter(**{f'{field}__in': get_lookup_backend().matching_order_ids(tokens)})
@@ -0,0 +1,196 @@
+"""
+Management command to benchmark the async API under many slow clients
+Starts the site under each server mode in turn, on the configured database:
+
+- gunicorn-sync: gunicorn sync workers serving bakery_project.wsgi
+- uvicorn-sync: uvicorn serving bakery_project.asgi with ASYNC_API off
+- uvicorn-async: uvicorn serving bakery_project.asgi (async API views)
+
+Each run opens --slow-clients connections that send their request headers
+one line every --slow-interval seconds and never finish, while --clients
+fast clients fetch the menu, categories, current orders and dashboard in
+a loop with a benchmark user's token. Reports the fast clients' requests
+per second, p50/p99 latency and errors per mode. The servers run with
+DEBUG=True (plain HTTP, no SSL redirect). The benchmark user and their
+orders are deleted afterwards.
+"""
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+from bakery.models import MenuItem, Order, OrderItem
+
+from .loadtest import percentile
+
+BENCH_USERNAME = 'bench-asgi@bakery.local'
+
+PATHS = ['/api/menu-items/', '/api/menu-items/categories/', '/api/orders/current/', '/api/dashboard/stats/']
+
+MODES = {
+    'gunicorn-sync': (['gunicorn', 'bakery_project.wsgi:application', '--workers', '{workers}',
+                       '--bind', '127.0.0.1:{port}'], 'False'),
+    'uvicorn-sync': (['uvicorn', 'bakery_project.asgi:application', '--workers', '{workers}',
+                      '--port', '{port}', '--lifespan', 'off', '--no-access-log'], 'False'),
+    'uvicorn-async': (['uvicorn', 'bakery_project.asgi:application', '--workers', '{workers}',
+                       '--port', '{port}', '--lifespan', 'off', '--no-access-log'], 'True'),
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def fetch(port, path, token, timeout):
+    """One GET on a new connection; the status code, or None on a failure"""
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return None
+    try:
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nAuthorization: Token {token}\r\n'
+                     f'Connection: close\r\n\r\n'.encode())
+        response = await asyncio.wait_for(reader.read(-1), timeout)
+        return int(response.split(b' ', 2)[1]) if response.startswith(b'HTTP/') else None
+    except (OSError, ValueError, asyncio.TimeoutError):
+        return None
+    finally:
+        writer.close()
+
+
+async def slow_client(port, interval, stop):
+    """Trickle request headers until stopped, holding the connection open"""
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    except OSError:
+        return
+    try:
+        writer.write(b'GET /api/menu-items/ HTTP/1.1\r\nHost: 127.0.0.1\r\n')
+        line = 0
+        while not stop.is_set():
+            await writer.drain()
+            try:
+                await asyncio.wait_for(stop.wait(), interval)
+            except asyncio.TimeoutError:
+                line += 1
+                writer.write(f'X-Slow-{line}: {line}\r\n'.encode())
+    except OSError:
+        pass
+    finally:
+        writer.close()
+
+
+async def fast_client(index, port, token, deadline, timeout, timings, errors):
+    request = index
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        status = await fetch(port, PATHS[request % len(PATHS)], token, timeout)
+        request += 1
+        if status == 200:
+            timings.append((time.perf_counter() - start) * 1000)
+        else:
+            errors.append(status)
+
+
+async def run_load(port, token, options):
+    stop = asyncio.Event()
+    slow = [asyncio.create_task(slow_client(port, options['slow_interval'], stop))
+            for _ in range(options['slow_clients'])]
+    # Let the slow clients take their connections first
+    await asyncio.sleep(1)
+
+    timings, errors = [], []
+    deadline = time.monotonic() + options['duration']
+    await asyncio.gather(*[
+        fast_client(i, port, token, deadline, options['timeout'], timings, errors)
+        for i in range(options['clients'])
+    ])
+    stop.set()
+    await asyncio.gather(*slow)
+    return timings, errors
+
+
+class Command(BaseCommand):
+    help = 'Benchmark gunicorn sync workers against uvicorn with the async API under slow clients'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES),
+                            help='Server modes to run')
+        parser.add_argument('--workers', type=int, default=2, help='Worker processes per server')
+        parser.add_argument('--clients', type=int, default=50, help='Concurrent fast clients')
+        parser.add_argument('--slow-clients', type=int, default=100,
+                            help='Connections that trickle their headers and never finish')
+        parser.add_argument('--slow-interval', type=float, default=1.0,
+                            help='Seconds between header lines of a slow client')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds of load per mode')
+        parser.add_argument('--timeout', type=float, default=5.0, help='Seconds before a request counts as failed')
+
+    def handle(self, *args, **options):
+        User.objects.filter(username=BENCH_USERNAME).delete()
+        user = User.objects.create_user(username=BENCH_USERNAME, email=BENCH_USERNAME,
+                                        password=uuid.uuid4().hex)
+        try:
+            token = Token.objects.create(user=user).key
+            self.create_orders(user)
+            self.stdout.write(
+                f'{options["clients"]} clients and {options["slow_clients"]} slow clients, '
+                f'{options["workers"]} workers, {options["duration"]:.0f}s per mode'
+            )
+            for mode in options['modes']:
+                self.run_mode(mode, token, options)
+        finally:
+            Order.objects.filter(user=user).delete()
+            user.delete()
+
+    def create_orders(self, user):
+        menu_item = MenuItem.objects.filter(available=True).first()
+        for n, status in enumerate(['pending', 'confirmed', 'delivered']):
+            order = Order.objects.create(user=user, order_id=f'BENCH-ASGI-{uuid.uuid4().hex[:8]}',
+                                         status=status, total_amount=Decimal('25.00'))
+            if menu_item:
+                OrderItem.objects.create(order=order, menu_item=menu_item, quantity=n + 1, price=menu_item.price)
+
+    def run_mode(self, mode, token, options):
+        args, async_api = MODES[mode]
+        port = free_port()
+        command = [sys.executable, '-m'] + [arg.format(workers=options['workers'], port=port) for arg in args]
+        env = {**os.environ, 'DEBUG': 'True', 'ASYNC_API': async_api}
+        server = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            self.wait_until_ready(server, port, token)
+            timings, errors = asyncio.run(run_load(port, token, options))
+        finally:
+            server.terminate()
+            try:
+                server.wait(10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+                server.wait()
+
+        timings.sort()
+        self.stdout.write(
+            f'{mode:>14}: {len(timings) / options["duration"]:7.1f} req/s, '
+            f'p50 {percentile(timings, 50):7.1f} ms, p99 {percentile(timings, 99):7.1f} ms, '
+            f'{len(errors)} errors'
+        )
+
+    def wait_until_ready(self, server, port, token, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'Server exited with status {server.returncode}: {" ".join(server.args)}')
+            if asyncio.run(fetch(port, PATHS[0], token, 1)) == 200:
+                return
+            time.sleep(0.2)
+        raise CommandError(f'Server did not answer on port {port} within {timeout}s')
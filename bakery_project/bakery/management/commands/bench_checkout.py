@@ -0,0 +1,78 @@
+"""
+Management command to benchmark checkout write throughput
+Compares the old autocommit write path (one commit per statement) with the
+single-transaction checkout service on the configured database. Benchmark
+orders and the benchmark user are deleted afterwards.
+"""
+import time
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from bakery.checkout import place_order
+from bakery.models import MenuItem, Order, OrderItem, Payment
+from bakery.pricing import price_cart
+
+BENCH_USERNAME = 'bench-checkout@bakery.local'
+
+
+def legacy_place_order(user, quote):
+    """The pre-service write path: three statements, each autocommitted"""
+    order = Order.objects.create(
+        user=user,
+        order_id=f"ORD-{uuid.uuid4().hex[:8].upper()}",
+        status='pending',
+        total_amount=quote.subtotal,
+        delivery_fee=quote.delivery_fee,
+        delivery_address='1 Bench Street'
+    )
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, menu_item=line['menu_item'], quantity=line['quantity'], price=line['price'])
+        for line in quote.lines
+    ])
+    Payment.objects.create(
+        order=order,
+        payment_method='upi',
+        payment_status='pending',
+        transaction_id=f"TXN-{uuid.uuid4().hex[:12].upper()}",
+        amount=order.grand_total
+    )
+    return order
+
+
+def service_place_order(user, quote):
+    return place_order(user, quote, delivery_address='1 Bench Street', payment_method='upi')
+
+
+class Command(BaseCommand):
+    help = 'Benchmark orders per second for the legacy and transactional checkout paths'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=500, help='Orders to place per path')
+        parser.add_argument('--lines', type=int, default=5, help='Cart lines per order')
+
+    def handle(self, *args, **options):
+        menu_items = list(MenuItem.objects.filter(available=True)[:options['lines']])
+        if not menu_items:
+            self.stderr.write('No available menu items; run init_menu first.')
+            return
+
+        user, _ = User.objects.get_or_create(username=BENCH_USERNAME, defaults={'email': BENCH_USERNAME})
+        quote = price_cart((item.id, 1) for item in menu_items)
+        self.stdout.write(
+            f'{connection.vendor}: {options["orders"]} orders x {len(quote.lines)} lines per path'
+        )
+
+        try:
+            for label, place in [('before (autocommit)', legacy_place_order),
+                                 ('after (one transaction)', service_place_order)]:
+                start = time.perf_counter()
+                for _ in range(options['orders']):
+                    place(user, quote)
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f'{label:>24}: {options["orders"] / elapsed:8.1f} orders/sec')
+        finally:
+            user.delete()
+
+        self.stdout.write(self.style.SUCCESS('Benchmark complete (benchmark orders deleted)'))
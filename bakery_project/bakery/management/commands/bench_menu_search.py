@@ -0,0 +1,71 @@
+"""
+Management command to benchmark menu search against a synthetic catalog
+Compares the full-text index with the old icontains scan. All synthetic rows
+are created inside a transaction that is rolled back at the end.
+"""
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from bakery.models import MenuItem
+from bakery.search import BaseSearchBackend, get_search_backend
+
+FLAVOURS = [
+    'butter', 'chocolate', 'almond', 'vanilla', 'strawberry', 'lemon', 'honey',
+    'cinnamon', 'walnut', 'caramel', 'sourdough', 'rye', 'blueberry', 'raspberry',
+    'pistachio', 'hazelnut', 'coconut', 'ginger', 'maple', 'cheese', 'apple',
+    'mango', 'orange', 'espresso', 'matcha', 'pecan', 'cherry', 'banana',
+]
+# Pseudo-words so descriptions have a realistic, mostly selective vocabulary
+SYLLABLES = ['ba', 'ke', 'ro', 'ti', 'su', 'la', 'me', 'no', 'ca', 'di', 'fo', 'gu', 'pa', 've', 'zi']
+VOCABULARY = FLAVOURS + [a + b + c for a in SYLLABLES for b in SYLLABLES for c in SYLLABLES]
+QUERIES = ['choc', 'almond croissant', 'lemon', 'straw', 'bakero', 'tisu', 'maple pecan', 'sour']
+
+
+class Command(BaseCommand):
+    help = 'Benchmark menu search latency on a synthetic catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=100000, help='Synthetic menu items to create')
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per query')
+
+    def handle(self, *args, **options):
+        categories = [choice[0] for choice in MenuItem.CATEGORY_CHOICES]
+        rng = random.Random(42)
+
+        with transaction.atomic():
+            self.stdout.write(f'Creating {options["items"]} synthetic menu items...')
+            MenuItem.objects.bulk_create(
+                (MenuItem(
+                    name=f'{rng.choice(VOCABULARY)} {rng.choice(FLAVOURS)} {category}'.title(),
+                    description=' '.join(rng.choices(VOCABULARY, k=12)),
+                    price=rng.randint(50, 900),
+                    category=category,
+                ) for category in rng.choices(categories, k=options['items'])),
+                batch_size=2000
+            )
+
+            backends = [('icontains', BaseSearchBackend()), ('full-text', get_search_backend())]
+            for label, backend in backends:
+                timings = []
+                for query in QUERIES:
+                    for _ in range(options['repeat']):
+                        queryset = backend.search(MenuItem.objects.filter(available=True), query)
+                        if backend.rank_ordering:
+                            queryset = queryset.order_by(backend.rank_ordering)
+                        start = time.perf_counter()
+                        list(queryset.values_list('id', flat=True)[:50])
+                        timings.append((time.perf_counter() - start) * 1000)
+                timings.sort()
+                self.stdout.write(
+                    f'{label:>10} ({type(backend).__name__}): '
+                    f'p50={statistics.median(timings):.2f}ms '
+                    f'p95={timings[int(len(timings) * 0.95) - 1]:.2f}ms '
+                    f'max={timings[-1]:.2f}ms'
+                )
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('Benchmark complete (synthetic data rolled back)'))
@@ -0,0 +1,102 @@
+"""
+Management command to benchmark the order list read path
+Serializes the same orders with OrderSerializer and with the row-based
+path in order_rows.py, checks the JSON is byte-identical, and prints the
+best time of each for serialization alone and for fetching plus
+serializing. Benchmark orders and the benchmark user are deleted
+afterwards.
+"""
+import time
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from rest_framework.renderers import JSONRenderer
+from bakery.models import MenuItem, Order, OrderItem, Payment
+from bakery.order_rows import item_rows, order_values, serialize_orders
+from bakery.serializers import OrderSerializer
+
+BENCH_USERNAME = 'bench-serializers@bakery.local'
+
+
+def best_of(repeat, function):
+    """Fastest of repeat runs, in seconds, and the last result"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+class Command(BaseCommand):
+    help = 'Benchmark OrderSerializer against the row-based order list serialization'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=1000, help='Orders to serialize')
+        parser.add_argument('--items', type=int, default=3, help='Items per order')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per path (best is reported)')
+
+    def handle(self, *args, **options):
+        menu_items = list(MenuItem.objects.all()[:options['items']])
+        if not menu_items:
+            raise CommandError('No menu items; run init_menu first.')
+
+        user, _ = User.objects.get_or_create(username=BENCH_USERNAME, defaults={
+            'email': BENCH_USERNAME, 'first_name': 'Bench', 'last_name': 'User',
+        })
+        try:
+            self.create_orders(user, menu_items, options['orders'])
+            self.run(user, options)
+        finally:
+            user.delete()
+        self.stdout.write(self.style.SUCCESS('Benchmark complete (benchmark orders deleted)'))
+
+    def create_orders(self, user, menu_items, count):
+        with transaction.atomic():
+            orders = Order.objects.bulk_create([
+                Order(user=user, order_id=f'BENCH-{uuid.uuid4().hex[:12].upper()}', status='delivered',
+                      total_amount=sum(item.price for item in menu_items), delivery_fee=Decimal('50.00'),
+                      delivery_address='1 Bench Street')
+                for _ in range(count)
+            ])
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, menu_item=item, quantity=1, price=item.price)
+                for order in orders for item in menu_items
+            ])
+            Payment.objects.bulk_create([
+                Payment(order=order, payment_method='upi', payment_status='completed',
+                        transaction_id=f'TXN-{uuid.uuid4().hex[:16].upper()}', amount=order.grand_total)
+                for order in orders
+            ])
+
+    def run(self, user, options):
+        orders = Order.objects.filter(user=user)
+        serializer_queryset = orders.select_related('user', 'payment').prefetch_related('items__menu_item')
+        render = JSONRenderer().render
+        repeat = options['repeat']
+        self.stdout.write(f'{connection.vendor}: {options["orders"]} orders x {options["items"]} items, '
+                          f'best of {repeat}')
+
+        # Serialization alone, on data already fetched
+        instances = list(serializer_queryset)
+        rows = list(order_values(orders))
+        items = item_rows([row['id'] for row in rows])
+        before, expected = best_of(repeat, lambda: render(OrderSerializer(instances, many=True).data))
+        after, rendered = best_of(repeat, lambda: render(serialize_orders(rows, items)))
+        if rendered != expected:
+            raise CommandError('Row-based JSON differs from OrderSerializer output')
+        self.report('serialize + render', before, after)
+
+        # Fetching and serializing, as the endpoints do
+        before, _ = best_of(repeat, lambda: render(OrderSerializer(serializer_queryset.all(), many=True).data))
+        after, _ = best_of(repeat, lambda: render(serialize_orders(order_values(orders))))
+        self.report('fetch + serialize + render', before, after)
+
+    def report(self, label, before, after):
+        self.stdout.write(
+            f'{label:>28}: OrderSerializer {before * 1000:8.1f} ms, rows {after * 1000:8.1f} ms '
+            f'({before / after:.1f}x faster)'
+        )
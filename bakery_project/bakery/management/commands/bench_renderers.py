@@ -0,0 +1,55 @@
+"""
+Management command to benchmark the API renderers
+Renders the same OrderSerializer output with DRF's JSONRenderer, the
+orjson renderer and the MessagePack renderer, checks the orjson bytes
+match JSONRenderer's and the MessagePack payload decodes to the same data,
+and prints the best encode time and the payload size (raw and gzipped) of
+each. Benchmark orders and the benchmark user are deleted afterwards.
+"""
+import gzip
+import json
+
+from django.core.management.base import CommandError
+from django.db import connection
+from rest_framework.renderers import JSONRenderer
+from bakery.models import Order
+from bakery.renderers import MessagePackRenderer, ORJSONRenderer, msgpack, orjson
+from bakery.serializers import OrderSerializer
+
+from .bench_order_serializers import Command as OrderBenchCommand, best_of
+
+
+class Command(OrderBenchCommand):
+    help = 'Benchmark encode time and payload size of the JSON, orjson and MessagePack renderers'
+
+    def run(self, user, options):
+        if orjson is None or msgpack is None:
+            raise CommandError('bench_renderers needs the orjson and msgpack packages')
+
+        orders = (
+            Order.objects.filter(user=user)
+            .select_related('user', 'payment').prefetch_related('items__menu_item')
+        )
+        data = OrderSerializer(orders, many=True).data
+        repeat = options['repeat']
+        self.stdout.write(f'{connection.vendor}: {options["orders"]} orders x {options["items"]} items '
+                          f'of OrderSerializer output, best of {repeat}')
+
+        results = []
+        for label, renderer in [('JSONRenderer', JSONRenderer()), ('orjson', ORJSONRenderer()),
+                                ('MessagePack', MessagePackRenderer())]:
+            seconds, content = best_of(repeat, lambda: renderer.render(data))
+            results.append((label, seconds, content))
+
+        _, json_seconds, json_content = results[0]
+        if results[1][2] != json_content:
+            raise CommandError('orjson output differs from JSONRenderer output')
+        if msgpack.unpackb(results[2][2], raw=False) != json.loads(json_content):
+            raise CommandError('MessagePack payload decodes to different data')
+
+        for label, seconds, content in results:
+            self.stdout.write(
+                f'{label:>14}: encode {seconds * 1000:7.1f} ms ({json_seconds / seconds:4.1f}x), '
+                f'{len(content) / 1024:8.1f} KiB ({len(content) / len(json_content):4.0%} of JSON), '
+                f'gzipped {len(gzip.compress(content)) / 1024:7.1f} KiB'
+            )
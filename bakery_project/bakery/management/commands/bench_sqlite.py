@@ -0,0 +1,124 @@
+"""
+Management command to benchmark concurrent checkouts on SQLite
+For each mode (default, and tuned: SQLITE_TUNED=True) creates a fresh
+SQLite database in a temporary directory and runs this command again
+against it with --run. There, --threads threads each place --orders orders
+through POST /api/orders/ in-process, reading their current orders after
+each one, and the run reports orders per second, p50/p99 checkout latency
+and the failed requests ("database is locked"). The temporary databases
+are deleted afterwards.
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.test import Client
+from rest_framework.authtoken.models import Token
+from bakery.models import MenuItem, Order
+
+from .loadtest import percentile
+
+MODES = {'default': 'False', 'tuned': 'True'}
+
+
+class Command(BaseCommand):
+    help = 'Benchmark concurrent checkouts on SQLite, default against tuned mode'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=32, help='Threads placing orders')
+        parser.add_argument('--orders', type=int, default=20, help='Orders per thread')
+        parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES),
+                            help='SQLite modes to compare')
+        parser.add_argument('--run', action='store_true',
+                            help='Run the checkouts against the configured database (used internally)')
+
+    def handle(self, *args, **options):
+        if options['run']:
+            self.run_checkouts(options)
+            return
+
+        self.stdout.write(f'{options["threads"]} threads x {options["orders"]} orders')
+        manage = str(settings.BASE_DIR / 'manage.py')
+        for mode in options['modes']:
+            with tempfile.TemporaryDirectory() as directory:
+                env = {**os.environ, 'SQLITE_TUNED': MODES[mode], 'DEBUG': 'True',
+                       'SQLITE_PATH': os.path.join(directory, 'db.sqlite3')}
+                env.pop('DATABASE_URL', None)
+                subprocess.run([sys.executable, manage, 'migrate', '-v0'], env=env, check=True)
+                result = subprocess.run(
+                    [sys.executable, manage, 'bench_sqlite', '--run', '--threads', str(options['threads']),
+                     '--orders', str(options['orders'])],
+                    env=env, capture_output=True, text=True,
+                )
+                if result.returncode:
+                    raise CommandError(f'{mode} run failed:\n{result.stderr}')
+                self.stdout.write(f'{mode:>8}: {result.stdout.strip()}')
+
+    def run_checkouts(self, options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('bench_sqlite runs on SQLite only')
+        menu_items = [
+            MenuItem.objects.create(name=f'Bench Loaf {n}', price=20 + n, category='bread') for n in range(5)
+        ]
+        tokens = [
+            Token.objects.create(user=User.objects.create_user(username=f'bench-sqlite-{n}@bakery.local')).key
+            for n in range(options['threads'])
+        ]
+        connections.close_all()
+
+        timings, errors = [], Counter()
+        lock = threading.Lock()
+
+        def place_orders(token):
+            client = Client()
+            headers = {'HTTP_AUTHORIZATION': f'Token {token}'}
+            body = {'items': [{'menu_item_id': item.id, 'quantity': 2} for item in menu_items[:3]],
+                    'payment_method': 'cod', 'delivery_address': '1 Bench Street'}
+            try:
+                for _ in range(options['orders']):
+                    start = time.perf_counter()
+                    try:
+                        response = client.post('/api/orders/', body, content_type='application/json',
+                                               HTTP_IDEMPOTENCY_KEY=uuid.uuid4().hex, **headers)
+                        error = None if response.status_code == 201 else f'HTTP {response.status_code}'
+                    except OperationalError as exc:
+                        error = str(exc)
+                    elapsed = (time.perf_counter() - start) * 1000
+                    try:
+                        client.get('/api/orders/current/', **headers)
+                    except OperationalError as exc:
+                        with lock:
+                            errors[f'GET: {exc}'] += 1
+                    with lock:
+                        if error:
+                            errors[error] += 1
+                        else:
+                            timings.append(elapsed)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=place_orders, args=(token,)) for token in tokens]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        seconds = time.perf_counter() - start
+
+        timings.sort()
+        failed = ', '.join(f'{count}x {error}' for error, count in errors.most_common()) or 'none'
+        self.stdout.write(
+            f'{len(timings) / seconds:6.1f} orders/s, p50 {percentile(timings, 50):6.1f} ms, '
+            f'p99 {percentile(timings, 99):7.1f} ms, {len(timings)} placed '
+            # A checkout can fail after its order committed (saving the idempotent response)
+            f'({Order.objects.count()} saved), failed: {failed}'
+        )
@@ -0,0 +1,347 @@
+"""
+Management command to generate a large synthetic dataset for scale testing
+Creates customers, orders, order items and payments with realistic skew:
+a few customers place most orders, popular items sell most, order volume
+grows over the time span and peaks at breakfast and early evening, and
+statuses and timestamps follow each order's age (old orders are delivered
+or cancelled, recent ones are still moving through the kitchen).
+
+Orders are generated in chunks by a pool of worker processes. Each chunk
+is written in one transaction with COPY on PostgreSQL and batched
+executemany() INSERTs elsewhere; SQLite allows one writer, so there workers
+generate in parallel and take turns to write. Row ids are assigned up front, so
+only run this against a database the site is not writing to.
+
+Staff lookup rows are written with each chunk; per-user order stats and
+the sales rollups are rebuilt at the end. --delete removes everything a
+previous run created.
+"""
+import io
+import math
+import multiprocessing
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+from bakery.lookup import lookup_text
+from bakery.models import (
+    DailySales, MenuItem, Order, OrderItem, OrderLookup, OrderStatusEvent, Payment, UserOrderStats, UserProfile
+)
+
+USERNAME_PREFIX = 'synthetic-'
+
+# Relative order volume by hour of day (local opening hours 6:00-22:00)
+HOUR_WEIGHTS = [0, 0, 0, 0, 0, 0, 2, 6, 9, 8, 5, 4, 6, 5, 3, 3, 5, 7, 8, 6, 4, 2, 1, 0]
+QUANTITIES = [1, 2, 3, 4, 6, 12]
+QUANTITY_WEIGHTS = [50, 25, 10, 7, 5, 3]
+PAYMENT_METHODS = ['cod', 'upi', 'card', 'netbanking']
+PAYMENT_METHOD_WEIGHTS = [40, 35, 20, 5]
+STREETS = ['Baker Street', 'Mill Road', 'Station Road', 'Park Avenue', 'Church Lane', 'Market Square']
+CITIES = [('Mumbai', 'MH'), ('Bengaluru', 'KA'), ('Chennai', 'TN'), ('Pune', 'MH'), ('Hyderabad', 'TS')]
+
+# Set in each worker by init_worker()
+context = {}
+
+
+def synthetic_phone(user_id):
+    return f'+91 9{user_id % 10 ** 9:09d}'
+
+
+def order_status(rng, age):
+    """A plausible status for an order placed `age` ago"""
+    if age < timedelta(minutes=20):
+        return rng.choices(['pending', 'confirmed'], [3, 1])[0]
+    if age < timedelta(hours=1):
+        return rng.choices(['pending', 'confirmed', 'preparing', 'cancelled'], [1, 3, 4, 1])[0]
+    if age < timedelta(hours=3):
+        return rng.choices(['preparing', 'ready', 'delivered', 'cancelled'], [2, 3, 5, 1])[0]
+    # A few orders are never picked up and stay pending
+    return rng.choices(['delivered', 'cancelled', 'pending'], [90, 9, 1])[0]
+
+
+def payment_status(rng, method, status):
+    if status == 'cancelled':
+        return 'failed' if method == 'cod' else rng.choices(['refunded', 'failed'], [4, 1])[0]
+    if method == 'cod':
+        return 'completed' if status == 'delivered' else 'pending'
+    if status == 'pending':
+        return rng.choices(['pending', 'processing'], [3, 1])[0]
+    return 'completed'
+
+
+def init_worker(shared, write_lock):
+    context.update(shared, write_lock=write_lock)
+    # Forked workers must not reuse the parent's database connection
+    connections.close_all()
+
+
+def generate_chunk(chunk):
+    """Generate and write one chunk of orders; returns (orders, items) written"""
+    rng = random.Random(chunk['seed'])
+    now, span = context['now'], context['span']
+    delivery_fee = context['delivery_fee']
+    user_ids = rng.choices(context['user_ids'], cum_weights=context['user_weights'], k=len(chunk['item_counts']))
+    orders, items, payments, lookups = [], [], [], []
+    item_id = chunk['first_item_id']
+
+    for offset, (user_id, item_count) in enumerate(zip(user_ids, chunk['item_counts'])):
+        order_id = chunk['first_order_id'] + offset
+        # sqrt skews dates towards the end of the span: the bakery is growing
+        day = now - span * (1 - math.sqrt(rng.random()))
+        created_at = day.replace(hour=rng.choices(range(24), HOUR_WEIGHTS)[0],
+                                 minute=rng.randrange(60), second=rng.randrange(60))
+        if created_at > now:
+            created_at -= timedelta(days=1)
+        status = order_status(rng, now - created_at)
+        confirmed_at = delivered_at = None
+        if status not in ('pending', 'cancelled'):
+            confirmed_at = created_at + timedelta(minutes=rng.randint(2, 15))
+        if status == 'delivered':
+            delivered_at = confirmed_at + timedelta(minutes=rng.randint(30, 150))
+        updated_at = delivered_at or confirmed_at or created_at
+
+        total = Decimal('0.00')
+        menu_items = rng.choices(context['menu_items'], cum_weights=context['menu_weights'], k=item_count)
+        quantities = rng.choices(QUANTITIES, QUANTITY_WEIGHTS, k=item_count)
+        for (menu_item_id, price), quantity in zip(menu_items, quantities):
+            items.append((item_id, order_id, menu_item_id, quantity, price))
+            total += price * quantity
+            item_id += 1
+
+        address = f'{rng.randint(1, 999)} {rng.choice(STREETS)}'
+        order_number, transaction_id, phone = f'ORD-S{order_id:09d}', f'TXN-S{order_id:011d}', synthetic_phone(user_id)
+        orders.append((order_id, user_id, order_number, status, total, delivery_fee,
+                       address, phone, '', created_at, updated_at, confirmed_at, delivered_at))
+
+        method = rng.choices(PAYMENT_METHODS, PAYMENT_METHOD_WEIGHTS)[0]
+        paid = payment_status(rng, method, status)
+        upi_id = f'user{user_id}@upi' if method == 'upi' else ''
+        lookups.append((order_id, lookup_text(order_number, context['user_emails'][user_id], phone,
+                                              transaction_id, upi_id)))
+        payments.append((
+            order_id, order_id, method, paid, transaction_id, total + delivery_fee, upi_id,
+            f'{rng.randint(0, 9999):04d}' if method == 'card' else '',
+            '', None, '', created_at, delivered_at or updated_at,
+            (delivered_at or created_at + timedelta(minutes=1)) if paid == 'completed' else None,
+        ))
+
+    lock = context['write_lock']
+    if lock is not None:
+        lock.acquire()
+    try:
+        with transaction.atomic():
+            write_rows(Order, orders)
+            write_rows(OrderItem, items)
+            write_rows(Payment, payments)
+            write_rows(OrderLookup, lookups)
+    finally:
+        if lock is not None:
+            lock.release()
+    return len(orders), len(items)
+
+
+def copy_value(value):
+    """Encode a value for COPY ... FROM STDIN (text format)"""
+    if value is None:
+        return r'\N'
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+
+
+def write_rows(model, rows):
+    """Insert rows given as tuples in the model's concrete field order.
+
+    Plain SQL rather than bulk_create: compiling the model-level INSERT costs
+    several times more than running it, and SQLite caps each statement at
+    999 parameters.
+    """
+    db = connections[connection.alias]
+    fields = model._meta.concrete_fields
+    table = db.ops.quote_name(model._meta.db_table)
+    columns = ', '.join(db.ops.quote_name(field.column) for field in fields)
+    with db.cursor() as cursor:
+        if db.vendor == 'postgresql':
+            buffer = io.StringIO()
+            for row in rows:
+                buffer.write('\t'.join(map(copy_value, row)) + '\n')
+            buffer.seek(0)
+            cursor.copy_expert(f'COPY {table} ({columns}) FROM STDIN', buffer)
+            return
+
+        # Only dates and decimals need the backend's adaptation
+        adapted = [(index, field) for index, field in enumerate(fields)
+                   if field.get_internal_type() in ('DateTimeField', 'DecimalField')]
+        sql = f'INSERT INTO {table} ({columns}) VALUES ({", ".join(["%s"] * len(fields))})'
+        for start in range(0, len(rows), context['batch_size']):
+            batch = []
+            for row in rows[start:start + context['batch_size']]:
+                row = list(row)
+                for index, field in adapted:
+                    row[index] = field.get_db_prep_save(row[index], db)
+                batch.append(row)
+            cursor.executemany(sql, batch)
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic customers, orders, items and payments for scale testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Customers to create')
+        parser.add_argument('--orders', type=int, default=100000, help='Orders to create')
+        parser.add_argument('--items-per-order', type=int, default=3, help='Average line items per order')
+        parser.add_argument('--days', type=int, default=365, help='Time span the orders are spread over')
+        parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(),
+                            help='Generator processes')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Orders per worker transaction')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows per executemany() batch (not PostgreSQL)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--delete', action='store_true', help='Delete previously generated data and exit')
+
+    def handle(self, *args, **options):
+        if options['delete']:
+            self.delete_generated()
+            return
+
+        menu = list(MenuItem.objects.order_by('id').values_list('id', 'price'))
+        if not menu:
+            raise CommandError('No menu items; run init_menu first.')
+        if options['users'] < 1 or options['orders'] < 1 or options['items_per_order'] < 1:
+            raise CommandError('--users, --orders and --items-per-order must be positive.')
+
+        rng = random.Random(options['seed'])
+        started = time.perf_counter()
+        user_ids = self.create_users(options['users'], options['days'])
+        # Long-tailed demand: a few regulars and best sellers account for most orders
+        shared = {
+            'now': timezone.now(),
+            'span': timedelta(days=options['days']),
+            'delivery_fee': Decimal(settings.DELIVERY_FEE),
+            'batch_size': options['batch_size'],
+            'user_ids': user_ids,
+            'user_emails': dict(User.objects.filter(id__in=user_ids).values_list('id', 'email')),
+            'user_weights': self.cumulative(rng.paretovariate(1.2) for _ in user_ids),
+            'menu_items': menu,
+            'menu_weights': self.cumulative(1 / rank for rank in range(1, len(menu) + 1)),
+        }
+        chunks = self.plan_chunks(rng, options)
+        total_items = sum(sum(chunk['item_counts']) for chunk in chunks)
+        self.stdout.write(f'{connection.vendor}: {len(user_ids)} users, {options["orders"]} orders, '
+                          f'{total_items} items in {len(chunks)} chunks on {options["workers"]} workers')
+
+        self.run_chunks(chunks, shared, options['workers'])
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(no_style(), [Order, OrderItem, Payment]):
+                    cursor.execute(sql)
+
+        call_command('rebuild_order_stats', stdout=self.stdout)
+        # The rows carry past updated_at values, so an incremental refresh would miss them
+        call_command('refresh_sales_rollups', full=True, stdout=self.stdout)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Generated {options["orders"]} orders and {total_items} items in {elapsed:.1f}s '
+            f'({total_items / elapsed:,.0f} items/sec)'
+        ))
+
+    def cumulative(self, weights):
+        total, cumulative = 0, []
+        for weight in weights:
+            total += weight
+            cumulative.append(total)
+        return cumulative
+
+    def create_users(self, count, days):
+        start = User.objects.filter(username__startswith=USERNAME_PREFIX).count()
+        password = make_password(None)
+        joined = timezone.now() - timedelta(days=days)
+        users = User.objects.bulk_create([
+            User(username=f'{USERNAME_PREFIX}{n}@bakery.local', email=f'{USERNAME_PREFIX}{n}@bakery.local',
+                 first_name='Synthetic', last_name=f'Customer {n}', password=password, date_joined=joined)
+            for n in range(start, start + count)
+        ], batch_size=1000)
+        user_ids = [user.pk for user in users]
+        rng = random.Random(start)
+        UserProfile.objects.bulk_create([
+            UserProfile(user_id=user_id, city=city, state=state, phone=synthetic_phone(user_id),
+                        address=f'{rng.randint(1, 999)} {rng.choice(STREETS)}')
+            for user_id, (city, state) in zip(user_ids, rng.choices(CITIES, k=len(user_ids)))
+        ], batch_size=1000)
+        return user_ids
+
+    def plan_chunks(self, rng, options):
+        """Split the orders into chunks with pre-assigned id ranges"""
+        next_order_id = (Order.objects.aggregate(top=Max('id'))['top'] or 0) + 1
+        next_item_id = (OrderItem.objects.aggregate(top=Max('id'))['top'] or 0) + 1
+        most_items = 2 * options['items_per_order'] - 1
+        chunks = []
+        for start in range(0, options['orders'], options['chunk_size']):
+            size = min(options['chunk_size'], options['orders'] - start)
+            item_counts = [rng.randint(1, most_items) for _ in range(size)]
+            chunks.append({
+                'seed': rng.getrandbits(64),
+                'first_order_id': next_order_id,
+                'first_item_id': next_item_id,
+                'item_counts': item_counts,
+            })
+            next_order_id += size
+            next_item_id += sum(item_counts)
+        return chunks
+
+    def run_chunks(self, chunks, shared, workers):
+        written_orders = written_items = 0
+        started = time.perf_counter()
+
+        def progress(result):
+            nonlocal written_orders, written_items
+            written_orders += result[0]
+            written_items += result[1]
+            rate = written_items / (time.perf_counter() - started)
+            self.stdout.write(f'  {written_orders} orders, {written_items} items ({rate:,.0f} items/sec)')
+
+        if workers <= 1 or 'fork' not in multiprocessing.get_all_start_methods():
+            init_worker(shared, None)
+            for chunk in chunks:
+                progress(generate_chunk(chunk))
+            return
+
+        fork = multiprocessing.get_context('fork')
+        write_lock = fork.Lock() if connection.vendor == 'sqlite' else None
+        connections.close_all()
+        with fork.Pool(workers, initializer=init_worker, initargs=(shared, write_lock)) as pool:
+            for result in pool.imap_unordered(generate_chunk, chunks):
+                progress(result)
+
+    def delete_generated(self):
+        users = User.objects.filter(username__startswith=USERNAME_PREFIX)
+        orders = Order.objects.filter(user__in=users)
+        # Bulk deletes, bottom up: Order.delete() signals would update stats row by row
+        with transaction.atomic():
+            items = OrderItem.objects.filter(order__in=orders).delete()[0]
+            Payment.objects.filter(order__in=orders).delete()
+            OrderLookup.objects.filter(order__in=orders).delete()
+            OrderStatusEvent.objects.filter(user__in=users).delete()
+            UserOrderStats.objects.filter(user__in=users).delete()
+            # Synthetic orders span every rolled-up day
+            DailySales.objects.update(stale=True)
+            count = orders.count()
+            with connection.cursor() as cursor:
+                user_ids, params = users.values('id').query.sql_with_params()
+                cursor.execute(f'DELETE FROM {Order._meta.db_table} WHERE user_id IN ({user_ids})', params)
+            deleted_users = users.delete()[1].get(User._meta.label, 0)
+        call_command('refresh_sales_rollups', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Deleted {deleted_users} synthetic users, {count} orders and {items} items'
+        ))
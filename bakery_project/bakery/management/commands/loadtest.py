@@ -0,0 +1,270 @@
+"""
+Management command to load test the site with concurrent virtual users
+Each virtual user repeatedly runs a customer flow - browse the menu, log in,
+quote a cart, check out and poll their orders - against the WSGI app
+in-process (default) or a running server (--target http://127.0.0.1:8000).
+Reports p50/p95/p99 latency and requests per second per endpoint.
+
+--save-baseline writes the results as JSON; --compare reads one back and
+shows how each endpoint moved, failing with --max-regression when p95
+latency grew by more than that percentage.
+
+Load test users are created in the configured database (a --target server
+must share it) and deleted afterwards together with their orders.
+"""
+import json
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError, URLError
+from urllib.request import HTTPCookieProcessor, Request, build_opener
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.utils import timezone
+from bakery.models import MenuItem
+
+LOADTEST_PASSWORD = 'loadtest-password'
+
+
+def loadtest_username(index):
+    return f'loadtest-{index}@bakery.local'
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class InProcessTransport:
+    """Calls the WSGI application directly, no sockets involved"""
+
+    def __init__(self):
+        self.client = Client(raise_request_exception=False)
+
+    def request(self, method, path, data=None, headers=None):
+        extra = {f'HTTP_{name.upper().replace("-", "_")}': value for name, value in (headers or {}).items()}
+        if data is not None:
+            extra.update(data=json.dumps(data), content_type='application/json')
+        response = getattr(self.client, method.lower())(path, secure=True, **extra)
+        body = response.content if not response.streaming else b''.join(response.streaming_content)
+        return response.status_code, body
+
+
+class HTTPTransport:
+    """Talks to a running server over HTTP, keeping cookies per virtual user"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.opener = build_opener(HTTPCookieProcessor(CookieJar()))
+
+    def request(self, method, path, data=None, headers=None):
+        headers = dict(headers or {})
+        body = None
+        if data is not None:
+            body = json.dumps(data).encode()
+            headers['Content-Type'] = 'application/json'
+        request = Request(self.base_url + path, data=body, headers=headers, method=method)
+        try:
+            with self.opener.open(request, timeout=30) as response:
+                return response.status, response.read()
+        except HTTPError as error:
+            return error.code, error.read()
+
+
+class VirtualUser:
+    """One simulated customer running the flow in a loop"""
+
+    def __init__(self, index, transport, menu_item_ids, options):
+        self.email = loadtest_username(index)
+        self.transport = transport
+        self.menu_item_ids = menu_item_ids
+        self.polls = options['polls']
+        self.think_time = options['think_time']
+        self.rng = random.Random(index)
+        self.timings = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def call(self, method, path, data=None, headers=None, expect=200):
+        label = f'{method} {path.split("?")[0]}'
+        start = time.perf_counter()
+        try:
+            status, body = self.transport.request(method, path, data, headers)
+        except (URLError, OSError):
+            status, body = None, b''
+        self.timings[label].append((time.perf_counter() - start) * 1000)
+        if status != expect:
+            self.errors[label] += 1
+            return None
+        if self.think_time:
+            time.sleep(self.rng.uniform(0, self.think_time))
+        return json.loads(body) if body and path.startswith('/api/') else body
+
+    def run_flow(self):
+        self.call('GET', '/menu/')
+        self.call('GET', '/api/menu-items/categories/')
+        self.call('GET', '/api/menu-items/')
+
+        login = self.call('POST', '/api/auth/login/', {'email': self.email, 'password': LOADTEST_PASSWORD})
+        if login is None:
+            return
+        auth = {'Authorization': f'Token {login["token"]}'}
+
+        items = [
+            {'menu_item_id': item_id, 'quantity': self.rng.randint(1, 3)}
+            for item_id in self.rng.sample(self.menu_item_ids, min(3, len(self.menu_item_ids)))
+        ]
+        self.call('POST', '/api/cart/quote/', {'items': items})
+        self.call('POST', '/api/orders/', {'items': items, 'payment_method': 'cod',
+                                           'delivery_address': '1 Load Test Lane'},
+                  headers={**auth, 'Idempotency-Key': uuid.uuid4().hex}, expect=201)
+        for _ in range(self.polls):
+            self.call('GET', '/api/orders/current/', headers=auth)
+
+
+class Command(BaseCommand):
+    help = 'Load test customer flows with concurrent virtual users and report latency percentiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help='Concurrent virtual users')
+        parser.add_argument('--duration', type=float, default=30, help='Seconds to run for')
+        parser.add_argument('--iterations', type=int, default=0,
+                            help='Flows per user; overrides --duration when set')
+        parser.add_argument('--polls', type=int, default=3, help='Order polls at the end of each flow')
+        parser.add_argument('--think-time', type=float, default=0, help='Max random pause after each request (s)')
+        parser.add_argument('--target', default='', help='Base URL of a running server (default: in-process)')
+        parser.add_argument('--save-baseline', metavar='FILE', help='Write results to a JSON baseline')
+        parser.add_argument('--compare', metavar='FILE', help='Compare results with a saved baseline')
+        parser.add_argument('--max-regression', type=float, default=None,
+                            help='Fail when an endpoint p95 grows by more than this percentage')
+
+    def handle(self, *args, **options):
+        menu_item_ids = list(MenuItem.objects.filter(available=True).values_list('id', flat=True))
+        if not menu_item_ids:
+            raise CommandError('No available menu items; run init_menu first.')
+        baseline = self.load_baseline(options['compare']) if options['compare'] else None
+
+        users = self.create_users(options['users'])
+        target = options['target'] or 'in-process'
+        self.stdout.write(f'{target}: {options["users"]} virtual users, '
+                          + (f'{options["iterations"]} flows each' if options['iterations']
+                             else f'{options["duration"]:g}s'))
+        try:
+            virtual_users = [
+                VirtualUser(index, HTTPTransport(options['target']) if options['target'] else InProcessTransport(),
+                            menu_item_ids, options)
+                for index in range(len(users))
+            ]
+            elapsed = self.run(virtual_users, options)
+        finally:
+            User.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+        results = self.summarize(virtual_users, elapsed)
+        self.report(results)
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as baseline_file:
+                json.dump({
+                    'created': timezone.now().isoformat(),
+                    'target': target,
+                    'database': connection.vendor,
+                    'users': options['users'],
+                    'seconds': round(elapsed, 2),
+                    'endpoints': results,
+                }, baseline_file, indent=2)
+            self.stdout.write(f'Baseline saved to {options["save_baseline"]}')
+        if baseline is not None:
+            self.compare(baseline, results, options['max_regression'])
+        self.stdout.write(self.style.SUCCESS('Load test complete (load test users deleted)'))
+
+    def create_users(self, count):
+        users = []
+        for index in range(count):
+            user, _ = User.objects.get_or_create(username=loadtest_username(index),
+                                                 defaults={'email': loadtest_username(index)})
+            user.set_password(LOADTEST_PASSWORD)
+            user.save(update_fields=['password'])
+            users.append(user)
+        return users
+
+    def run(self, virtual_users, options):
+        deadline = time.monotonic() + options['duration']
+
+        def drive(virtual_user):
+            try:
+                flows = 0
+                while (flows < options['iterations'] if options['iterations']
+                       else time.monotonic() < deadline):
+                    virtual_user.run_flow()
+                    flows += 1
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=drive, args=(virtual_user,)) for virtual_user in virtual_users]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start
+
+    def summarize(self, virtual_users, elapsed):
+        timings = defaultdict(list)
+        errors = defaultdict(int)
+        for virtual_user in virtual_users:
+            for label, values in virtual_user.timings.items():
+                timings[label].extend(values)
+            for label, count in virtual_user.errors.items():
+                errors[label] += count
+        results = {}
+        for label, values in timings.items():
+            values.sort()
+            results[label] = {
+                'requests': len(values),
+                'errors': errors[label],
+                'rps': round(len(values) / elapsed, 2),
+                'p50_ms': round(percentile(values, 50), 2),
+                'p95_ms': round(percentile(values, 95), 2),
+                'p99_ms': round(percentile(values, 99), 2),
+            }
+        return results
+
+    def report(self, results):
+        self.stdout.write(f'{"endpoint":<34} {"reqs":>6} {"errs":>5} {"req/s":>8} '
+                          f'{"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}')
+        for label, row in results.items():
+            line = (f'{label:<34} {row["requests"]:>6} {row["errors"]:>5} {row["rps"]:>8.1f} '
+                    f'{row["p50_ms"]:>8.1f} {row["p95_ms"]:>8.1f} {row["p99_ms"]:>8.1f}')
+            self.stdout.write(self.style.ERROR(line) if row['errors'] else line)
+
+    def load_baseline(self, path):
+        try:
+            with open(path) as baseline_file:
+                return json.load(baseline_file)
+        except (OSError, ValueError) as error:
+            raise CommandError(f'Could not read baseline {path}: {error}')
+
+    def compare(self, baseline, results, max_regression):
+        self.stdout.write(f'Compared with baseline from {baseline.get("created", "?")} ({baseline.get("target")}):')
+        regressed = []
+        for label, row in results.items():
+            before = baseline['endpoints'].get(label)
+            if not before:
+                self.stdout.write(f'{label:<34} new endpoint')
+                continue
+            p95_change = (row['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0
+            rps_change = (row['rps'] - before['rps']) / before['rps'] * 100 if before['rps'] else 0
+            line = f'{label:<34} p95 {p95_change:+7.1f}%   req/s {rps_change:+7.1f}%'
+            if max_regression is not None and p95_change > max_regression:
+                regressed.append(label)
+                line = self.style.ERROR(line)
+            self.stdout.write(line)
+        if regressed:
+            raise CommandError(f'p95 regressed by more than {max_regression:g}% on: {", ".join(regressed)}')
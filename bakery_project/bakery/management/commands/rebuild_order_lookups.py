@@ -0,0 +1,31 @@
+"""
+Management command to rebuild the staff order lookup index
+Rewrites every OrderLookup row from the orders, users and payments tables
+in batches of orders, e.g. after loading orders with raw SQL.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from bakery.lookup import refresh_order_lookups
+from bakery.models import Order, OrderLookup
+
+
+class Command(BaseCommand):
+    help = 'Rebuild OrderLookup rows used by the admin and staff order search'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Orders per transaction')
+
+    def handle(self, *args, **options):
+        rebuilt, last_id = 0, 0
+        while True:
+            ids = list(Order.objects.filter(id__gt=last_id).order_by('id')
+                       .values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            with transaction.atomic():
+                rebuilt += refresh_order_lookups(ids)
+            last_id = ids[-1]
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Rebuilt {rebuilt} order lookup rows ({OrderLookup.objects.count()} in total)'
+        ))
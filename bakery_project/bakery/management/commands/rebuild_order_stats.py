@@ -0,0 +1,58 @@
+"""
+Management command to rebuild per-user order statistics
+Recomputes UserOrderStats from the orders table in batches of users. Each
+batch locks its stats rows first, so order writes that land meanwhile are
+applied on top of the rebuilt values instead of being lost. Use --check to
+report rows that have drifted without changing anything.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from bakery.models import Order, UserOrderStats
+from bakery.stats import STAT_FIELDS, stats_aggregates
+
+
+class Command(BaseCommand):
+    help = 'Rebuild (or with --check, verify) per-user order statistics'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Users per transaction')
+        parser.add_argument('--check', action='store_true', help='Report drifted rows without writing')
+
+    def handle(self, *args, **options):
+        user_ids = sorted(Order.objects.order_by().values_list('user_id', flat=True).distinct())
+        batch_size = options['batch_size']
+        drifted = 0
+
+        for start in range(0, len(user_ids), batch_size):
+            batch = user_ids[start:start + batch_size]
+            with transaction.atomic():
+                current = {
+                    stats.user_id: stats
+                    for stats in UserOrderStats.objects.select_for_update().filter(user_id__in=batch)
+                }
+                rows = (
+                    Order.objects.filter(user_id__in=batch).order_by()
+                    .values('user_id').annotate(**stats_aggregates())
+                )
+                rebuilt = [UserOrderStats(**row) for row in rows]
+                drifted += sum(1 for stats in rebuilt if self.has_drifted(current.get(stats.user_id), stats))
+                if not options['check']:
+                    UserOrderStats.objects.bulk_create(
+                        rebuilt, update_conflicts=True, unique_fields=['user'], update_fields=STAT_FIELDS
+                    )
+
+        # Rows for users whose orders are all gone are rebuilt as zeros on next use
+        orphans = UserOrderStats.objects.exclude(user_id__in=Order.objects.values('user_id'))
+        if options['check']:
+            drifted += orphans.exclude(total_orders=0).count()
+            self.stdout.write(f'{len(user_ids)} users checked, {drifted} with drifted stats')
+            return
+        orphans.delete()
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Rebuilt order stats for {len(user_ids)} users ({drifted} had drifted)'
+        ))
+
+    def has_drifted(self, stored, rebuilt):
+        if stored is None:
+            return True
+        return any(getattr(stored, field) != getattr(rebuilt, field) for field in STAT_FIELDS)
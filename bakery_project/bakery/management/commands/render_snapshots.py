@@ -0,0 +1,17 @@
+"""
+Management command to pre-render the public pages as static snapshots
+Run after deploys (templates may have changed); menu changes re-render
+automatically.
+"""
+from django.core.management.base import BaseCommand
+from bakery.snapshots import render_snapshots, snapshot_root
+
+
+class Command(BaseCommand):
+    help = 'Render index, menu, about and contact pages to static snapshots'
+
+    def handle(self, *args, **options):
+        manifest = render_snapshots()
+        for path, filename in manifest.items():
+            self.stdout.write(f'{path} -> {filename}')
+        self.stdout.write(self.style.SUCCESS(f'✓ {len(manifest)} snapshots written to {snapshot_root()}'))
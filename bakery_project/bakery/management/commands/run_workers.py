@@ -0,0 +1,111 @@
+"""
+Management command to run background job workers
+Each worker thread claims due jobs from the Job table, runs them and
+records timing; failed jobs are retried with backoff. Stop with Ctrl+C.
+"""
+import os
+import socket
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.db.models import Avg, Count, Max, Q
+from bakery.events import prune_status_events
+from bakery.idempotency import prune_expired_keys
+from bakery.jobs import claim_job, prune_finished_jobs, requeue_stale_jobs, run_job
+from bakery.models import Job
+
+HOUSEKEEPING_INTERVAL = 60
+
+
+class Command(BaseCommand):
+    help = 'Run background job workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=int(os.environ.get('JOB_CONCURRENCY', 2)),
+                            help='Worker threads to run')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--burst', action='store_true',
+                            help='Exit once there are no due jobs left')
+        parser.add_argument('--stats', action='store_true',
+                            help='Print per-job timing stats and exit')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.print_stats()
+            return
+
+        self.stop = threading.Event()
+        self.counts = {'succeeded': 0, 'failed': 0}
+        self.lock = threading.Lock()
+        prefix = f'{socket.gethostname()}:{os.getpid()}'
+
+        threads = [
+            threading.Thread(target=self.work, args=(f'{prefix}:{i}', options), daemon=True)
+            for i in range(options['concurrency'])
+        ]
+        self.stdout.write(f'Starting {len(threads)} workers...')
+        for thread in threads:
+            thread.start()
+
+        try:
+            last_housekeeping = 0
+            while any(thread.is_alive() for thread in threads):
+                if time.monotonic() - last_housekeeping > HOUSEKEEPING_INTERVAL:
+                    self.housekeeping()
+                    last_housekeeping = time.monotonic()
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping workers after their current job...')
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {self.counts["succeeded"]} jobs succeeded, {self.counts["failed"]} attempts failed'
+        ))
+        self.print_stats()
+
+    def work(self, worker_id, options):
+        """Claim and run jobs until stopped"""
+        try:
+            while not self.stop.is_set():
+                close_old_connections()
+                claimed = claim_job(worker_id)
+                if claimed is None:
+                    if options['burst']:
+                        return
+                    self.stop.wait(options['poll_interval'])
+                    continue
+                outcome = 'succeeded' if run_job(claimed) else 'failed'
+                with self.lock:
+                    self.counts[outcome] += 1
+                self.stdout.write(f'[{worker_id}] {claimed.name} #{claimed.pk} {outcome} in {claimed.duration_ms}ms')
+        finally:
+            connection.close()
+
+    def housekeeping(self):
+        requeued = requeue_stale_jobs()
+        if requeued:
+            self.stdout.write(self.style.WARNING(f'Requeued {requeued} stale jobs'))
+        prune_finished_jobs()
+        prune_expired_keys()
+        prune_status_events()
+        connection.close()
+
+    def print_stats(self):
+        """Per-job counts and timings"""
+        rows = Job.objects.values('name').annotate(
+            total=Count('id'),
+            queued=Count('id', filter=Q(status='queued')),
+            failed=Count('id', filter=Q(status='failed')),
+            avg_ms=Avg('duration_ms'),
+            max_ms=Max('duration_ms'),
+        ).order_by('name')
+        for row in rows:
+            self.stdout.write(
+                f'{row["name"]:>28}: {row["total"]} jobs, {row["queued"]} queued, {row["failed"]} failed, '
+                f'avg {row["avg_ms"] or 0:.0f}ms, max {row["max_ms"] or 0}ms'
+            )
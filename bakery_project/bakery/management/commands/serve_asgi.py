@@ -0,0 +1,42 @@
+"""
+Management command to serve the site with uvicorn (local ASGI mode)
+Runs bakery_project.asgi; with ASYNC_API=True in the environment the
+read-heavy API endpoints are served by their async views (see
+bakery/async_api.py). Production runs the same application under gunicorn
+with uvicorn workers (Procfile).
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+try:
+    import uvicorn
+except ImportError:
+    uvicorn = None
+
+
+class Command(BaseCommand):
+    help = 'Serve the site with uvicorn (ASGI; async API views with ASYNC_API=True)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1', help='Interface to bind')
+        parser.add_argument('--port', type=int, default=8000, help='Port to bind')
+        parser.add_argument('--workers', type=int, default=1, help='Worker processes')
+        parser.add_argument('--reload', action='store_true', help='Restart on code changes (one worker)')
+
+    def handle(self, *args, **options):
+        if uvicorn is None:
+            raise CommandError('serve_asgi needs the uvicorn package')
+        if options['reload'] and options['workers'] > 1:
+            raise CommandError('--reload runs a single worker')
+
+        self.stdout.write(f'Serving bakery_project.asgi on http://{options["host"]}:{options["port"]}/ '
+                          f'with {options["workers"]} uvicorn worker(s)')
+        uvicorn.run(
+            'bakery_project.asgi:application',
+            app_dir=str(settings.BASE_DIR),
+            host=options['host'],
+            port=options['port'],
+            workers=None if options['reload'] else options['workers'],
+            reload=options['reload'],
+            lifespan='off',
+        )
@@ -0,0 +1,135 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.urls import reverse
+from django.utils.cache import patch_vary_headers
+from whitenoise.base import WhiteNoise
+from whitenoise.middleware import WhiteNoiseMiddleware
+from whitenoise.responders import NotARegularFileError
+
+from .snapshots import SNAPSHOT_PAGES, SnapshotManifest, snapshots_enabled
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoiseMiddleware that also runs async.
+
+    WhiteNoise's own middleware is sync-only, so under ASGI Django would run
+    every request below it through async_to_sync, on a thread. Static file
+    hits are served from a worker thread instead; everything else goes
+    straight on down the async stack.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            # Looks on disk (DEBUG / WHITENOISE_AUTOREFRESH)
+            static_file = await sync_to_async(self.find_file, thread_sensitive=False)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+        return await self.get_response(request)
+
+
+class StaticSnapshotMiddleware:
+    """
+    Serve pre-rendered public pages to anonymous visitors through WhiteNoise.
+
+    Must sit above SessionMiddleware so a snapshot hit skips sessions,
+    messages and template rendering entirely. Requests with a session or
+    messages cookie, a query string, or no published snapshot fall through
+    to the live view.
+
+    Runs sync or async, whichever the rest of the stack is, so it never
+    forces the ASGI handler to adapt the stack below it to sync. Under ASGI
+    the snapshot files are opened in a worker thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.manifest = SnapshotManifest()
+        self.whitenoise = WhiteNoise(application=None, max_age=getattr(settings, 'SNAPSHOT_MAX_AGE', 60))
+        self.static_files = {}
+        self.paths = None
+
+    def is_anonymous(self, request):
+        return (
+            settings.SESSION_COOKIE_NAME not in request.COOKIES
+            and 'messages' not in request.COOKIES
+        )
+
+    def wants_snapshot(self, request):
+        """Whether request may be answered from a snapshot (checked without touching the disk)"""
+        if not snapshots_enabled() or request.method not in ('GET', 'HEAD'):
+            return False
+        if self.paths is None:
+            self.paths = {reverse(name) for name in SNAPSHOT_PAGES}
+        return (
+            request.path_info in self.paths
+            and not request.META.get('QUERY_STRING')
+            and self.is_anonymous(request)
+        )
+
+    def get_static_file(self, path):
+        snapshot = self.manifest.get(path)
+        if snapshot is None:
+            return None
+        static_file = self.static_files.get(snapshot.name)
+        if static_file is None:
+            try:
+                static_file = self.whitenoise.get_static_file(str(snapshot), path)
+            except (OSError, NotARegularFileError):
+                return None
+            # Fingerprinted files never change, so only stale generations
+            # need evicting
+            if len(self.static_files) >= 4 * len(SNAPSHOT_PAGES):
+                self.static_files.clear()
+            self.static_files[snapshot.name] = static_file
+        return static_file
+
+    def serve_snapshot(self, request):
+        """The published snapshot of this page as a response, or None"""
+        static_file = self.get_static_file(request.path_info)
+        if static_file is None:
+            return None
+        try:
+            response = WhiteNoiseMiddleware.serve(static_file, request)
+        except FileNotFoundError:
+            # Replaced by a newer generation between lookup and open
+            return None
+        # Signed-in visitors get a different page at the same URL
+        patch_vary_headers(response, ['Cookie'])
+        # XFrameOptionsMiddleware sits below and never sees this response
+        response['X-Frame-Options'] = getattr(settings, 'X_FRAME_OPTIONS', 'DENY').upper()
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.serve_snapshot(request) if self.wants_snapshot(request) else None
+        if response is None:
+            response = self.get_response(request)
+        return response
+
+    async def __acall__(self, request):
+        response = None
+        if self.wants_snapshot(request):
+            response = await sync_to_async(self.serve_snapshot, thread_sensitive=False)(request)
+        if response is None:
+            response = await self.get_response(request)
+        return response
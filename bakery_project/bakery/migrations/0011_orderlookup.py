@@ -0,0 +1,89 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from bakery.lookup import FTS_TABLE, lookup_text, sqlite_has_trigram
+
+SQLITE_FORWARD = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        text, content='bakery_orderlookup', content_rowid='order_id', tokenize='trigram'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON bakery_orderlookup BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.order_id, new.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON bakery_orderlookup BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.order_id, old.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON bakery_orderlookup BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.order_id, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.order_id, new.text);
+    END""",
+]
+
+SQLITE_BACKWARD = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS bakery_orderlookup_text_trgm ON bakery_orderlookup USING gin (text gin_trgm_ops)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS bakery_orderlookup_text_trgm",
+]
+
+
+def run_statements(schema_editor, sqlite_statements, postgres_statements):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite' and sqlite_has_trigram(connection):
+        statements = sqlite_statements
+    elif connection.vendor == 'postgresql':
+        statements = postgres_statements
+    else:
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_lookup_index(apps, schema_editor):
+    run_statements(schema_editor, SQLITE_FORWARD, POSTGRES_FORWARD)
+
+    # Backfill existing orders (the triggers above index them as they go in)
+    Order = apps.get_model('bakery', 'Order')
+    OrderLookup = apps.get_model('bakery', 'OrderLookup')
+    rows = Order.objects.order_by().values_list('id', 'order_id', 'user__email', 'delivery_phone',
+                                                'payment__transaction_id', 'payment__upi_id')
+    batch = []
+    for pk, *values in rows.iterator(chunk_size=2000):
+        batch.append(OrderLookup(order_id=pk, text=lookup_text(*values)))
+        if len(batch) == 2000:
+            OrderLookup.objects.bulk_create(batch)
+            batch = []
+    OrderLookup.objects.bulk_create(batch)
+
+
+def drop_lookup_index(apps, schema_editor):
+    run_statements(schema_editor, SQLITE_BACKWARD, POSTGRES_BACKWARD)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bakery', '0010_admin_changelist_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderLookup',
+            fields=[
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='lookup', serialize=False, to='bakery.order')),
+                ('text', models.TextField()),
+            ],
+        ),
+        migrations.RunPython(create_lookup_index, drop_lookup_index),
+    ]
@@ -1,3 +1,5 @@
+from decimal import Decimal
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
@@ -27,11 +29,37 @@ class MenuItem(models.Model):
     
     class Meta:
         ordering = ['category', 'name']
+        indexes = [
+            # Public menu: available items by category, in display order
+            models.Index(fields=['category', 'name'], condition=models.Q(available=True),
+                         name='bakery_menu_available_idx'),
+        ]
     
     def __str__(self):
         return self.name
 
 
+# Orders still in progress (Order.ACTIVE_STATUSES; also the partial index condition)
+ACTIVE_ORDER_STATUSES = ['pending', 'confirmed', 'preparing', 'ready']
+
+# The Order fields order_stats_contribution() reads
+STATS_SOURCE_FIELDS = {'status', 'total_amount', 'delivery_fee'}
+
+# The Order fields its OrderLookup text is built from
+LOOKUP_SOURCE_FIELDS = ('order_id', 'user_id', 'delivery_phone')
+
+
+def order_stats_contribution(status, total_amount, delivery_fee):
+    """Counter values one order in this state adds to UserOrderStats"""
+    return {
+        'total_orders': 1,
+        'pending_orders': int(status == 'pending'),
+        'completed_orders': int(status == 'delivered'),
+        'cancelled_orders': int(status == 'cancelled'),
+        'total_spent': Decimal(str(total_amount)) + Decimal(str(delivery_fee)) if status == 'delivered' else Decimal('0'),
+    }
+
+
 class Order(models.Model):
     """Customer orders with status tracking"""
     STATUS_CHOICES = [
@@ -42,6 +70,8 @@ class Order(models.Model):
         ('delivered', 'Delivered'),
         ('cancelled', 'Cancelled'),
     ]
+    ACTIVE_STATUSES = ACTIVE_ORDER_STATUSES
+    HISTORY_STATUSES = ['delivered', 'cancelled']
     
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders')
     order_id = models.CharField(max_length=100, unique=True)
@@ -62,10 +92,95 @@ class Order(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # A customer's orders by status, newest first. Ascending columns
+            # read backwards match the keyset order (-created_at, -id) exactly
+            models.Index(fields=['user', 'status', 'created_at', 'id'], name='bakery_order_user_status_idx'),
+            # Staff views filtered by status
+            models.Index(fields=['status', 'created_at'], name='bakery_order_status_idx'),
+            # Open orders across all customers
+            models.Index(fields=['created_at', 'id'], name='bakery_order_active_idx',
+                         condition=models.Q(status__in=ACTIVE_ORDER_STATUSES)),
+            # All orders newest first: the admin changelist and its date hierarchy
+            models.Index(fields=['created_at', 'id'], name='bakery_order_created_idx'),
+            # Orders changed since the last sales rollup refresh
+            models.Index(fields=['updated_at'], name='bakery_order_updated_idx'),
+        ]
     
     def __str__(self):
         return f"Order {self.order_id} - {self.user.username}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # What UserOrderStats last counted this order as, and what its
+        # OrderLookup row was built from, are worked out from the row as
+        # loaded, and only if the order is saved or deleted
+        instance._loaded_row = (field_names, values)
+        return instance
+    
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        stored = None
+        if any(field.attname in STATS_SOURCE_FIELDS for field, _, _ in values):
+            stored = self.stored_stats_fields()
+        if stored is None:
+            return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+        # Only overwrite the row as this copy counted it. If another save
+        # changed it since, count against that row instead: two copies of one
+        # order cancelled in turn must not both move a pending order to
+        # cancelled in UserOrderStats. The UPDATE's WHERE does the check, so
+        # it holds on SQLite too and costs no extra query unless it fails.
+        while True:
+            if super()._do_update(base_qs.filter(**stored), using, pk_val, values, update_fields, forced_update):
+                return True
+            stored = base_qs.filter(pk=pk_val).values(*STATS_SOURCE_FIELDS).first()
+            if stored is None:
+                return False
+            self._stored_stats_fields = stored
+    
+    def loaded_row(self):
+        """{field: value} as this instance was loaded from the database ({} if it wasn't)"""
+        field_names, values = self.__dict__.get('_loaded_row', ((), ()))
+        return dict(zip(field_names, values))
+    
+    def lookup_source(self):
+        """The fields of this order that its OrderLookup text is built from"""
+        fields = self.__dict__
+        return tuple(fields.get(name) for name in LOOKUP_SOURCE_FIELDS)
+    
+    def stored_lookup_source(self):
+        """lookup_source() as last loaded or saved (None if not known)"""
+        if '_lookup_source' not in self.__dict__:
+            row = self.loaded_row()
+            self._lookup_source = tuple(row.get(name) for name in LOOKUP_SOURCE_FIELDS) if row else None
+        return self._lookup_source
+    
+    def stats_fields(self):
+        """The fields UserOrderStats counts this order by, as set on this instance (None if deferred)"""
+        fields = self.__dict__
+        if not STATS_SOURCE_FIELDS <= fields.keys():
+            return None
+        return {name: fields[name] for name in STATS_SOURCE_FIELDS}
+    
+    def stored_stats_fields(self):
+        """stats_fields() as last loaded or saved (None if not known)"""
+        if '_stored_stats_fields' not in self.__dict__:
+            row = self.loaded_row()
+            self._stored_stats_fields = (
+                {name: row[name] for name in STATS_SOURCE_FIELDS} if STATS_SOURCE_FIELDS <= row.keys() else None
+            )
+        return self._stored_stats_fields
+    
+    def stats_contribution(self):
+        """What this order adds to its owner's UserOrderStats row"""
+        fields = self.stats_fields()
+        return order_stats_contribution(**fields) if fields else None
+    
+    def counted_as(self):
+        """What UserOrderStats last counted this order as (None if not known)"""
+        stored = self.stored_stats_fields()
+        return order_stats_contribution(**stored) if stored else None
+    
     @property
     def grand_total(self):
         """Total amount including delivery fee"""
@@ -126,10 +241,26 @@ class Payment(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['payment_status', 'created_at'], name='bakery_payment_status_idx'),
+            models.Index(fields=['created_at', 'id'], name='bakery_payment_created_idx'),
+        ]
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what this payment added to its order's OrderLookup row
+        instance._lookup_source = instance.lookup_source()
+        return instance
     
     def __str__(self):
         return f"Payment {self.transaction_id} - {self.order.order_id}"
     
+    def lookup_source(self):
+        """The fields of this payment that its order's OrderLookup text is built from"""
+        fields = self.__dict__
+        return tuple(fields.get(name) for name in ('order_id', 'transaction_id', 'upi_id'))
+    
     def mark_as_completed(self):
         """Mark payment as completed"""
         self.payment_status = 'completed'
@@ -154,3 +285,158 @@ class UserProfile(models.Model):
     
     def __str__(self):
         return f"Profile - {self.user.username}"
+
+
+class IdempotencyKey(models.Model):
+    """Stored response for a POST carrying an Idempotency-Key header"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    
+    # Empty until the first request finishes
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key_per_user'),
+        ]
+    
+    def __str__(self):
+        return f"Idempotency key {self.key}"
+    
+    @property
+    def is_complete(self):
+        return self.status_code is not None
+
+
+class Job(models.Model):
+    """Background job stored in the database and run by manage.py run_workers"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+    
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    last_error = models.TextField(blank=True)
+    
+    # Scheduling and locking
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    
+    # Timing
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    duration_ms = models.PositiveIntegerField(null=True, blank=True, help_text="Duration of the last attempt")
+    
+    class Meta:
+        ordering = ['run_at']
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='bakery_job_claim_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Job {self.name} #{self.pk} ({self.status})"
+
+
+class OrderStatusEvent(models.Model):
+    """Order status change, streamed to the customer's open orders page"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='status_events')
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['user', 'id'], name='bakery_event_user_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Order {self.order_id} -> {self.status}"
+
+
+class UserOrderStats(models.Model):
+    """Per-user order counters, kept up to date as orders change (see stats.py)"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='order_stats')
+    total_orders = models.PositiveIntegerField(default=0)
+    pending_orders = models.PositiveIntegerField(default=0)
+    completed_orders = models.PositiveIntegerField(default=0)
+    cancelled_orders = models.PositiveIntegerField(default=0)
+    total_spent = models.DecimalField(max_digits=12, decimal_places=2, default=0,
+                                      help_text="Grand total of delivered orders")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name_plural = "User order stats"
+    
+    def __str__(self):
+        return f"Order stats - {self.user_id}"
+
+
+class OrderLookup(models.Model):
+    """Normalized text that staff find an order by (see lookup.py).
+
+    One row per order: order id, customer email, phone digits and payment
+    transaction and UPI ids, indexed for substring search.
+    """
+    order = models.OneToOneField(Order, on_delete=models.CASCADE, primary_key=True, related_name='lookup')
+    text = models.TextField()
+    
+    def __str__(self):
+        return f"Lookup - {self.order_id}"
+
+
+class DailySales(models.Model):
+    """Sales totals for one day, refreshed from orders (see rollups.py).
+
+    Cancelled orders are left out. Days are in settings.TIME_ZONE.
+    """
+    day = models.DateField(primary_key=True)
+    orders = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0,
+                                  help_text="Item subtotals, without delivery fees")
+    delivery_fees = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    refreshed_at = models.DateTimeField()
+    stale = models.BooleanField(default=False, help_text="An order on this day was deleted")
+    
+    class Meta:
+        ordering = ['day']
+        verbose_name_plural = "Daily sales"
+    
+    def __str__(self):
+        return f"Sales - {self.day}"
+
+
+class DailyItemSales(models.Model):
+    """Units and revenue for one menu item on one day (see rollups.py)"""
+    day = models.DateField()
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='+')
+    # As it was when the day was rolled up, so category reports need no join
+    category = models.CharField(max_length=50)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        ordering = ['day', 'menu_item']
+        verbose_name_plural = "Daily item sales"
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'menu_item'], name='bakery_itemsales_day_item_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['category', 'day'], name='bakery_itemsales_category_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Sales - {self.day} - {self.menu_item_id}"
@@ -0,0 +1,140 @@
+"""
+Lean read path for order lists: OrderSerializer's output built from rows.
+
+OrderSerializer runs DRF's field machinery for every value of every order,
+item and payment (get_attribute, to_representation, nested serializers),
+which dominates the time spent on a page of orders. For the read-only
+order lists (current, history and the dashboard's recent orders) the same
+JSON is assembled here from .values() rows: one query for the orders with
+their user and payment, one for all their items with the menu item.
+
+The output must stay identical to OrderSerializer's, key order included;
+the values are formatted with the same DRF field classes the serializer
+uses, and tests compare the two renderings byte for byte. Add a field
+there, add it here.
+"""
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import serializers
+
+from .models import Order, OrderItem
+
+ORDER_FIELDS = [
+    'id', 'order_id', 'user_id', 'user__email', 'user__first_name', 'user__last_name', 'status',
+    'total_amount', 'delivery_fee', 'delivery_address', 'delivery_phone', 'delivery_notes',
+    'created_at', 'updated_at', 'confirmed_at', 'delivered_at',
+    'payment__id', 'payment__payment_method', 'payment__payment_status', 'payment__transaction_id',
+    'payment__amount', 'payment__upi_id', 'payment__card_last4', 'payment__created_at',
+    'payment__updated_at', 'payment__paid_at',
+]
+
+ITEM_FIELDS = ['id', 'order_id', 'menu_item_id', 'menu_item__name', 'menu_item__price', 'quantity', 'price']
+
+STATUS_LABELS = dict(Order.STATUS_CHOICES)
+
+# The formatter OrderSerializer's money fields use
+money = serializers.DecimalField(max_digits=10, decimal_places=2).to_representation
+
+
+def timestamp_formatter():
+    """DateTimeField's formatter with the current time zone looked up once, not per value"""
+    current = timezone.get_current_timezone() if settings.USE_TZ else None
+    return serializers.DateTimeField(default_timezone=current).to_representation
+
+
+def order_values(queryset):
+    """The order rows for a queryset (filters and ordering kept, related lookups dropped)"""
+    return queryset.select_related(None).prefetch_related(None).values(*ORDER_FIELDS)
+
+
+def item_values(order_ids):
+    return OrderItem.objects.filter(order_id__in=order_ids).order_by('id').values(*ITEM_FIELDS)
+
+
+def item_row(row):
+    return {
+        'id': row['id'],
+        'menu_item': row['menu_item_id'],
+        'menu_item_name': row['menu_item__name'],
+        'menu_item_price': money(row['menu_item__price']),
+        'quantity': row['quantity'],
+        'price': money(row['price']),
+        'subtotal': money(row['price'] * row['quantity']),
+    }
+
+
+def item_rows(order_ids):
+    """Serialized items grouped by order id"""
+    items = {order_id: [] for order_id in order_ids}
+    for row in item_values(order_ids):
+        items[row['order_id']].append(item_row(row))
+    return items
+
+
+async def aitem_rows(order_ids):
+    items = {order_id: [] for order_id in order_ids}
+    async for row in item_values(order_ids):
+        items[row['order_id']].append(item_row(row))
+    return items
+
+
+def payment_row(row, timestamp):
+    if row['payment__id'] is None:
+        return None
+    return {
+        'id': row['payment__id'],
+        'order': row['id'],
+        'order_id': row['order_id'],
+        'payment_method': row['payment__payment_method'],
+        'payment_status': row['payment__payment_status'],
+        'transaction_id': row['payment__transaction_id'],
+        'amount': money(row['payment__amount']),
+        'upi_id': row['payment__upi_id'],
+        'card_last4': row['payment__card_last4'],
+        'created_at': timestamp(row['payment__created_at']),
+        'updated_at': timestamp(row['payment__updated_at']),
+        'paid_at': timestamp(row['payment__paid_at']),
+    }
+
+
+def serialize_orders(rows, items=None):
+    """OrderSerializer(many=True).data for order_values() rows, as plain dicts.
+
+    items (from item_rows()) is fetched for the rows when not given.
+    """
+    rows = list(rows)
+    if items is None:
+        items = item_rows([row['id'] for row in rows])
+    timestamp = timestamp_formatter()
+    return [
+        {
+            'id': row['id'],
+            'order_id': row['order_id'],
+            'user': row['user_id'],
+            'user_email': row['user__email'],
+            # User.get_full_name()
+            'user_name': f"{row['user__first_name']} {row['user__last_name']}".strip(),
+            'status': row['status'],
+            'status_display': STATUS_LABELS.get(row['status'], row['status']),
+            'total_amount': money(row['total_amount']),
+            'delivery_fee': money(row['delivery_fee']),
+            'grand_total': money(row['total_amount'] + row['delivery_fee']),
+            'delivery_address': row['delivery_address'],
+            'delivery_phone': row['delivery_phone'],
+            'delivery_notes': row['delivery_notes'],
+            'items': items[row['id']],
+            'payment': payment_row(row, timestamp),
+            'created_at': timestamp(row['created_at']),
+            'updated_at': timestamp(row['updated_at']),
+            'confirmed_at': timestamp(row['confirmed_at']),
+            'delivered_at': timestamp(row['delivered_at']),
+        }
+        for row in rows
+    ]
+
+
+async def aserialize_orders(rows):
+    """serialize_orders() for a queryset of rows or a list, fetched with the async ORM"""
+    if not isinstance(rows, list):
+        rows = [row async for row in rows]
+    return serialize_orders(rows, await aitem_rows([row['id'] for row in rows]))
@@ -0,0 +1,184 @@
+"""
+Keyset (cursor) pagination for the order and payment APIs.
+
+Pages are selected with a WHERE on (created_at, id) rather than OFFSET, so
+fetching page 1000 costs the same as fetching page 1.
+
+Also EstimatedCountPaginator, which spares the admin changelists an exact
+COUNT(*) over millions of rows.
+"""
+import base64
+import json
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def encode_cursor(obj):
+    """Opaque cursor for the position just after obj (a model instance or a .values() row)"""
+    created_at, pk = (obj['created_at'], obj['id']) if isinstance(obj, dict) else (obj.created_at, obj.pk)
+    raw = json.dumps([created_at.isoformat(), pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(created_at, id) from a cursor; raises ValueError if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, pk = json.loads(raw)
+        created_at, pk = parse_datetime(created_at), int(pk)
+    except (TypeError, ValueError) as e:
+        raise ValueError('Invalid cursor') from e
+    if created_at is None:
+        raise ValueError('Invalid cursor')
+    return created_at, pk
+
+
+def keyset_queryset(queryset, position, page_size):
+    """The rows of one page newest first after position, plus one to tell whether there is a next page"""
+    queryset = queryset.order_by('-created_at', '-id')
+    if position is not None:
+        created_at, pk = position
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        )
+    # The extra row tells whether a next page exists without a COUNT
+    return queryset[:page_size + 1]
+
+
+def keyset_page(queryset, position, page_size):
+    """One page newest first after position (or from the start); returns (rows, has_next)"""
+    rows = list(keyset_queryset(queryset, position, page_size))
+    return rows[:page_size], len(rows) > page_size
+
+
+async def akeyset_page(queryset, position, page_size):
+    rows = [row async for row in keyset_queryset(queryset, position, page_size)]
+    return rows[:page_size], len(rows) > page_size
+
+
+class KeysetPagination(BasePagination):
+    """Opaque-cursor pagination on (created_at, id), newest first.
+
+    Any ?ordering= requested by the client is replaced by the keyset order.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        page_size = getattr(settings, 'API_PAGE_SIZE', 20)
+        max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 100)
+        try:
+            requested = int(request.query_params[self.page_size_query_param])
+            if requested > 0:
+                page_size = min(requested, max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return page_size
+
+    def encode_cursor(self, obj):
+        return encode_cursor(obj)
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            return decode_cursor(cursor)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+
+        self.page, self.has_next = keyset_page(queryset, position, page_size)
+        return self.page
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+
+        self.page, self.has_next = await akeyset_page(queryset, position, page_size)
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_first_link(self):
+        return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'first': self.get_first_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'first': {'type': 'string', 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+def estimated_count(queryset):
+    """The database's estimate of a queryset's row count, or None if it has none.
+
+    PostgreSQL: the planner's row estimate for the query. SQLite: the table
+    size recorded by ANALYZE, for unfiltered querysets only.
+    """
+    connection = connections[queryset.db]
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                sql, params = queryset.query.sql_with_params()
+                cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                return int(plan[0]['Plan']['Plan Rows'])
+            if connection.vendor == 'sqlite' and not queryset.query.where:
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+                               [queryset.model._meta.db_table])
+                row = cursor.fetchone()
+                return int(row[0].split()[0]) if row else None
+    except DatabaseError:
+        # e.g. no sqlite_stat1 table until ANALYZE has run
+        return None
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that uses the database's row estimate for large result sets.
+
+    An exact COUNT(*) reads every matching row; above ADMIN_EXACT_COUNT_LIMIT
+    the estimate is used instead, so the total shown is approximate and the
+    last page may be short.
+    """
+
+    @cached_property
+    def count(self):
+        estimate = estimated_count(self.object_list)
+        if estimate is not None and estimate > getattr(settings, 'ADMIN_EXACT_COUNT_LIMIT', 100000):
+            return estimate
+        return super().count
@@ -0,0 +1,41 @@
+"""
+PostgreSQL backend whose connections come from the worker's pool (bakery/db_pool.py)
+
+Set as ENGINE by settings.py when DB_POOL=True; pool sizes and timeouts
+come from the database's POOL settings.
+"""
+from functools import partial
+
+from django.db.backends.postgresql import base, creation
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+
+from bakery.db_pool import PoolTimeout, close_pools, get_pool
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Pooled connections to the test database would block DROP DATABASE
+        close_pools(test_database_name)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def get_new_connection(self, conn_params):
+        """Check out a pooled connection instead of opening one"""
+        connect = partial(base.DatabaseWrapper.get_new_connection, self, conn_params)
+        self.pool = get_pool(self.alias, conn_params, self.settings_dict.get('POOL', {}), connect)
+        try:
+            connection = self.pool.getconn(connect)
+        except PoolTimeout as exc:
+            raise self.Database.OperationalError(str(exc)) from exc
+        # get_new_connection() sets this for new connections; reused ones keep the level they were opened with
+        level = self.settings_dict['OPTIONS'].get('isolation_level')
+        self.isolation_level = IsolationLevel.READ_COMMITTED if level is None else IsolationLevel(level)
+        return connection
+
+    def _close(self):
+        """Return the connection to the pool"""
+        if self.connection is not None:
+            self.pool.putconn(self.connection)
@@ -0,0 +1,80 @@
+"""
+Server-side cart pricing.
+
+Every cart line is resolved against the menu in a single query and priced
+from the database, never from prices sent by the client.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+
+from .models import MenuItem
+
+
+class CartError(ValueError):
+    """Raised when cart input cannot be turned into priced lines"""
+
+
+def normalize_lines(pairs):
+    """Merge (menu_item_id, quantity) pairs into {menu_item_id: quantity}"""
+    lines = {}
+    for menu_item_id, quantity in pairs:
+        try:
+            menu_item_id, quantity = int(menu_item_id), int(quantity)
+        except (TypeError, ValueError):
+            raise CartError('Menu item id and quantity must be integers')
+        if quantity < 0:
+            raise CartError('Quantity cannot be negative')
+        if quantity:
+            lines[menu_item_id] = lines.get(menu_item_id, 0) + quantity
+    return lines
+
+
+class CartQuote:
+    """A priced cart: order lines, unavailable items and totals"""
+
+    def __init__(self, lines, unavailable, delivery_fee):
+        self.lines = lines
+        self.unavailable = unavailable
+        self.delivery_fee = delivery_fee
+        self.subtotal = sum((line['subtotal'] for line in lines), Decimal('0.00'))
+
+    @property
+    def grand_total(self):
+        return self.subtotal + self.delivery_fee
+
+    def as_dict(self):
+        return {
+            'items': [{
+                'menu_item_id': line['menu_item'].id,
+                'name': line['menu_item'].name,
+                'quantity': line['quantity'],
+                'price': str(line['price']),
+                'subtotal': str(line['subtotal']),
+            } for line in self.lines],
+            'unavailable': self.unavailable,
+            'subtotal': str(self.subtotal),
+            'delivery_fee': str(self.delivery_fee),
+            'grand_total': str(self.grand_total),
+        }
+
+
+def price_cart(pairs):
+    """Price (menu_item_id, quantity) pairs with one menu query"""
+    quantities = normalize_lines(pairs)
+    menu_items = MenuItem.objects.in_bulk(list(quantities))
+
+    lines, unavailable = [], []
+    for menu_item_id, quantity in quantities.items():
+        menu_item = menu_items.get(menu_item_id)
+        if menu_item is None or not menu_item.available:
+            unavailable.append(menu_item_id)
+            continue
+        lines.append({
+            'menu_item': menu_item,
+            'quantity': quantity,
+            'price': menu_item.price,
+            'subtotal': menu_item.price * quantity,
+        })
+
+    return CartQuote(lines, unavailable, Decimal(settings.DELIVERY_FEE))
@@ -0,0 +1,109 @@
+"""
+orjson and MessagePack renderers and parsers for the REST API.
+
+DRF's JSONRenderer and JSONParser run on the stdlib json module, which
+calls back into Python (JSONEncoder.default) for every datetime and
+Decimal. On long order lists that encoding is a large share of a
+request's CPU time. orjson does the same work in native code.
+
+- ORJSONRenderer / ORJSONParser replace the stdlib ones for
+  application/json when API_ORJSON=True. For the API's responses the
+  output is the same bytes as JSONRenderer's (tests compare the two), so
+  clients see no difference.
+- MessagePackRenderer / MessagePackParser serve application/msgpack to
+  clients that ask for it (Accept: application/msgpack or ?format=msgpack);
+  the mobile app uses it for smaller payloads.
+
+Both encode values the way the JSON API does: datetimes as DRF's ISO 8601
+strings ('Z' for UTC) and Decimals as exact strings, as the serializers'
+DecimalFields give them (DRF's encoder turns a bare Decimal into a float).
+orjson and msgpack are optional; without them settings leave these
+classes out and the stdlib renderers are used.
+"""
+from decimal import Decimal
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+_drf_encoder = JSONEncoder()
+
+
+def encode_default(obj):
+    """Encode what orjson/msgpack can't: Decimals as strings, everything else as DRF's encoder does"""
+    if isinstance(obj, Decimal):
+        return str(obj)
+    return _drf_encoder.default(obj)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer on orjson; indented output (browsable API, ?indent) falls back to the stdlib"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if orjson is None:
+            raise ImportError('ORJSONRenderer requires the orjson package')
+        content = orjson.dumps(
+            data, default=encode_default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+        )
+        # Keep the output a strict JavaScript subset, as JSONRenderer does
+        if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+            content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return content
+
+
+class ORJSONParser(JSONParser):
+    """JSONParser on orjson (UTF-8 request bodies)"""
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            raise ImportError('ORJSONParser requires the orjson package')
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Renders responses as MessagePack"""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if msgpack is None:
+            raise ImportError('MessagePackRenderer requires the msgpack package')
+        return msgpack.packb(data, default=encode_default, use_bin_type=True, datetime=False)
+
+
+class MessagePackParser(BaseParser):
+    """Parses MessagePack request bodies"""
+    media_type = 'application/msgpack'
+    renderer_class = MessagePackRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if msgpack is None:
+            raise ImportError('MessagePackParser requires the msgpack package')
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, TypeError, msgpack.UnpackException) as exc:
+            raise ParseError(f'MessagePack parse error - {exc}')
@@ -0,0 +1,132 @@
+"""
+Pre-aggregated sales by day and by menu item for the sales report.
+
+Summing OrderItem over a year of orders is a long scan that holds up
+every other query on a small database. `manage.py refresh_sales_rollups`
+instead keeps DailySales and DailyItemSales current, and the report reads
+only those (a few rows per day).
+
+Refreshes are incremental. Every write to an order bumps its updated_at
+(bulk status changes set it explicitly), so the days to redo are the
+created_at days of orders updated since the last refresh, plus days marked
+stale when an order was deleted. Each such day is re-aggregated from
+scratch in its own short transaction, which makes a refresh idempotent: it
+is always safe to run again or to redo a day twice.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Max, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import DailyItemSales, DailySales, Order, OrderItem
+
+# Orders that don't count as sales
+EXCLUDED_STATUSES = ['cancelled']
+
+# Rescan this far behind the last refresh, for transactions that were
+# still open when it ran (their updated_at is older than their commit)
+REFRESH_OVERLAP = timedelta(minutes=10)
+
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+
+
+def day_range(day):
+    """The [start, end) created_at range of a day in the current time zone"""
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+
+def changed_days(since=None):
+    """Days whose rollups are out of date; every day with orders if since is None"""
+    orders = Order.objects.all() if since is None else Order.objects.filter(updated_at__gte=since)
+    days = set(orders.dates('created_at', 'day'))
+    days.update(DailySales.objects.filter(stale=True).values_list('day', flat=True))
+    return sorted(days)
+
+
+def aggregate_day(day, refreshed_at):
+    """Rewrite one day's DailySales and DailyItemSales rows from its orders"""
+    start, end = day_range(day)
+    orders = Order.objects.filter(created_at__gte=start, created_at__lt=end).exclude(status__in=EXCLUDED_STATUSES)
+    items = (
+        OrderItem.objects.filter(order__in=orders)
+        .values('menu_item_id', 'menu_item__category')
+        .annotate(units=Sum('quantity'), revenue=Sum(F('price') * F('quantity'), output_field=MONEY))
+        .order_by()
+    )
+    item_rows = [
+        DailyItemSales(day=day, menu_item_id=row['menu_item_id'], category=row['menu_item__category'],
+                       units=row['units'], revenue=row['revenue'])
+        for row in items
+    ]
+    totals = orders.aggregate(
+        orders=Count('id'),
+        delivery_fees=Coalesce(Sum('delivery_fee'), Value(Decimal('0')), output_field=MONEY),
+    )
+    with transaction.atomic():
+        DailyItemSales.objects.filter(day=day).delete()
+        DailySales.objects.filter(day=day).delete()
+        if totals['orders']:
+            DailyItemSales.objects.bulk_create(item_rows)
+            DailySales.objects.create(
+                day=day, units=sum(row.units for row in item_rows),
+                revenue=sum((row.revenue for row in item_rows), Decimal('0')),
+                refreshed_at=refreshed_at, **totals
+            )
+
+
+def refresh_rollups(full=False):
+    """Re-aggregate every changed day (every day with orders if full); returns the days redone"""
+    refreshed_at = timezone.now()
+    last_refresh = DailySales.objects.aggregate(last=Max('refreshed_at'))['last']
+    since = None if full or last_refresh is None else last_refresh - REFRESH_OVERLAP
+    days = changed_days(since)
+    for day in days:
+        aggregate_day(day, refreshed_at)
+    return days
+
+
+def order_deleted(order):
+    """Mark the deleted order's day for the next refresh"""
+    if order.created_at is not None:
+        DailySales.objects.filter(day=timezone.localdate(order.created_at)).update(stale=True)
+
+
+def report_row(row):
+    """Amounts as strings, as the API serializers give them"""
+    return {
+        ('name' if key == 'menu_item__name' else key): f'{value:.2f}' if isinstance(value, Decimal) else value
+        for key, value in row.items()
+    }
+
+
+def sales_report(since, until, group='day'):
+    """Totals and per-day, per-category or per-item rows for [since, until], from the rollups only"""
+    days = DailySales.objects.filter(day__gte=since, day__lte=until)
+    totals = days.aggregate(
+        orders=Coalesce(Sum('orders'), 0), units=Coalesce(Sum('units'), 0),
+        revenue=Coalesce(Sum('revenue'), Value(Decimal('0')), output_field=MONEY),
+        delivery_fees=Coalesce(Sum('delivery_fees'), Value(Decimal('0')), output_field=MONEY),
+        refreshed_at=Max('refreshed_at'),
+    )
+    if group == 'day':
+        rows = days.values('day', 'orders', 'units', 'revenue', 'delivery_fees')
+    else:
+        fields = ['category'] if group == 'category' else ['menu_item_id', 'menu_item__name', 'category']
+        rows = (
+            DailyItemSales.objects.filter(day__gte=since, day__lte=until)
+            .values(*fields)
+            .annotate(units=Sum('units'), revenue=Sum('revenue'))
+            .order_by('-revenue', *fields)
+        )
+    return {
+        'since': since,
+        'until': until,
+        'group': group,
+        'refreshed_at': totals.pop('refreshed_at'),
+        'totals': report_row(totals),
+        'rows': [report_row(row) for row in rows],
+    }
@@ -0,0 +1,105 @@
+"""
+Full-text search backends for menu items.
+
+SQLite uses an FTS5 external-content table kept in sync by triggers, Postgres
+uses a GIN index over a tsvector expression. Any other database (or SQLite
+built without FTS5) falls back to the plain icontains scan.
+"""
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'bakery_menuitem_fts'
+SEARCH_FIELDS = ['name', 'description', 'category']
+
+# Must match the expression used by the Postgres GIN index exactly
+PG_DOCUMENT = (
+    "to_tsvector('simple', coalesce(bakery_menuitem.name, '') || ' ' || "
+    "coalesce(bakery_menuitem.description, '') || ' ' || "
+    "coalesce(bakery_menuitem.category, ''))"
+)
+
+
+def tokenize(query):
+    """Split a user query into safe search tokens"""
+    return re.findall(r'\w+', query.lower())
+
+
+def sqlite_has_fts5(conn):
+    """Check whether the SQLite library was compiled with FTS5"""
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+class BaseSearchBackend:
+    """Fallback backend: OR of icontains lookups, no ranking"""
+    rank_ordering = None
+
+    def search(self, queryset, query):
+        for token in tokenize(query):
+            conditions = Q()
+            for field in SEARCH_FIELDS:
+                conditions |= Q(**{f'{field}__icontains': token})
+            queryset = queryset.filter(conditions)
+        return queryset
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """SQLite FTS5 backend with bm25 ranking and prefix matching"""
+    rank_ordering = 'search_rank'  # bm25: lower is better
+
+    def build_match(self, tokens):
+        return ' '.join(f'"{token}"*' for token in tokens)
+
+    def search(self, queryset, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return queryset
+        # Join the FTS table directly so SQLite drives the query from the
+        # index and computes bm25 once per matching row
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = bakery_menuitem.id', f'{FTS_TABLE} MATCH %s'],
+            params=[self.build_match(tokens)],
+            select={'search_rank': f'{FTS_TABLE}.rank'},
+        )
+
+
+class PostgresFTSBackend(BaseSearchBackend):
+    """Postgres tsvector backend with ts_rank ranking and prefix matching"""
+    rank_ordering = '-search_rank'
+
+    def build_tsquery(self, tokens):
+        return ' & '.join(f'{token}:*' for token in tokens)
+
+    def search(self, queryset, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return queryset
+        tsquery = self.build_tsquery(tokens)
+        return queryset.filter(
+            RawSQL(f"{PG_DOCUMENT} @@ to_tsquery('simple', %s)", [tsquery], output_field=BooleanField())
+        ).annotate(
+            search_rank=RawSQL(
+                f"ts_rank({PG_DOCUMENT}, to_tsquery('simple', %s))", [tsquery], output_field=FloatField()
+            )
+        )
+
+
+_backend = None
+
+
+def get_search_backend():
+    """Return the search backend for the default database connection"""
+    global _backend
+    if _backend is None:
+        if connection.vendor == 'sqlite' and sqlite_has_fts5(connection):
+            _backend = SQLiteFTSBackend()
+        elif connection.vendor == 'postgresql':
+            _backend = PostgresFTSBackend()
+        else:
+            _backend = BaseSearchBackend()
+    return _backend
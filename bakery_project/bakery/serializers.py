@@ -1,9 +1,10 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import MenuItem, Order, OrderItem, Payment, UserProfile
-from decimal import Decimal
-import uuid
+from .models import MenuItem, Order, OrderItem, Payment, UserProfile, UserOrderStats
+from .pricing import CartError, price_cart
+from .checkout import new_transaction_id, place_order
 from django.utils import timezone
+from datetime import timedelta
 
 
 # Base Serializers
@@ -115,29 +116,43 @@ class OrderSerializer(TimestampedSerializer):
                            'delivered_at'] + TimestampedSerializer.Meta.read_only_fields
 
 
+class UserOrderStatsSerializer(serializers.ModelSerializer):
+    """Serializer for a user's order counters"""
+    
+    class Meta:
+        model = UserOrderStats
+        fields = ['total_orders', 'pending_orders', 'completed_orders', 'cancelled_orders', 'total_spent']
+        read_only_fields = fields
+
+
+class SalesReportQuerySerializer(serializers.Serializer):
+    """Query parameters of the sales report; the default range is the last 30 days"""
+    since = serializers.DateField(required=False)
+    until = serializers.DateField(required=False)
+    group = serializers.ChoiceField(choices=['day', 'category', 'item'], default='day')
+    
+    def validate(self, data):
+        data.setdefault('until', timezone.localdate())
+        data.setdefault('since', data['until'] - timedelta(days=29))
+        if data['since'] > data['until']:
+            raise serializers.ValidationError("since must not be after until")
+        return data
 
-class OrderCreateSerializer(serializers.Serializer):
-    """Serializer for creating new orders with validation"""
+
+
+class CartQuoteSerializer(serializers.Serializer):
+    """Serializer for cart lines to be priced server-side"""
     items = serializers.ListField(
         child=serializers.DictField(),
-        help_text="List of items: [{'menu_item_id': 1, 'quantity': 2, 'price': 10.50}]"
-    )
-    delivery_fee = serializers.DecimalField(max_digits=10, decimal_places=2, default=Decimal('5.00'))
-    delivery_address = serializers.CharField(required=False, allow_blank=True)
-    delivery_phone = serializers.CharField(max_length=20, required=False, allow_blank=True)
-    delivery_notes = serializers.CharField(required=False, allow_blank=True)
-    payment_method = serializers.ChoiceField(
-        choices=['upi', 'card', 'netbanking', 'cod'],
-        default='cod'
+        help_text="List of items: [{'menu_item_id': 1, 'quantity': 2}]"
     )
-    upi_id = serializers.CharField(required=False, allow_blank=True)
     
     def validate_items(self, value):
         """Validate items list structure and data"""
         if not value:
-            raise serializers.ValidationError("Order must contain at least one item")
+            raise serializers.ValidationError("Cart must contain at least one item")
         
-        required_fields = ['menu_item_id', 'quantity', 'price']
+        required_fields = ['menu_item_id', 'quantity']
         for item in value:
             # Check required fields
             for field in required_fields:
@@ -145,58 +160,58 @@ class OrderCreateSerializer(serializers.Serializer):
                     raise serializers.ValidationError(f"Each item must have {field}")
             
             # Validate quantity
-            if item['quantity'] < 1:
-                raise serializers.ValidationError("Quantity must be at least 1")
-            
-            # Validate price
-            if Decimal(str(item['price'])) <= 0:
-                raise serializers.ValidationError("Price must be greater than 0")
+            try:
+                if int(item['quantity']) < 1:
+                    raise serializers.ValidationError("Quantity must be at least 1")
+            except (TypeError, ValueError):
+                raise serializers.ValidationError("Quantity must be a whole number")
         
         return value
     
+    def validate(self, attrs):
+        """Price every line from the menu in one query"""
+        try:
+            quote = price_cart((item['menu_item_id'], item['quantity']) for item in attrs['items'])
+        except CartError as e:
+            raise serializers.ValidationError({'items': str(e)})
+        attrs['quote'] = quote
+        return attrs
+
+
+class OrderCreateSerializer(CartQuoteSerializer):
+    """Serializer for creating new orders with validation.
+    
+    Prices and the delivery fee always come from the server-side quote;
+    any 'price' sent with an item is ignored.
+    """
+    delivery_address = serializers.CharField(required=False, allow_blank=True)
+    delivery_phone = serializers.CharField(max_length=20, required=False, allow_blank=True)
+    delivery_notes = serializers.CharField(required=False, allow_blank=True)
+    payment_method = serializers.ChoiceField(
+        choices=['upi', 'card', 'netbanking', 'cod'],
+        default='cod'
+    )
+    upi_id = serializers.CharField(required=False, allow_blank=True)
+    
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        if attrs['quote'].unavailable:
+            raise serializers.ValidationError({
+                'items': f"Menu items not available: {attrs['quote'].unavailable}"
+            })
+        return attrs
+    
     def create(self, validated_data):
         """Create order with items and payment"""
-        user = self.context['request'].user
-        items_data = validated_data['items']
-        
-        # Calculate total
-        total = sum(Decimal(str(item['price'])) * item['quantity'] for item in items_data)
-        
-        # Create order
-        order = Order.objects.create(
-            user=user,
-            order_id=f"ORD{str(uuid.uuid4())[:8].upper()}",
-            total_amount=total,
-            delivery_fee=validated_data.get('delivery_fee', Decimal('5.00')),
+        return place_order(
+            self.context['request'].user,
+            validated_data['quote'],
             delivery_address=validated_data.get('delivery_address', ''),
             delivery_phone=validated_data.get('delivery_phone', ''),
-            delivery_notes=validated_data.get('delivery_notes', '')
+            delivery_notes=validated_data.get('delivery_notes', ''),
+            payment_method=validated_data.get('payment_method', 'cod'),
+            upi_id=validated_data.get('upi_id', '')
         )
-        
-        # Create order items using bulk_create for efficiency
-        order_items = [
-            OrderItem(
-                order=order,
-                menu_item_id=item['menu_item_id'],
-                quantity=item['quantity'],
-                price=Decimal(str(item['price']))
-            ) for item in items_data
-        ]
-        OrderItem.objects.bulk_create(order_items)
-        
-        # Create payment if method is not COD
-        payment_method = validated_data.get('payment_method', 'cod')
-        if payment_method != 'cod':
-            Payment.objects.create(
-                order=order,
-                payment_method=payment_method,
-                payment_status='pending',
-                transaction_id=f"TXN{str(uuid.uuid4())[:12].upper()}",
-                amount=order.grand_total,
-                upi_id=validated_data.get('upi_id', '')
-            )
-        
-        return order
 
 
 class PaymentCreateSerializer(serializers.Serializer):
@@ -221,12 +236,12 @@ class PaymentCreateSerializer(serializers.Serializer):
     
     def create(self, validated_data):
         """Create payment record"""
-        order = Order.objects.get(id=validated_data['order_id'])
+        order = Order.objects.select_related('user').get(id=validated_data['order_id'])
         payment = Payment.objects.create(
             order=order,
             payment_method=validated_data['payment_method'],
             payment_status='pending',
-            transaction_id=f"TXN{str(uuid.uuid4())[:12].upper()}",
+            transaction_id=new_transaction_id(),
             amount=order.grand_total,
             upi_id=validated_data.get('upi_id', ''),
             card_last4=validated_data.get('card_last4', '')
@@ -0,0 +1,86 @@
+"""
+Model signal handlers for the bakery app.
+
+Connected in BakeryConfig.ready().
+"""
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from . import auth_cache, lookup, rollups
+from .cache import bump_catalog_version
+from .models import MenuItem, Order, Payment, UserProfile
+from .snapshots import on_menu_change
+from .stats import order_deleted, order_saved
+
+
+@receiver([post_save, post_delete], sender=MenuItem)
+def invalidate_menu_cache(sender, **kwargs):
+    """Invalidate cached menu responses and page snapshots on any menu change.
+
+    Covers API writes, toggle_availability and admin edits (including
+    list_editable), all of which go through MenuItem.save()/delete().
+    """
+    bump_catalog_version()
+    on_menu_change()
+
+
+@receiver(post_save, sender=Order)
+def update_order_stats_on_save(sender, instance, created, raw=False, **kwargs):
+    """Apply an order's creation or status change to its owner's UserOrderStats"""
+    if not raw:
+        order_saved(instance, created)
+
+
+@receiver(post_delete, sender=Order)
+def update_order_stats_on_delete(sender, instance, **kwargs):
+    order_deleted(instance)
+
+
+@receiver(post_delete, sender=Order)
+def mark_sales_rollup_stale(sender, instance, **kwargs):
+    """Deletes leave no updated_at behind, so flag the day for refresh_sales_rollups"""
+    rollups.order_deleted(instance)
+
+
+@receiver(post_save, sender=Order)
+def update_order_lookup_on_save(sender, instance, created, raw=False, **kwargs):
+    """Write the order's OrderLookup row when it is created or its order id, customer or phone change"""
+    if not raw:
+        lookup.order_saved(instance, created)
+
+
+@receiver(post_save, sender=Payment)
+def update_order_lookup_on_payment(sender, instance, created, raw=False, **kwargs):
+    """Write the payment's transaction and UPI ids into its order's OrderLookup row"""
+    if not raw:
+        lookup.payment_saved(instance, created)
+
+
+@receiver(post_delete, sender=Payment)
+def update_order_lookup_on_payment_delete(sender, instance, **kwargs):
+    lookup.payment_deleted(instance)
+
+
+@receiver(post_save, sender=User)
+def update_order_lookup_on_email_change(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if not created and not raw:
+        lookup.user_saved(instance, update_fields)
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Password, staff and active flag changes all save the user"""
+    auth_cache.user_changed(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    """Logout deletes the token"""
+    auth_cache.invalidate('token', instance.key)
+
+
+@receiver([post_save, post_delete], sender=UserProfile)
+def invalidate_cached_profile(sender, instance, **kwargs):
+    auth_cache.invalidate('profile', instance.user_id)
@@ -0,0 +1,125 @@
+"""
+Pre-rendered static snapshots of the public pages.
+
+The index, menu, about and contact pages only change when the menu does, so
+they are rendered once for an anonymous visitor and written to SNAPSHOT_ROOT
+under fingerprinted file names. manifest.json maps each URL path to its
+current file; StaticSnapshotMiddleware serves those files through WhiteNoise.
+
+Any menu change deletes the manifest straight away (so every worker falls
+back to the live views) and re-renders the snapshots once the transaction
+commits.
+"""
+import gzip
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import transaction
+from django.http import HttpRequest
+from django.urls import resolve, reverse
+
+SNAPSHOT_PAGES = ['index', 'menu', 'about', 'contact']
+MANIFEST_NAME = 'manifest.json'
+
+
+def snapshots_enabled():
+    return getattr(settings, 'SNAPSHOTS_ENABLED', False)
+
+
+def snapshot_root():
+    return Path(settings.SNAPSHOT_ROOT)
+
+
+def write_atomic(path, data):
+    """Write bytes to path so readers never see a partial file"""
+    tmp_path = path.with_name(f'.{path.name}.tmp')
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+def anonymous_request(path):
+    """Build a bare GET request as seen by a signed-out visitor"""
+    request = HttpRequest()
+    request.method = 'GET'
+    request.path = request.path_info = path
+    request.META = {'SERVER_NAME': 'localhost', 'SERVER_PORT': '80'}
+    request.user = AnonymousUser()
+    return request
+
+
+def render_snapshots():
+    """Render every public page to a fingerprinted HTML file and publish the manifest"""
+    root = snapshot_root()
+    root.mkdir(parents=True, exist_ok=True)
+
+    manifest = {}
+    for name in SNAPSHOT_PAGES:
+        path = reverse(name)
+        response = resolve(path).func(anonymous_request(path))
+        if response.status_code != 200:
+            continue
+        html = response.content
+        filename = f'{name}.{hashlib.sha256(html).hexdigest()[:12]}.html'
+        write_atomic(root / filename, html)
+        write_atomic(root / f'{filename}.gz', gzip.compress(html))
+        manifest[path] = filename
+
+    write_atomic(root / MANIFEST_NAME, json.dumps(manifest).encode())
+
+    # Drop snapshots that are no longer referenced
+    current = set(manifest.values())
+    for snapshot in root.glob('*.html*'):
+        if snapshot.name.split('.gz')[0] not in current:
+            snapshot.unlink(missing_ok=True)
+    return manifest
+
+
+def invalidate_snapshots():
+    """Unpublish all snapshots so requests fall back to the live views"""
+    (snapshot_root() / MANIFEST_NAME).unlink(missing_ok=True)
+
+
+def schedule_render():
+    """Re-render snapshots after the current transaction commits"""
+    def run():
+        # Several changes in one transaction queue several callbacks;
+        # only the first has anything left to do.
+        if not (snapshot_root() / MANIFEST_NAME).exists():
+            render_snapshots()
+
+    transaction.on_commit(run)
+
+
+def on_menu_change():
+    """Hook called whenever the menu catalog changes"""
+    if not snapshots_enabled():
+        return
+    invalidate_snapshots()
+    schedule_render()
+
+
+class SnapshotManifest:
+    """Per-process view of manifest.json, reloaded when the file changes"""
+
+    def __init__(self):
+        self.mtime = None
+        self.entries = {}
+
+    def get(self, path):
+        manifest_path = snapshot_root() / MANIFEST_NAME
+        try:
+            mtime = manifest_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if mtime != self.mtime:
+            try:
+                self.entries = json.loads(manifest_path.read_bytes())
+            except (OSError, ValueError):
+                return None
+            self.mtime = mtime
+        filename = self.entries.get(path)
+        return snapshot_root() / filename if filename else None
@@ -0,0 +1,129 @@
+"""
+Per-user order statistics, maintained incrementally.
+
+Each UserOrderStats row holds counters for one customer. Rather than
+re-aggregating their whole order history, every write applies the
+difference between what an order used to count as and what it counts as
+now, using F() expressions so concurrent updates never overwrite each
+other:
+
+- Order.save() and delete() go through the signals in signals.py. Saves
+  of a loaded order diff against the row as stored: the UPDATE only
+  matches the row as the order last counted it, and re-reads it if not
+  (Order._do_update()).
+- Bulk status changes (QuerySet.update) call apply_status_change().
+
+A missing row is rebuilt from the user's orders on first use, and
+`manage.py rebuild_order_stats` backfills or repairs every row.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Order, UserOrderStats, order_stats_contribution
+
+STAT_FIELDS = ('total_orders', 'pending_orders', 'completed_orders', 'cancelled_orders', 'total_spent')
+
+
+def stats_delta(old, new):
+    """Non-zero differences between two contributions (either may be None)"""
+    delta = {}
+    for field in STAT_FIELDS:
+        change = (new or {}).get(field, 0) - (old or {}).get(field, 0)
+        if change:
+            delta[field] = change
+    return delta
+
+
+def stats_aggregates():
+    """Aggregate expressions that compute UserOrderStats fields from orders"""
+    delivered = Q(status='delivered')
+    return {
+        'total_orders': Count('id'),
+        'pending_orders': Count('id', filter=Q(status='pending')),
+        'completed_orders': Count('id', filter=delivered),
+        'cancelled_orders': Count('id', filter=Q(status='cancelled')),
+        'total_spent': Coalesce(
+            Sum(F('total_amount') + F('delivery_fee'), filter=delivered),
+            Value(Decimal('0')),
+            output_field=DecimalField(max_digits=12, decimal_places=2)
+        ),
+    }
+
+
+def rebuild_user_stats(user_id):
+    """Recompute one user's row from their orders"""
+    values = Order.objects.filter(user_id=user_id).aggregate(**stats_aggregates())
+    if not UserOrderStats.objects.filter(user_id=user_id).update(**values):
+        try:
+            with transaction.atomic():
+                UserOrderStats.objects.create(user_id=user_id, **values)
+        except IntegrityError:
+            # Another request created the row first
+            UserOrderStats.objects.filter(user_id=user_id).update(**values)
+    return UserOrderStats(user_id=user_id, **values)
+
+
+def apply_stats_delta(user_id, delta, create_missing=True):
+    """Add delta to a user's row, building the row if it doesn't exist yet.
+
+    Call after the order change is written: a freshly built row already
+    includes it.
+    """
+    if not delta:
+        return
+    changes = {field: F(field) + change for field, change in delta.items()}
+    updated = UserOrderStats.objects.filter(user_id=user_id).update(**changes)
+    if not updated and create_missing:
+        rebuild_user_stats(user_id)
+
+
+def order_saved(order, created):
+    """Update the owner's stats after Order.save()"""
+    new = order.stats_contribution()
+    old = None if created else order.counted_as()
+    if new is None or (old is None and not created):
+        # Saved from a partially loaded or hand-built instance: recount
+        rebuild_user_stats(order.user_id)
+    else:
+        apply_stats_delta(order.user_id, stats_delta(old, new))
+    order._stored_stats_fields = order.stats_fields()
+
+
+def order_deleted(order):
+    """Update the owner's stats after Order.delete()"""
+    old = order.counted_as() or order.stats_contribution()
+    # Never recreate the row here: the user may be being deleted too
+    apply_stats_delta(order.user_id, stats_delta(old, None), create_missing=False)
+
+
+def apply_status_change(rows, status):
+    """Update stats for a bulk status change.
+
+    `rows` are the orders' values (user_id, status, total_amount,
+    delivery_fee) as they were before the change.
+    """
+    deltas = defaultdict(lambda: defaultdict(int))
+    for row in rows:
+        old = order_stats_contribution(row['status'], row['total_amount'], row['delivery_fee'])
+        new = order_stats_contribution(status, row['total_amount'], row['delivery_fee'])
+        for field, change in stats_delta(old, new).items():
+            deltas[row['user_id']][field] += change
+    for user_id, delta in deltas.items():
+        apply_stats_delta(user_id, {field: change for field, change in delta.items() if change})
+
+
+def get_user_stats(user):
+    """A user's stats row: one primary key lookup, built on first use"""
+    stats = UserOrderStats.objects.filter(pk=user.pk).first()
+    return stats or rebuild_user_stats(user.pk)
+
+
+async def aget_user_stats(user):
+    stats = await UserOrderStats.objects.filter(pk=user.pk).afirst()
+    return stats or await sync_to_async(rebuild_user_stats)(user.pk)
@@ -0,0 +1,71 @@
+"""
+Background jobs for work customers and staff don't need to wait for.
+
+Imported by BakeryConfig.ready() so every job is registered in both web
+and worker processes.
+"""
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
+
+from .events import record_status_events
+from .jobs import job
+from .stats import apply_status_change
+from .models import Order, Payment
+
+
+def store_payment_screenshot(uploaded_file):
+    """Save an uploaded payment screenshot to media storage and return its name"""
+    field = Payment._meta.get_field('payment_screenshot')
+    return field.storage.save(field.generate_filename(None, uploaded_file.name), uploaded_file)
+
+
+def delete_payment_screenshot(name):
+    """Delete a screenshot saved by store_payment_screenshot() that no payment refers to"""
+    Payment._meta.get_field('payment_screenshot').storage.delete(name)
+
+
+@job('verify_payment_screenshot')
+def verify_payment_screenshot(payment_id):
+    """Check a payment's stored screenshot is an image, removing it if not"""
+    payment = Payment.objects.get(pk=payment_id)
+    if not payment.payment_screenshot:
+        return
+    # Storage errors propagate so the job is retried
+    with payment.payment_screenshot.open('rb') as screenshot:
+        try:
+            Image.open(screenshot).verify()
+            return
+        except (UnidentifiedImageError, OSError, SyntaxError):
+            pass
+    payment.payment_screenshot.delete(save=False)
+    payment.verification_notes = 'Uploaded screenshot is not a valid image'
+    payment.save(update_fields=['payment_screenshot', 'verification_notes', 'updated_at'])
+
+
+# Timestamp to set when an order first reaches a status
+ORDER_STATUS_TIMESTAMPS = {'confirmed': 'confirmed_at', 'delivered': 'delivered_at'}
+
+
+@job('update_order_status')
+def update_order_status(order_ids, status):
+    """Bulk status change for orders, with stats and live events for each customer"""
+    changes = {'status': status, 'updated_at': timezone.now()}
+    if status in ORDER_STATUS_TIMESTAMPS:
+        changes[ORDER_STATUS_TIMESTAMPS[status]] = timezone.now()
+    orders = Order.objects.filter(id__in=order_ids)
+    with transaction.atomic():
+        before = list(orders.select_for_update().values('id', 'user_id', 'status', 'total_amount', 'delivery_fee'))
+        updated = orders.update(**changes)
+        apply_status_change(before, status)
+        record_status_events({'id': row['id'], 'user_id': row['user_id'], 'status': status} for row in before)
+    return updated
+
+
+@job('update_payment_status')
+def update_payment_status(payment_ids, status):
+    """Bulk status change for payments"""
+    changes = {'payment_status': status, 'updated_at': timezone.now()}
+    if status == 'completed':
+        changes['paid_at'] = timezone.now()
+    return Payment.objects.filter(id__in=payment_ids).update(**changes)
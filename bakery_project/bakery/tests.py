@@ -1,7 +1,52 @@
 # Django Test File
-from django.test import TestCase
+import asyncio
+import json
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+import re
+import sqlite3
+from collections import Counter
+from decimal import Decimal
+import tempfile
+import threading
+from unittest import mock, skipUnless
+from django.db import IntegrityError, OperationalError, connection, connections, transaction
+from django.db.utils import ConnectionHandler
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver
+from rest_framework.authtoken.models import Token
+from django.core.management import call_command
+from io import BytesIO, StringIO
+from django.test import AsyncClient, AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.conf import settings
 from django.contrib.auth.models import User
-from .models import MenuItem, Order, OrderItem
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.handlers.asgi import ASGIHandler
+from django.http import HttpResponse
+from django.utils import timezone
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from rest_framework.test import APIClient
+from .models import MenuItem, Order, OrderItem, Payment, UserProfile
+from .checkout import place_order
+from . import jobs
+from .models import DailyItemSales, DailySales, Job, OrderStatusEvent, OrderLookup, UserOrderStats
+from .events import get_hub, order_event_stream
+from .pricing import price_cart
+from .middleware import StaticSnapshotMiddleware
+from .snapshots import render_snapshots
+from .management.commands.loadtest import percentile
+from .pagination import EstimatedCountPaginator, estimated_count
+from .lookup import get_lookup_backend, lookup_text, search_orders, tokenize
+from . import exports
+from .rollups import refresh_rollups
+from .order_rows import order_values, serialize_orders
+from .serializers import OrderSerializer
+from rest_framework.renderers import JSONRenderer
+from rest_framework.exceptions import ParseError
+from . import auth_cache, db_pool, renderers
+from .api_views import MenuItemViewSet, OrderViewSet, adashboard_stats, dashboard_stats_api
+from .async_api import async_get_view
+from .db_routing import ReadOnlyRequestMiddleware, ReadOnlyRequestRouter
 
 
 class MenuItemTestCase(TestCase):
@@ -54,3 +99,1601 @@ class OrderTestCase(TestCase):
         self.assertEqual(order.items.count(), 1)
         self.assertEqual(order.status, 'pending')
         self.assertEqual(order.total_amount, 30.00)
+
+
+class MenuCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.item = MenuItem.objects.create(
+            name="Cached Croissant",
+            price=3.50,
+            category="croissant",
+            available=True
+        )
+    
+    def test_etag_returns_not_modified(self):
+        """Test that a matching If-None-Match skips the response body"""
+        response = self.client.get('/api/menu-items/')
+        etag = response['ETag']
+        
+        with self.assertNumQueries(0):
+            cached = self.client.get('/api/menu-items/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached['ETag'], etag)
+    
+    def test_menu_change_invalidates_all_variants(self):
+        """Test that saving a menu item expires list and category responses"""
+        list_etag = self.client.get('/api/menu-items/', {'category': 'croissant'})['ETag']
+        categories_etag = self.client.get('/api/menu-items/categories/')['ETag']
+        
+        self.item.available = False
+        self.item.save()
+        
+        response = self.client.get('/api/menu-items/', {'category': 'croissant'})
+        self.assertNotEqual(response['ETag'], list_etag)
+        self.assertEqual(response.data, [])
+        self.assertNotEqual(self.client.get('/api/menu-items/categories/')['ETag'], categories_etag)
+
+
+class MenuSearchTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        MenuItem.objects.create(name="Almond Croissant", description="Flaky almond pastry",
+                                price=4.50, category="croissant")
+        MenuItem.objects.create(name="Chocolate Cake", description="Rich cake with almond crumble",
+                                price=25.00, category="cake")
+        MenuItem.objects.create(name="Lemon Tart", description="Tangy lemon curd",
+                                price=7.99, category="fruittart")
+    
+    def search(self, term):
+        return [item['name'] for item in self.client.get('/api/menu-items/', {'search': term}).data]
+    
+    def test_prefix_search_is_ranked(self):
+        """Test that prefix matches are returned best match first"""
+        self.assertEqual(self.search('almo'), ['Almond Croissant', 'Chocolate Cake'])
+        self.assertEqual(self.search('choc cake'), ['Chocolate Cake'])
+    
+    def test_index_follows_item_changes(self):
+        """Test that renamed and deleted items are reflected in search results"""
+        tart = MenuItem.objects.get(name="Lemon Tart")
+        tart.name = "Orange Tart"
+        tart.description = "Fresh orange curd"
+        tart.save()
+        self.assertEqual(self.search('lemon'), [])
+        self.assertEqual(self.search('orange'), ['Orange Tart'])
+        
+        tart.delete()
+        self.assertEqual(self.search('orange'), [])
+
+
+class OrderPaginationTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='pager@test.com',
+            email='pager@test.com',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for i in range(25):
+            Order.objects.create(user=self.user, order_id=f"PAGE{i}", total_amount=10)
+        # Force timestamp ties so the id tiebreaker is exercised
+        Order.objects.filter(order_id__in=['PAGE5', 'PAGE6', 'PAGE7']).update(
+            created_at=Order.objects.get(order_id='PAGE5').created_at
+        )
+    
+    def test_cursor_pages_cover_every_order_once(self):
+        """Test that following next links returns each order exactly once, newest first"""
+        seen = []
+        url = '/api/orders/?page_size=10'
+        while url:
+            response = self.client.get(url)
+            self.assertLessEqual(len(response.data['results']), 10)
+            seen += [order['order_id'] for order in response.data['results']]
+            url = response.data['next']
+        
+        expected = list(Order.objects.order_by('-created_at', '-id').values_list('order_id', flat=True))
+        self.assertEqual(seen, expected)
+    
+    def test_invalid_cursor(self):
+        """Test that a tampered cursor is rejected"""
+        response = self.client.get('/api/orders/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class StaticSnapshotTestCase(TestCase):
+    def setUp(self):
+        self.snapshot_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.snapshot_dir.cleanup)
+        settings_override = override_settings(SNAPSHOTS_ENABLED=True, SNAPSHOT_ROOT=self.snapshot_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        
+        self.item = MenuItem.objects.create(name="Snapshot Scone", price=3.00, category="pastry")
+        render_snapshots()
+    
+    def get_body(self, response):
+        return b''.join(response.streaming_content) if response.streaming else response.content
+    
+    def test_anonymous_visitor_gets_snapshot(self):
+        """Test that public pages are served from disk without touching the database"""
+        with self.assertNumQueries(0):
+            response = self.client.get('/menu/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Cookie', response['Vary'])
+        self.assertEqual(response['X-Frame-Options'], 'DENY')
+        self.assertIn(b'Snapshot Scone', self.get_body(response))
+    
+    def test_snapshot_served_without_sync_adaptation(self):
+        """Test that under ASGI the middleware is a coroutine and serves snapshots itself"""
+        async def live_view(request):
+            return HttpResponse('live')
+        
+        middleware = StaticSnapshotMiddleware(live_view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = async_to_sync(middleware)(AsyncRequestFactory().get('/menu/'))
+        self.assertEqual(response['X-Frame-Options'], 'DENY')
+        self.assertIn(b'Snapshot Scone', self.get_body(response))
+        response = async_to_sync(middleware)(AsyncRequestFactory().get('/menu/', {'page': 2}))
+        self.assertEqual(response.content, b'live')
+    
+    def test_menu_change_rerenders_snapshot(self):
+        """Test that a menu change unpublishes and re-renders the snapshots"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.name = "Fresh Scone"
+            self.item.save()
+        
+        body = self.get_body(self.client.get('/menu/'))
+        self.assertIn(b'Fresh Scone', body)
+        self.assertNotIn(b'Snapshot Scone', body)
+    
+    def test_signed_in_user_gets_live_page(self):
+        """Test that visitors with a session bypass the snapshot"""
+        user = User.objects.create_user(username='live@test.com', password='testpass123')
+        self.client.force_login(user)
+        response = self.client.get('/menu/')
+        self.assertFalse(response.streaming)
+        self.assertIn(b'Snapshot Scone', response.content)
+
+
+class CartPricingTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='buyer@test.com',
+            email='buyer@test.com',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.items = [
+            MenuItem.objects.create(name=f"Cookie {i}", price=10, category="cookie")
+            for i in range(40)
+        ]
+        self.sold_out = MenuItem.objects.create(name="Sold Out Cake", price=99, category="cake", available=False)
+    
+    def test_quote_prices_every_line_in_one_query(self):
+        """Test that a 40-line cart is priced with a single menu query"""
+        items = [{'menu_item_id': item.id, 'quantity': 2} for item in self.items]
+        with self.assertNumQueries(1):
+            response = self.client.post('/api/cart/quote/', {'items': items}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['subtotal'], '800.00')
+        self.assertEqual(response.data['delivery_fee'], '50.00')
+        self.assertEqual(response.data['grand_total'], '850.00')
+    
+    def test_quote_reports_unavailable_items(self):
+        """Test that unavailable and unknown items are not priced"""
+        items = [{'menu_item_id': self.sold_out.id, 'quantity': 1}, {'menu_item_id': 999999, 'quantity': 1}]
+        response = self.client.post('/api/cart/quote/', {'items': items}, format='json')
+        self.assertEqual(response.data['unavailable'], [self.sold_out.id, 999999])
+        self.assertEqual(response.data['items'], [])
+    
+    def test_order_ignores_client_prices(self):
+        """Test that order totals come from the menu, not the request"""
+        response = self.client.post('/api/orders/', {
+            'items': [{'menu_item_id': self.items[0].id, 'quantity': 3, 'price': '0.01'}],
+            'delivery_fee': '0.00',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['total_amount'], '30.00')
+        self.assertEqual(response.data['grand_total'], '80.00')
+    
+    def test_order_rejects_unavailable_items(self):
+        """Test that unavailable items cannot be ordered"""
+        response = self.client.post('/api/orders/', {
+            'items': [{'menu_item_id': self.sold_out.id, 'quantity': 1}],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class CheckoutTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='checkout@test.com',
+            email='checkout@test.com',
+            password='testpass123'
+        )
+        items = [MenuItem.objects.create(name=f"Muffin {i}", price=5, category="muffin") for i in range(3)]
+        self.quote = price_cart((item.id, 2) for item in items)
+    
+    def test_checkout_writes_in_one_transaction(self):
+        """Test that checkout writes order, items and payment in one transaction, one statement each"""
+        place_order(self.user, self.quote)
+        # SAVEPOINT + 3 INSERTs + the stats UPDATE + the lookup upsert + RELEASE (a plain BEGIN/COMMIT outside tests)
+        with self.assertNumQueries(7):
+            order = place_order(self.user, self.quote, payment_method='upi')
+        self.assertEqual(order.items.count(), 3)
+        self.assertEqual(order.payment.amount, order.grand_total)
+    
+    def test_failed_payment_leaves_no_orphaned_order(self):
+        """Test that a failure after the order insert rolls the whole checkout back"""
+        existing = place_order(self.user, self.quote, payment_method='upi').payment.transaction_id
+        
+        with mock.patch('bakery.checkout.new_transaction_id', return_value=existing):
+            with self.assertRaises(IntegrityError):
+                place_order(self.user, self.quote, payment_method='upi')
+        
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(OrderItem.objects.count(), 3)
+        self.assertEqual(Payment.objects.count(), 1)
+
+
+class IdempotencyKeyTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='retry@test.com',
+            email='retry@test.com',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.item = MenuItem.objects.create(name="Retry Roll", price=4, category="bread")
+        self.payload = {'items': [{'menu_item_id': self.item.id, 'quantity': 2}], 'payment_method': 'upi'}
+    
+    def post_order(self, payload, key='order-key-1'):
+        return self.client.post('/api/orders/', payload, format='json', HTTP_IDEMPOTENCY_KEY=key)
+    
+    def test_retry_replays_stored_response(self):
+        """Test that a retried order returns the first response without touching order tables"""
+        first = self.post_order(self.payload)
+        self.assertEqual(first.status_code, 201)
+        
+        with CaptureQueriesContext(connection) as queries:
+            retry = self.post_order(self.payload)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertFalse([q for q in queries.captured_queries if 'bakery_order' in q['sql']])
+        self.assertEqual(Order.objects.count(), 1)
+    
+    def test_key_reused_for_different_request(self):
+        """Test that reusing a key with a different body is rejected"""
+        self.post_order(self.payload)
+        response = self.post_order({**self.payload, 'delivery_notes': 'changed'})
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+    
+    def test_validation_errors_are_not_stored(self):
+        """Test that a rejected request can be corrected and sent again with the same key"""
+        self.assertEqual(self.post_order({'items': []}, key='bad').status_code, 400)
+        response = self.post_order(self.payload, key='bad')
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(Order.objects.count(), 1)
+
+
+class JobQueueTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='jobs@test.com', password='testpass123')
+        self.order = Order.objects.create(user=self.user, order_id="JOB1", total_amount=10)
+    
+    def test_enqueued_job_is_claimed_once_and_run(self):
+        """Test that a queued job is claimed by one worker and records its timing"""
+        job = jobs.enqueue('update_order_status', order_ids=[self.order.id], status='confirmed')
+        
+        claimed = jobs.claim_job('worker-1')
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertIsNone(jobs.claim_job('worker-2'))
+        
+        self.assertTrue(jobs.run_job(claimed))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'succeeded')
+        self.assertIsNotNone(job.duration_ms)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'confirmed')
+        self.assertIsNotNone(self.order.confirmed_at)
+    
+    def test_failed_job_is_retried_with_backoff(self):
+        """Test that failures are rescheduled until max_attempts is reached"""
+        def explode():
+            raise RuntimeError('boom')
+        
+        with mock.patch.dict(jobs.registry, {'explode': explode}):
+            job = jobs.enqueue('explode', max_attempts=2)
+            self.assertFalse(jobs.run_job(jobs.claim_job('worker-1')))
+            job.refresh_from_db()
+            self.assertEqual(job.status, 'queued')
+            self.assertGreater(job.run_at, job.created_at)
+            self.assertIn('boom', job.last_error)
+            
+            Job.objects.filter(pk=job.pk).update(run_at=job.created_at)
+            self.assertFalse(jobs.run_job(jobs.claim_job('worker-1')))
+            job.refresh_from_db()
+            self.assertEqual(job.status, 'failed')
+            self.assertEqual(job.attempts, 2)
+
+    
+    def test_upi_screenshot_is_stored_in_the_request_and_verified_by_a_job(self):
+        """Test that the screenshot is in media storage at checkout and removed by the job if not an image"""
+        item = MenuItem.objects.create(name="Rusk", price=20, category='cookies')
+        self.client.login(username='jobs@test.com', password='testpass123')
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            screenshot = SimpleUploadedFile('paid.png', b'not an image', content_type='image/png')
+            self.client.post('/upi-payment/', {
+                'cart_data': json.dumps({str(item.id): {'quantity': 1}}), 'delivery_address': '1 Lane',
+                'delivery_phone': '9999999999', 'payment_screenshot': screenshot,
+            })
+            payment = Payment.objects.get(order__user=self.user, payment_method='upi')
+            self.assertTrue(payment.payment_screenshot.storage.exists(payment.payment_screenshot.name))
+            
+            claimed = jobs.claim_job('worker-1')
+            self.assertEqual((claimed.name, claimed.payload), ('verify_payment_screenshot', {'payment_id': payment.id}))
+            self.assertTrue(jobs.run_job(claimed))
+            stored_name = payment.payment_screenshot.name
+            payment.refresh_from_db()
+            self.assertFalse(payment.payment_screenshot)
+            self.assertFalse(payment.payment_screenshot.storage.exists(stored_name))
+            self.assertEqual(payment.verification_notes, 'Uploaded screenshot is not a valid image')
+    
+    def test_upi_screenshot_is_deleted_when_the_order_fails(self):
+        """Test that a checkout that rolls back removes its screenshot from the payment field's storage"""
+        item = MenuItem.objects.create(name="Rusk", price=20, category='cookies')
+        self.client.login(username='jobs@test.com', password='testpass123')
+        storage = Payment._meta.get_field('payment_screenshot').storage
+        with mock.patch.object(storage, 'save', return_value='payment_screenshots/paid.png'), \
+                mock.patch.object(storage, 'delete') as delete, \
+                mock.patch('bakery.views.place_order', side_effect=IntegrityError('duplicate')):
+            self.client.post('/upi-payment/', {
+                'cart_data': json.dumps({str(item.id): {'quantity': 1}}), 'delivery_address': '1 Lane',
+                'payment_screenshot': SimpleUploadedFile('paid.png', b'png', content_type='image/png'),
+            })
+        delete.assert_called_once_with('payment_screenshots/paid.png')
+        self.assertFalse(Payment.objects.exists())
+
+
+class OrderStatusEventTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='live@test.com', password='testpass123')
+        self.staff = User.objects.create_user(username='staff@test.com', password='testpass123', is_staff=True)
+        self.order = Order.objects.create(user=self.user, order_id="LIVE1", total_amount=10)
+    
+    def test_status_changes_record_events(self):
+        """Test that API status updates, cancels and bulk jobs all record events"""
+        self.client.force_authenticate(user=self.staff)
+        self.client.patch(f'/api/orders/{self.order.id}/update_status/', {'status': 'confirmed'}, format='json')
+        self.client.force_authenticate(user=self.user)
+        self.client.patch(f'/api/orders/{self.order.id}/cancel/')
+        jobs.registry['update_order_status']([self.order.id], 'pending')
+        
+        events = OrderStatusEvent.objects.filter(order=self.order)
+        self.assertEqual([event.status for event in events], ['confirmed', 'cancelled', 'pending'])
+        self.assertTrue(all(event.user_id == self.user.id for event in events))
+    
+    def test_stream_requires_login_and_asgi(self):
+        """Test that anonymous users are refused and WSGI requests are told to stop"""
+        self.assertEqual(self.client.get('/orders/stream/').status_code, 401)
+        self.client.login(username='live@test.com', password='testpass123')
+        self.assertEqual(self.client.get('/orders/stream/').status_code, 204)
+
+
+@override_settings(ORDER_EVENTS_POLL_INTERVAL=0.05)
+class OrderStatusStreamTestCase(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='stream@test.com', password='testpass123')
+        self.other = User.objects.create_user(username='other@test.com', password='testpass123')
+        self.order = Order.objects.create(user=self.user, order_id="LIVE2", total_amount=10)
+        self.other_order = Order.objects.create(user=self.other, order_id="LIVE3", total_amount=10)
+    
+    def test_stream_replays_and_pushes_own_events(self):
+        """Test that the stream replays from Last-Event-ID and then pushes only the user's changes"""
+        missed = OrderStatusEvent.objects.create(user=self.user, order=self.order, status='confirmed')
+        
+        async def read_stream():
+            stream = order_event_stream(self.user.id, last_event_id=missed.id - 1)
+            messages = [await stream.__anext__(), await stream.__anext__()]
+            while get_hub().last_id is None:
+                await asyncio.sleep(0.01)
+            await sync_to_async(OrderStatusEvent.objects.create)(
+                user=self.other, order=self.other_order, status='ready')
+            await sync_to_async(OrderStatusEvent.objects.create)(
+                user=self.user, order=self.order, status='preparing')
+            messages.append(await asyncio.wait_for(stream.__anext__(), timeout=5))
+            await stream.aclose()
+            return messages
+        
+        retry, replayed, pushed = async_to_sync(read_stream)()
+        self.assertTrue(retry.startswith('retry:'))
+        self.assertIn(f'id: {missed.id}', replayed)
+        self.assertIn('"status": "confirmed"', replayed)
+        self.assertIn('"order_id": "LIVE2"', pushed)
+        self.assertIn('"status": "preparing"', pushed)
+
+
+class UserOrderStatsTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='stats@test.com', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+    
+    def create_order(self, order_id, status='pending'):
+        return Order.objects.create(user=self.user, order_id=order_id, status=status,
+                                    total_amount='100.00', delivery_fee='50.00')
+    
+    def assert_stats(self, **expected):
+        stats = UserOrderStats.objects.get(pk=self.user.pk)
+        for field, value in expected.items():
+            self.assertEqual(getattr(stats, field), value, field)
+    
+    def test_stats_follow_creates_status_changes_and_deletes(self):
+        """Test that stats are updated incrementally by saves, bulk status jobs and deletes"""
+        first = self.create_order('STAT1')
+        second = self.create_order('STAT2')
+        self.assert_stats(total_orders=2, pending_orders=2, completed_orders=0)
+        
+        first.status = 'delivered'
+        first.save()
+        jobs.registry['update_order_status']([second.id], 'cancelled')
+        self.assert_stats(total_orders=2, pending_orders=0, completed_orders=1,
+                          cancelled_orders=1, total_spent=Decimal('150.00'))
+        
+        Order.objects.get(pk=first.pk).delete()
+        self.assert_stats(total_orders=1, completed_orders=0, cancelled_orders=1, total_spent=Decimal('0'))
+    
+    def test_stale_copies_count_a_change_once(self):
+        """Test that two copies of one order cancelled in turn (a double-clicked cancel) count it once"""
+        order = self.create_order('STAT6')
+        first, second = Order.objects.get(pk=order.pk), Order.objects.get(pk=order.pk)
+        first.status = second.status = 'cancelled'
+        # The order's UPDATE and the stats UPDATE; no read of the row first
+        with self.assertNumQueries(2):
+            first.save(update_fields=['status', 'updated_at'])
+        second.save()
+        self.assert_stats(total_orders=1, pending_orders=0, cancelled_orders=1)
+        
+        second.status = 'delivered'
+        second.save()
+        self.assert_stats(total_orders=1, pending_orders=0, completed_orders=1, cancelled_orders=0)
+    
+    def test_dashboard_reads_one_stats_row(self):
+        """Test that the dashboard reads counters by primary key instead of aggregating orders"""
+        self.create_order('STAT3', status='delivered')
+        self.create_order('STAT4')
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/dashboard/stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_orders'], 2)
+        self.assertEqual(response.data['completed_orders'], 1)
+        self.assertEqual(response.data['total_spent'], '150.00')
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries.captured_queries))
+    
+    def test_rebuild_command_repairs_drift(self):
+        """Test that rebuild_order_stats recomputes drifted rows"""
+        self.create_order('STAT5', status='delivered')
+        UserOrderStats.objects.filter(pk=self.user.pk).update(total_orders=7, total_spent=0)
+        
+        out = StringIO()
+        call_command('rebuild_order_stats', '--check', stdout=out)
+        self.assertIn('1 with drifted stats', out.getvalue())
+        
+        call_command('rebuild_order_stats', stdout=StringIO())
+        self.assert_stats(total_orders=1, completed_orders=1, total_spent=Decimal('150.00'))
+
+
+@override_settings(ORDER_HISTORY_PAGE_SIZE=5)
+class OrdersPageTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='page@test.com', password='testpass123')
+        self.menu_item = MenuItem.objects.create(name="Page Scone", price=3, category="scone")
+        self.client.login(username='page@test.com', password='testpass123')
+    
+    def create_orders(self, count, status):
+        start = Order.objects.filter(status=status).count()
+        for i in range(start, start + count):
+            order = Order.objects.create(user=self.user, order_id=f"PAGE-{status}-{i}",
+                                         status=status, total_amount=3)
+            OrderItem.objects.create(order=order, menu_item=self.menu_item, quantity=1, price=3)
+            Payment.objects.create(order=order, payment_method='cod', transaction_id=f"TXN-{status}-{i}",
+                                   amount=order.grand_total)
+    
+    def test_query_count_does_not_grow_with_orders(self):
+        """Test that the orders page runs a fixed number of queries however many orders exist"""
+        # session, user, orders (with payment), items, menu items, stats row
+        self.create_orders(1, 'pending')
+        self.create_orders(1, 'delivered')
+        with self.assertNumQueries(6):
+            self.client.get('/orders/')
+        
+        self.create_orders(10, 'confirmed')
+        self.create_orders(100, 'delivered')
+        caches['auth'].clear()
+        with self.assertNumQueries(6):
+            response = self.client.get('/orders/')
+        
+        self.assertEqual(len(response.context['current_orders']), 11)
+        self.assertEqual(len(response.context['order_history']), 5)
+        self.assertEqual(response.context['history_count'], 101)
+        self.assertTrue(response.context['history_cursor'])
+    
+    def test_history_pages_cover_every_order_once(self):
+        """Test that Load More pages continue the first history page without gaps or repeats"""
+        self.create_orders(12, 'delivered')
+        response = self.client.get('/orders/')
+        seen = [order.order_id for order in response.context['order_history']]
+        cursor = response.context['history_cursor']
+        
+        while cursor:
+            page = self.client.get('/orders/history/', {'cursor': cursor})
+            seen += [order.order_id for order in page.context['orders']]
+            cursor = page['X-Next-Cursor']
+        
+        self.assertEqual(sorted(seen), sorted(f"PAGE-delivered-{i}" for i in range(12)))
+        self.assertEqual(self.client.get('/orders/history/', {'cursor': 'bogus'}).status_code, 404)
+
+
+def query_plan(sql):
+    """The database's plan for a captured query, one line per step"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # Postgres seq-scans tiny test tables by choice; only report scans it can't avoid
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'EXPLAIN {sql}')
+            return [row[0] for row in cursor.fetchall()]
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def partial_indexes():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND sql LIKE '% WHERE %'")
+        return {row[0] for row in cursor.fetchall()}
+
+
+def is_full_scan(step):
+    if connection.vendor == 'postgresql':
+        return 'Seq Scan' in step
+    # SQLite: "SEARCH" seeks; "SCAN" reads a whole table or index, which is
+    # only acceptable over a partial index (it holds just the matching rows)
+    if not step.startswith('SCAN '):
+        return False
+    return not any(step.endswith(f' INDEX {name}') for name in partial_indexes())
+
+
+class QueryPlanTestCase(TestCase):
+    """EXPLAIN every query behind the hot endpoints and fail on full table scans"""
+    
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='plan@test.com', password='testpass123')
+        self.staff = User.objects.create_user(username='planstaff@test.com', password='testpass123', is_staff=True)
+        item = MenuItem.objects.create(name="Plan Loaf", price=4, category="bread")
+        self.order = Order.objects.create(user=self.user, order_id="PLAN1", total_amount=4)
+        OrderItem.objects.create(order=self.order, menu_item=item, quantity=1, price=4)
+        Payment.objects.create(order=self.order, payment_method='upi', transaction_id="TXN-PLAN1", amount=54)
+    
+    def assert_no_full_scans(self, url, user=None):
+        """Fail if any SELECT behind a GET of url scans a whole table"""
+        self.client.force_authenticate(user=user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        
+        for query in queries.captured_queries:
+            if not query['sql'].startswith('SELECT'):
+                continue
+            scans = [step for step in query_plan(query['sql']) if is_full_scan(step)]
+            self.assertFalse(scans, f"{url} scans a whole table: {scans}\n{query['sql']}")
+    
+    def test_menu_endpoints_use_indexes(self):
+        """Test that the menu list, category filter and categories use indexes"""
+        for url in ['/api/menu-items/', '/api/menu-items/?category=bread', '/api/menu-items/categories/']:
+            self.assert_no_full_scans(url)
+    
+    def test_customer_order_endpoints_use_indexes(self):
+        """Test that a customer's order, payment and dashboard endpoints use indexes"""
+        for url in ['/api/orders/', '/api/orders/?status=pending', '/api/orders/current/',
+                    '/api/orders/history/', f'/api/orders/{self.order.id}/',
+                    '/api/payments/', '/api/dashboard/stats/']:
+            self.assert_no_full_scans(url, self.user)
+    
+    def test_staff_order_endpoints_use_indexes(self):
+        """Test that staff order and payment lists across all customers use indexes"""
+        for url in ['/api/orders/?status=pending', '/api/orders/current/', '/api/orders/history/',
+                    '/api/payments/?status=pending']:
+            self.assert_no_full_scans(url, self.staff)
+    
+    def test_orders_page_uses_indexes(self):
+        """Test that the orders page queries use indexes"""
+        self.client.login(username='plan@test.com', password='testpass123')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/orders/')
+        for query in queries.captured_queries:
+            if query['sql'].startswith('SELECT'):
+                self.assertFalse([step for step in query_plan(query['sql']) if is_full_scan(step)], query['sql'])
+
+
+def query_shape(sql):
+    """A query with its literals stripped, so repeats of one statement compare equal"""
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+(\.\d+)?\b', '?', sql)
+    return re.sub(r'IN \((\?, )*\?\)', 'IN (...)', sql)
+
+
+def route_names(urlconf):
+    """Names of every route in a urlconf, including router-generated ones"""
+    def walk(patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                yield from walk(pattern.url_patterns)
+            elif isinstance(pattern, URLPattern) and pattern.name:
+                yield pattern.name
+    return set(walk(get_resolver(urlconf).url_patterns))
+
+
+# (route name, method, path, who, payload, query budget).
+# Paths are formatted with the fixture ids below; every request runs at
+# 1, 10 and 100 customer orders and must use exactly its budget each time.
+QUERY_BUDGETS = [
+    # Pages
+    ('index', 'get', '/', 'anon', None, 0),
+    ('menu', 'get', '/menu/', 'anon', None, 1),
+    ('about', 'get', '/about/', 'anon', None, 0),
+    ('contact', 'get', '/contact/', 'anon', None, 0),
+    ('cart', 'get', '/cart/', 'customer', None, 2),
+    ('checkout', 'get', '/checkout/', 'customer', None, 2),
+    ('orders', 'get', '/orders/', 'customer', None, 6),
+    ('order_history_page', 'get', '/orders/history/', 'customer', None, 5),
+    ('order_status_stream', 'get', '/orders/stream/', 'customer', None, 2),
+    ('payment', 'get', '/payment/', 'customer', None, 2),
+    ('upi_payment', 'get', '/upi-payment/', 'customer', None, 2),
+    ('login', 'get', '/login/', 'anon', None, 0),
+    ('signup', 'get', '/signup/', 'anon', None, 0),
+    ('logout', 'get', '/logout/', 'customer', None, 4),
+    # Menu API
+    ('api-root', 'get', '/api/', 'anon', None, 0),
+    ('menu-item-list', 'get', '/api/menu-items/', 'anon', None, 1),
+    ('menu-item-categories', 'get', '/api/menu-items/categories/', 'anon', None, 1),
+    ('menu-item-detail', 'get', '/api/menu-items/{menu_item}/', 'anon', None, 1),
+    ('menu-item-toggle-availability', 'patch', '/api/menu-items/{menu_item}/toggle_availability/', 'staff', None, 4),
+    # Order API
+    ('order-list', 'get', '/api/orders/', 'customer', None, 5),
+    ('order-list', 'get', '/api/orders/', 'staff', None, 5),
+    ('order-list', 'post', '/api/orders/', 'customer',
+     {'items': [{'menu_item_id': '{menu_item}', 'quantity': 2}], 'payment_method': 'upi'}, 12),
+    ('order-current', 'get', '/api/orders/current/', 'customer', None, 4),
+    ('order-history', 'get', '/api/orders/history/', 'customer', None, 4),
+    ('order-detail', 'get', '/api/orders/{order}/', 'customer', None, 5),
+    ('order-cancel', 'patch', '/api/orders/{order}/cancel/', 'customer', None, 9),
+    ('order-update-status', 'patch', '/api/orders/{order}/update_status/', 'staff', {'status': 'ready'}, 8),
+    ('order-lookup', 'get', '/api/orders/lookup/?q=budget', 'staff', None, 4),
+    ('order-export', 'get', '/api/orders/export/?since=2020-01-01', 'staff', None, 3),
+    # Payment API
+    ('payment-list', 'get', '/api/payments/', 'customer', None, 3),
+    ('payment-detail', 'get', '/api/payments/{payment}/', 'customer', None, 3),
+    ('payment-process', 'post', '/api/payments/process/', 'customer',
+     {'order_id': '{unpaid_order}', 'payment_method': 'upi'}, 8),
+    ('payment-export', 'get', '/api/payments/export/?type=ndjson', 'staff', None, 3),
+    ('payment-mark-completed', 'patch', '/api/payments/{payment}/mark_completed/', 'staff', None, 4),
+    # Profiles, auth and dashboard
+    ('profile-me', 'get', '/api/profiles/me/', 'customer', None, 3),
+    ('profile-detail', 'get', '/api/profiles/{profile}/', 'customer', None, 3),
+    ('api_register', 'post', '/api/auth/register/', 'anon',
+     {'username': 'budget-new@test.com', 'email': 'budget-new@test.com', 'password': 'testpass123'}, 7),
+    ('api_login', 'post', '/api/auth/login/', 'anon',
+     {'email': 'budget@test.com', 'password': 'testpass123'}, 3),
+    ('api_logout', 'post', '/api/auth/logout/', 'token', None, 2),
+    ('api_current_user', 'get', '/api/auth/user/', 'customer', None, 3),
+    ('api_auth_cache_stats', 'get', '/api/auth/cache-stats/', 'staff', None, 2),
+    ('api_db_pool_stats', 'get', '/api/db/pool-stats/', 'staff', None, 2),
+    ('api_cart_quote', 'post', '/api/cart/quote/', 'anon',
+     {'items': [{'menu_item_id': '{menu_item}', 'quantity': 1}]}, 1),
+    ('api_dashboard_stats', 'get', '/api/dashboard/stats/', 'customer', None, 5),
+    ('api_sales_report', 'get', '/api/reports/sales/?group=item', 'staff', None, 4),
+    ('upi-payment', 'get', '/api/dashboard/upi-payments/', 'customer', None, 2),
+]
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'], JOBS_ASYNC=False)
+class QueryBudgetTestCase(TestCase):
+    """Every route keeps a fixed query count however many orders a customer has"""
+    
+    def setUp(self):
+        self.customer = User.objects.create_user(username='budget@test.com', email='budget@test.com',
+                                                 password='testpass123')
+        self.staff = User.objects.create_user(username='budget-staff@test.com', password='testpass123',
+                                              is_staff=True)
+        self.token = Token.objects.create(user=self.customer)
+        self.menu_items = [
+            MenuItem.objects.create(name=f"Budget Bun {i}", price=3, category="bun") for i in range(3)
+        ]
+        self.profile = UserProfile.objects.create(user=self.customer)
+        self.statuses = [status for status, _ in Order.STATUS_CHOICES]
+        get_lookup_backend()  # its one-off FTS5 check would count against the first lookup
+    
+    def add_orders(self, count):
+        start = Order.objects.filter(user=self.customer).count()
+        for i in range(start, start + count):
+            order = Order.objects.create(user=self.customer, order_id=f"BUDGET-{i}",
+                                         status=self.statuses[i % len(self.statuses)], total_amount=6)
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, menu_item=item, quantity=1, price=3) for item in self.menu_items[:2]
+            ])
+            Payment.objects.create(order=order, payment_method='upi', transaction_id=f"TXN-BUDGET-{i}",
+                                   amount=order.grand_total)
+    
+    def fixture_ids(self):
+        """Fresh targets for the write endpoints, created outside the measured request"""
+        order = Order.objects.create(user=self.customer, order_id="BUDGET-TARGET", total_amount=6)
+        OrderItem.objects.create(order=order, menu_item=self.menu_items[0], quantity=2, price=3)
+        payment = Payment.objects.create(order=order, payment_method='upi', transaction_id="TXN-BUDGET-TARGET",
+                                         amount=order.grand_total)
+        unpaid = Order.objects.create(user=self.customer, order_id="BUDGET-UNPAID", total_amount=6)
+        delivered = Order.objects.create(user=self.customer, order_id="BUDGET-DELIVERED",
+                                         status='delivered', total_amount=6)
+        OrderItem.objects.create(order=delivered, menu_item=self.menu_items[0], quantity=2, price=3)
+        return {'order': order.id, 'payment': payment.id, 'unpaid_order': unpaid.id,
+                'menu_item': self.menu_items[0].id, 'profile': self.profile.id}
+    
+    def format_payload(self, payload, ids):
+        if isinstance(payload, dict):
+            return {key: self.format_payload(value, ids) for key, value in payload.items()}
+        if isinstance(payload, list):
+            return [self.format_payload(value, ids) for value in payload]
+        if isinstance(payload, str) and payload.startswith('{'):
+            return ids[payload.strip('{}')]
+        return payload
+    
+    def measure(self, method, path, who, payload):
+        """Run one request in a rolled-back savepoint; returns (response, captured queries)"""
+        client = APIClient()
+        if who == 'token':
+            client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        elif who != 'anon':
+            client.force_login(self.staff if who == 'staff' else self.customer)
+        cache.clear()
+        # Budgets are for a cold authentication cache
+        caches['auth'].clear()
+        
+        with transaction.atomic():
+            ids = self.fixture_ids()
+            request = getattr(client, method)
+            with CaptureQueriesContext(connection) as queries:
+                response = request(path.format(**ids), self.format_payload(payload, ids), format='json')
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            transaction.set_rollback(True)
+        return response, queries.captured_queries
+    
+    def test_every_route_has_a_budget(self):
+        budgeted = {name for name, *_ in QUERY_BUDGETS}
+        missing = (route_names('bakery.urls') | route_names('bakery.api_urls')) - budgeted
+        self.assertFalse(missing, f"Routes without a query budget: {sorted(missing)}")
+    
+    def test_query_counts_stay_within_budget(self):
+        for size in [1, 10, 100]:
+            self.add_orders(size - Order.objects.filter(user=self.customer).count())
+            for name, method, path, who, payload, budget in QUERY_BUDGETS:
+                with self.subTest(route=name, method=method, who=who, orders=size):
+                    response, queries = self.measure(method, path, who, payload)
+                    self.assertLess(response.status_code, 400, f"{method.upper()} {path}: {response.status_code}")
+                    if len(queries) != budget:
+                        shapes = Counter(query_shape(query['sql']) for query in queries)
+                        repeated = '\n'.join(f"  {count}x {shape}" for shape, count in shapes.most_common()
+                                             if count > 1)
+                        self.fail(f"{method.upper()} {path} as {who} with {size} orders ran {len(queries)} "
+                                  f"queries (budget {budget}). Repeated query shapes:\n{repeated or '  none'}")
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'], JOBS_ASYNC=False)
+class LoadTestCommandTestCase(TransactionTestCase):
+    def setUp(self):
+        MenuItem.objects.create(name="Load Bun", description="Test", price=20, category="bread")
+        MenuItem.objects.create(name="Load Cake", description="Test", price=80, category="cake")
+    
+    def test_percentile(self):
+        """Test nearest-rank percentiles"""
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
+        self.assertEqual(percentile([], 50), 0.0)
+    
+    def test_flow_runs_and_compares_with_baseline(self):
+        """Test that every flow step succeeds, is saved as a baseline and compared"""
+        with tempfile.NamedTemporaryFile(suffix='.json') as baseline_file:
+            call_command('loadtest', '--users', '1', '--iterations', '2',
+                         '--save-baseline', baseline_file.name, stdout=StringIO())
+            with open(baseline_file.name) as saved:
+                endpoints = json.load(saved)['endpoints']
+            out = StringIO()
+            call_command('loadtest', '--users', '1', '--iterations', '1', '--compare', baseline_file.name,
+                         stdout=out)
+        
+        self.assertEqual(endpoints['POST /api/orders/']['requests'], 2)
+        self.assertEqual(endpoints['GET /api/orders/current/']['requests'], 6)
+        self.assertFalse(any(row['errors'] for row in endpoints.values()), endpoints)
+        self.assertIn('POST /api/auth/login/', out.getvalue())
+        self.assertFalse(User.objects.filter(username__startswith='loadtest-').exists())
+        self.assertFalse(Order.objects.exists())
+
+
+class GenerateDatasetTestCase(TestCase):
+    def setUp(self):
+        MenuItem.objects.create(name="Synthetic Bun", description="Test", price=Decimal('20.50'), category="bread")
+        MenuItem.objects.create(name="Synthetic Cake", description="Test", price=80, category="cake")
+    
+    def test_generates_consistent_orders_and_deletes_them(self):
+        """Test that generated orders add up, carry their own timestamps and can be removed"""
+        call_command('generate_dataset', '--users', '5', '--orders', '120', '--chunk-size', '50',
+                     '--days', '30', '--workers', '1', stdout=StringIO())
+        
+        orders = Order.objects.filter(user__username__startswith='synthetic-')
+        self.assertEqual(orders.count(), 120)
+        self.assertEqual(Payment.objects.filter(order__in=orders).count(), 120)
+        self.assertEqual(UserProfile.objects.filter(user__username__startswith='synthetic-').count(), 5)
+        for order in orders.prefetch_related('items'):
+            self.assertEqual(order.total_amount, sum(item.subtotal for item in order.items.all()))
+            if order.status == 'delivered':
+                self.assertLess(order.created_at, order.delivered_at)
+        self.assertLess(orders.order_by('created_at').first().created_at,
+                        timezone.now() - timedelta(days=7))
+        out = StringIO()
+        call_command('rebuild_order_stats', '--check', stdout=out)
+        self.assertIn('0 with drifted stats', out.getvalue())
+        
+        call_command('generate_dataset', '--delete', stdout=StringIO())
+        self.assertFalse(User.objects.filter(username__startswith='synthetic-').exists())
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+
+
+class LargeTableAdminTestCase(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin@test.com', password='testpass123')
+        self.customer = User.objects.create_user(username='admincustomer@test.com', password='testpass123')
+        self.menu_item = MenuItem.objects.create(name="Admin Bun", description="Test", price=20, category="bread")
+        self.client.force_login(self.admin)
+    
+    def add_orders(self, count, start=0):
+        for n in range(start, start + count):
+            order = Order.objects.create(user=self.customer, order_id=f"ADM{n}", total_amount=20)
+            OrderItem.objects.create(order=order, menu_item=self.menu_item, quantity=1, price=20)
+            Payment.objects.create(order=order, payment_method='upi', transaction_id=f"TXN-ADM{n}", amount=70)
+    
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """Test that the order and payment changelists run the same queries for 2 or 30 rows"""
+        counts = {}
+        for size in [2, 30]:
+            self.add_orders(size - Order.objects.count(), start=Order.objects.count())
+            for path in ['/admin/bakery/order/', '/admin/bakery/payment/']:
+                caches['auth'].clear()
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(path)
+                self.assertEqual(response.status_code, 200)
+                counts.setdefault(path, set()).add(len(queries))
+        self.assertTrue(all(len(sizes) == 1 for sizes in counts.values()), counts)
+    
+    def test_order_change_page_renders(self):
+        """Test the change page with its inlines, including the blank Add-another row"""
+        self.add_orders(1)
+        response = self.client.get(f'/admin/bakery/order/{Order.objects.get().pk}/change/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Admin Bun')
+    
+    def test_date_hierarchy_spans_first_to_last_month(self):
+        """Test that the drill-down lists every month between the first and last order"""
+        self.add_orders(2)
+        Order.objects.filter(order_id='ADM0').update(created_at=timezone.make_aware(timezone.datetime(2025, 2, 10)))
+        Order.objects.filter(order_id='ADM1').update(created_at=timezone.make_aware(timezone.datetime(2025, 5, 3)))
+        response = self.client.get('/admin/bakery/order/')
+        self.assertEqual([choice['title'] for choice in response.context['choices']],
+                         ['February 2025', 'March 2025', 'April 2025', 'May 2025'])
+        response = self.client.get('/admin/bakery/order/?created_at__year=2025&created_at__month=5')
+        self.assertEqual([choice['title'] for choice in response.context['choices']], ['May 3'])
+    
+    @override_settings(ADMIN_EXACT_COUNT_LIMIT=1)
+    def test_paginator_uses_estimate_for_large_tables(self):
+        """Test that unfiltered lists use the ANALYZE row count and filtered ones count exactly"""
+        self.add_orders(3)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.add_orders(2, start=3)
+        self.assertEqual(estimated_count(Order.objects.all()), 3)
+        self.assertEqual(EstimatedCountPaginator(Order.objects.all(), 50).count, 3)
+        self.assertEqual(EstimatedCountPaginator(Order.objects.filter(status='pending'), 50).count, 5)
+
+
+class OrderLookupTestCase(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='lookupadmin@test.com', password='testpass123')
+        self.customer = User.objects.create_user(username='priya@test.com', email='priya@test.com',
+                                                 password='testpass123')
+        self.order = Order.objects.create(user=self.customer, order_id='ORD-3F2A91', total_amount=20,
+                                          delivery_phone='+91 98765-43210')
+        Payment.objects.create(order=self.order, payment_method='upi', transaction_id='TXN-77A1B2',
+                               upi_id='priya@okbank', amount=70)
+        self.other = Order.objects.create(user=self.admin, order_id='ORD-BB0001', total_amount=20)
+    
+    def search(self, query):
+        return list(search_orders(Order.objects.all(), query).values_list('order_id', flat=True))
+    
+    def test_lookup_text_is_normalized(self):
+        """Test that the lookup text is lower case and phone numbers are reduced to digits"""
+        self.assertEqual(OrderLookup.objects.get(order=self.order).text,
+                         lookup_text('ORD-3F2A91', 'priya@test.com', '+91 98765-43210', 'TXN-77A1B2', 'priya@okbank'))
+        self.assertEqual(tokenize('ORD-3f2a 98765 43210'), ['ord-3f2a', '98765', '43210'])
+    
+    def test_search_by_each_field(self):
+        """Test finding an order by order id, email, phone, transaction and UPI id fragments"""
+        for query in ['3f2a', 'ord-3F2A91', 'PRIYA@', '98765 43210', '(987) 654', 'txn-77a', 'okbank', 'ord f2']:
+            with self.subTest(query=query):
+                self.assertEqual(self.search(query), ['ORD-3F2A91'])
+        self.assertEqual(sorted(self.search('ord')), ['ORD-3F2A91', 'ORD-BB0001'])
+        self.assertEqual(self.search('ord nobody'), [])
+    
+    def test_rows_follow_order_and_email_changes(self):
+        """Test that lookup rows are refreshed when the phone or the customer's email changes"""
+        self.order.delivery_phone = '555-0101'
+        self.order.save()
+        self.assertEqual(self.search('5550101'), ['ORD-3F2A91'])
+        self.customer.email = 'priya.k@example.com'
+        self.customer.save()
+        self.assertEqual(self.search('example.com'), ['ORD-3F2A91'])
+        self.assertEqual(self.search('priya@test'), [])
+    
+    def test_rows_follow_payment_changes_and_deletes(self):
+        """Test that lookup rows are refreshed when a payment's UPI id changes or it is deleted"""
+        payment = Payment.objects.get(order=self.order)
+        payment.upi_id = 'priya@newbank'
+        payment.save()
+        self.assertEqual(self.search('newbank'), ['ORD-3F2A91'])
+        self.assertEqual(self.search('okbank'), [])
+        payment.delete()
+        self.assertEqual(self.search('txn-77a'), [])
+        self.assertEqual(self.search('3f2a'), ['ORD-3F2A91'])
+        order_pk = self.order.pk
+        self.order.delete()
+        self.assertFalse(OrderLookup.objects.filter(order_id=order_pk).exists())
+    
+    def test_rebuild_command(self):
+        """Test that rebuild_order_lookups restores missing rows"""
+        OrderLookup.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_order_lookups', stdout=out)
+        self.assertIn('Rebuilt 2', out.getvalue())
+        self.assertEqual(self.search('txn-77a'), ['ORD-3F2A91'])
+    
+    def test_admin_and_api_search(self):
+        """Test that the admin changelists and the staff endpoint search the lookup index"""
+        self.client.force_login(self.admin)
+        response = self.client.get('/admin/bakery/order/', {'q': '98765'})
+        self.assertEqual([order.order_id for order in response.context['cl'].result_list], ['ORD-3F2A91'])
+        response = self.client.get('/admin/bakery/payment/', {'q': 'okbank'})
+        self.assertEqual([payment.transaction_id for payment in response.context['cl'].result_list], ['TXN-77A1B2'])
+        
+        api = APIClient()
+        api.force_authenticate(self.admin)
+        response = api.get('/api/orders/lookup/', {'q': 'priya@'})
+        self.assertEqual([order['order_id'] for order in response.data['results']], ['ORD-3F2A91'])
+        self.assertEqual(api.get('/api/orders/lookup/').status_code, 400)
+        api.force_authenticate(self.customer)
+        self.assertEqual(api.get('/api/orders/lookup/', {'q': 'ord'}).status_code, 403)
+
+
+class ExportTestCase(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='exportadmin@test.com', password='testpass123')
+        self.customer = User.objects.create_user(username='exporter@test.com', email='exporter@test.com',
+                                                 password='testpass123')
+        for n, (status, day) in enumerate([('pending', 1), ('delivered', 2), ('delivered', 3)]):
+            created_at = timezone.make_aware(timezone.datetime(2026, 3, day, 12))
+            order = Order.objects.create(user=self.customer, order_id=f'EXP{n}', status=status, total_amount=20)
+            payment = Payment.objects.create(order=order, payment_method='upi', transaction_id=f'TXN-EXP{n}',
+                                             amount=70, payment_status='completed' if status == 'delivered' else 'pending')
+            Order.objects.filter(pk=order.pk).update(created_at=created_at)
+            Payment.objects.filter(pk=payment.pk).update(created_at=created_at)
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+    
+    def download(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+    
+    def test_order_csv_export(self):
+        """Test that orders stream as CSV, oldest first, with a header row"""
+        response = self.api.get('/api/orders/export/')
+        self.assertIn('attachment; filename="orders-', response['Content-Disposition'])
+        lines = self.download(response).splitlines()
+        self.assertEqual(lines[0].split(','), [column for column, _ in exports.ORDER_COLUMNS])
+        self.assertEqual([line.split(',')[0] for line in lines[1:]], ['EXP0', 'EXP1', 'EXP2'])
+        self.assertIn('exporter@test.com,pending,20.00,50.00,upi,pending,TXN-EXP0', lines[1])
+    
+    def test_csv_cells_are_not_formulas(self):
+        """Test that customer-entered text a spreadsheet would evaluate is quoted in CSV only"""
+        Payment.objects.filter(transaction_id='TXN-EXP0').update(upi_id='=HYPERLINK("http://x.test","pay")')
+        Payment.objects.filter(transaction_id='TXN-EXP1').update(upi_id='-2+3')
+        lines = self.download(self.api.get('/api/payments/export/')).splitlines()
+        self.assertIn(',"\'=HYPERLINK(""http://x.test"",""pay"")",', lines[1])
+        self.assertIn(",'-2+3,", lines[2])
+        self.assertIn(',70.00,', lines[1])
+        response = self.api.get('/api/payments/export/', {'type': 'ndjson'})
+        rows = [json.loads(line) for line in self.download(response).splitlines()]
+        self.assertEqual(rows[1]['upi_id'], '-2+3')
+    
+    def test_filters_and_ndjson(self):
+        """Test the status and inclusive date filters with NDJSON output"""
+        response = self.api.get('/api/orders/export/', {'type': 'ndjson', 'status': 'delivered', 'until': '2026-03-02'})
+        rows = [json.loads(line) for line in self.download(response).splitlines()]
+        self.assertEqual([(row['order_id'], row['total_amount']) for row in rows], [('EXP1', '20.00')])
+        response = self.api.get('/api/payments/export/', {'type': 'ndjson', 'status': 'completed', 'since': '2026-03-03'})
+        rows = [json.loads(line) for line in self.download(response).splitlines()]
+        self.assertEqual([row['transaction_id'] for row in rows], ['TXN-EXP2'])
+        
+        for params in [{'type': 'xlsx'}, {'status': 'lost'}, {'since': '03/01/2026'}]:
+            with self.subTest(params=params):
+                self.assertEqual(self.api.get('/api/orders/export/', params).status_code, 400)
+        self.api.force_authenticate(self.customer)
+        self.assertEqual(self.api.get('/api/orders/export/').status_code, 403)
+    
+    @mock.patch.object(exports, 'ROWS_PER_WRITE', 2)
+    def test_rows_are_streamed_in_chunks(self):
+        """Test that rows are written a chunk at a time, also when served through ASGI"""
+        chunks = list(exports.export_lines(Order.objects.all(), exports.ORDER_COLUMNS, 'csv'))
+        self.assertEqual([chunk.count('\n') for chunk in chunks], [1, 2, 1])
+        
+        async def collect():
+            return [chunk async for chunk in exports.iterate_in_thread(
+                exports.export_lines(Payment.objects.all(), exports.PAYMENT_COLUMNS, 'ndjson'))]
+        self.assertEqual([chunk.count('\n') for chunk in async_to_sync(collect)()], [2, 1])
+    
+    def test_admin_export_action(self):
+        """Test the changelist action streaming the selected payments"""
+        self.client.force_login(self.admin)
+        selected = Payment.objects.filter(transaction_id__in=['TXN-EXP0', 'TXN-EXP2'])
+        response = self.client.post('/admin/bakery/payment/', {
+            'action': 'export_csv', '_selected_action': [payment.pk for payment in selected],
+        })
+        lines = self.download(response).splitlines()
+        self.assertEqual([line.split(',')[0] for line in lines[1:]], ['TXN-EXP0', 'TXN-EXP2'])
+
+
+class SalesRollupTestCase(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='salesadmin@test.com', password='testpass123')
+        self.customer = User.objects.create_user(username='salescustomer@test.com', password='testpass123')
+        self.bread = MenuItem.objects.create(name="Rollup Loaf", price=40, category="bread")
+        self.cake = MenuItem.objects.create(name="Rollup Cake", price=300, category="cake")
+        self.orders = [
+            self.add_order(date(2026, 3, 1), [(self.bread, 2), (self.cake, 1)]),
+            self.add_order(date(2026, 3, 1), [(self.bread, 1)], status='cancelled'),
+            self.add_order(date(2026, 3, 2), [(self.bread, 3)], status='delivered'),
+        ]
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+    
+    def add_order(self, day, lines, status='pending'):
+        order = Order.objects.create(user=self.customer, order_id=f"ROLL{Order.objects.count()}", status=status,
+                                     total_amount=sum(item.price * quantity for item, quantity in lines))
+        for item, quantity in lines:
+            OrderItem.objects.create(order=order, menu_item=item, quantity=quantity, price=item.price)
+        # A plain update leaves updated_at alone, as if the order was placed that day
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.make_aware(timezone.datetime(day.year, day.month, day.day, 9)))
+        return order
+    
+    def test_full_refresh_aggregates_days_and_items(self):
+        """Test that cancelled orders are left out and revenue is price times quantity"""
+        self.assertEqual(refresh_rollups(), [date(2026, 3, 1), date(2026, 3, 2)])
+        first = DailySales.objects.get(day=date(2026, 3, 1))
+        self.assertEqual((first.orders, first.units, first.revenue, first.delivery_fees), (1, 3, Decimal('380.00'), Decimal('50.00')))
+        self.assertEqual(
+            sorted(DailyItemSales.objects.values_list('day', 'category', 'units', 'revenue')),
+            [(date(2026, 3, 1), 'bread', 2, Decimal('80.00')), (date(2026, 3, 1), 'cake', 1, Decimal('300.00')),
+             (date(2026, 3, 2), 'bread', 3, Decimal('120.00'))]
+        )
+    
+    def test_incremental_refresh_redoes_changed_days_only(self):
+        """Test that only days of orders saved or deleted since the last refresh are re-aggregated"""
+        refresh_rollups()
+        with mock.patch('bakery.rollups.REFRESH_OVERLAP', timedelta(0)):
+            self.assertEqual(refresh_rollups(), [])
+            cancelled = Order.objects.get(pk=self.orders[1].pk)
+            cancelled.status = 'pending'
+            cancelled.save()
+            self.assertEqual(refresh_rollups(), [date(2026, 3, 1)])
+            self.assertEqual(DailySales.objects.get(day=date(2026, 3, 1)).units, 4)
+            
+            Order.objects.get(pk=self.orders[2].pk).delete()
+            self.assertTrue(DailySales.objects.get(day=date(2026, 3, 2)).stale)
+            self.assertEqual(refresh_rollups(), [date(2026, 3, 2)])
+            self.assertFalse(DailySales.objects.filter(day=date(2026, 3, 2)).exists())
+    
+    def test_refresh_command(self):
+        out = StringIO()
+        call_command('refresh_sales_rollups', '--full', stdout=out)
+        self.assertIn('2 days (2026-03-01 to 2026-03-02)', out.getvalue())
+    
+    def test_sales_report_api(self):
+        """Test the report groups and range, answered from the rollups alone"""
+        refresh_rollups()
+        params = {'since': '2026-03-01', 'until': '2026-03-31'}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.api.get('/api/reports/sales/', params)
+        self.assertFalse([query for query in queries if 'bakery_order' in query['sql']])
+        self.assertEqual(response.data['totals'], {'orders': 2, 'units': 6, 'revenue': '500.00', 'delivery_fees': '100.00'})
+        self.assertEqual([row['day'] for row in response.data['rows']], [date(2026, 3, 1), date(2026, 3, 2)])
+        
+        response = self.api.get('/api/reports/sales/', {**params, 'group': 'category'})
+        self.assertEqual(response.data['rows'], [{'category': 'cake', 'units': 1, 'revenue': '300.00'},
+                                                 {'category': 'bread', 'units': 5, 'revenue': '200.00'}])
+        response = self.api.get('/api/reports/sales/', {**params, 'group': 'item', 'until': '2026-03-01'})
+        self.assertEqual([(row['name'], row['units']) for row in response.data['rows']],
+                         [('Rollup Cake', 1), ('Rollup Loaf', 2)])
+        
+        self.assertEqual(self.api.get('/api/reports/sales/', {'since': '2026-04-01', 'until': '2026-03-01'}).status_code, 400)
+        self.assertEqual(self.api.get('/api/reports/sales/', {'group': 'hour'}).status_code, 400)
+        self.api.force_authenticate(self.customer)
+        self.assertEqual(self.api.get('/api/reports/sales/').status_code, 403)
+
+
+class OrderRowsTestCase(TestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user(username='rows@test.com', email='rows@test.com', password='testpass123',
+                                                 first_name='Asha', last_name='')
+        cake = MenuItem.objects.create(name="Row Cake", price=Decimal('12.5'), category="cake")
+        bun = MenuItem.objects.create(name="Row Bun", price=3, category="bun")
+        for n, status in enumerate(['pending', 'confirmed', 'delivered', 'cancelled']):
+            order = Order.objects.create(user=self.customer, order_id=f"ROW{n}", status=status, total_amount=Decimal('28.5'),
+                                         delivery_fee=0 if n % 2 else 50, delivery_notes='Ring twice',
+                                         confirmed_at=timezone.now() if status != 'pending' else None)
+            OrderItem.objects.create(order=order, menu_item=cake, quantity=1, price=Decimal('12.50'))
+            # Priced before a menu change
+            OrderItem.objects.create(order=order, menu_item=bun, quantity=4, price=Decimal('4'))
+            if n:
+                Payment.objects.create(order=order, payment_method='card', transaction_id=f"TXN-ROW{n}",
+                                       amount=order.grand_total, card_last4='4242',
+                                       paid_at=timezone.now() if status == 'delivered' else None)
+        Order.objects.create(user=self.customer, order_id="ROW-EMPTY", total_amount=0)
+    
+    def test_rows_render_exactly_like_order_serializer(self):
+        """Test that the lean path's JSON is byte-identical to OrderSerializer's"""
+        orders = Order.objects.filter(user=self.customer)
+        expected = JSONRenderer().render(OrderSerializer(orders, many=True).data)
+        with self.assertNumQueries(2):
+            rendered = JSONRenderer().render(serialize_orders(order_values(orders)))
+        self.assertEqual(rendered, expected)
+    
+    def test_order_list_endpoints_match_order_serializer(self):
+        """Test current, history and the dashboard's recent orders against OrderSerializer"""
+        client = APIClient()
+        client.force_authenticate(self.customer)
+        orders = Order.objects.filter(user=self.customer).order_by('-created_at', '-id')
+        for url, statuses in [('/api/orders/current/', Order.ACTIVE_STATUSES),
+                              ('/api/orders/history/', Order.HISTORY_STATUSES)]:
+            with self.subTest(url=url):
+                results = client.get(url, {'page_size': 2}).data['results']
+                expected = OrderSerializer(orders.filter(status__in=statuses)[:2], many=True).data
+                self.assertEqual(JSONRenderer().render(results), JSONRenderer().render(expected))
+        recent = client.get('/api/dashboard/stats/').data['recent_orders']
+        self.assertEqual(JSONRenderer().render(recent),
+                         JSONRenderer().render(OrderSerializer(Order.objects.filter(user=self.customer)[:5], many=True).data))
+
+
+@skipUnless(renderers.orjson and renderers.msgpack, 'orjson and msgpack are not installed')
+class RendererTestCase(TestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user(username='enc@test.com', email='enc@test.com', password='testpass123')
+        self.cake = MenuItem.objects.create(name="Opéra Cake", price=Decimal('12.50'), category="cake")
+        for n in range(3):
+            order = Order.objects.create(user=self.customer, order_id=f"ENC{n}", total_amount=Decimal('25.00'),
+                                         delivery_notes='Gate \u2028 code 42', confirmed_at=timezone.now())
+            OrderItem.objects.create(order=order, menu_item=self.cake, quantity=2, price=Decimal('12.50'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+    
+    def test_orjson_renders_exactly_like_json_renderer(self):
+        """Test that the orjson renderer's bytes match JSONRenderer's for API data"""
+        data = {
+            'orders': OrderSerializer(Order.objects.filter(user=self.customer), many=True).data,
+            'day': date(2026, 3, 1),
+            'at': timezone.now(),
+            'counts': {1: 2},
+        }
+        self.assertEqual(renderers.ORJSONRenderer().render(data), JSONRenderer().render(data))
+        # Indented output falls back to the stdlib
+        self.assertEqual(renderers.ORJSONRenderer().render(data, 'application/json; indent=4'),
+                         JSONRenderer().render(data, 'application/json; indent=4'))
+    
+    def test_decimals_and_datetimes_are_encoded_as_the_json_api_does(self):
+        """Test that Decimals stay exact strings and datetimes are DRF's ISO strings"""
+        data = {'price': Decimal('0.10'), 'at': datetime(2026, 3, 1, 9, 30, 15, 123456, tzinfo=dt_timezone.utc)}
+        expected = {'price': '0.10', 'at': '2026-03-01T09:30:15.123456Z'}
+        self.assertEqual(json.loads(renderers.ORJSONRenderer().render(data)), expected)
+        self.assertEqual(renderers.msgpack.unpackb(renderers.MessagePackRenderer().render(data)), expected)
+    
+    def test_msgpack_is_served_only_when_asked_for(self):
+        """Test content negotiation: JSON by default, MessagePack by Accept or ?format="""
+        default = self.client.get('/api/orders/')
+        self.assertEqual(default['Content-Type'], 'application/json')
+        for response in [self.client.get('/api/orders/', HTTP_ACCEPT='application/msgpack'),
+                         self.client.get('/api/orders/', {'format': 'msgpack'})]:
+            self.assertEqual(response['Content-Type'], 'application/msgpack')
+            self.assertEqual(renderers.msgpack.unpackb(response.content)['results'], json.loads(default.content)['results'])
+    
+    def test_parsers(self):
+        """Test MessagePack and orjson request bodies, and malformed ones"""
+        body = {'items': [{'menu_item_id': self.cake.id, 'quantity': 2}]}
+        response = self.client.post('/api/cart/quote/', renderers.msgpack.packb(body), content_type='application/msgpack')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['subtotal'], '25.00')
+        bad = self.client.post('/api/cart/quote/', b'\xc1', content_type='application/msgpack')
+        self.assertEqual(bad.status_code, 400)
+        
+        parser = renderers.ORJSONParser()
+        self.assertEqual(parser.parse(BytesIO(json.dumps(body).encode())), body)
+        with self.assertRaises(ParseError):
+            parser.parse(BytesIO(b'{"items": NaN}'))
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class AuthCacheTestCase(TestCase):
+    def setUp(self):
+        caches['auth'].clear()
+        auth_cache.reset_auth_cache_stats()
+        self.user = User.objects.create_user(username='auth@test.com', email='auth@test.com', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+    
+    def test_cached_token_and_profile_need_no_queries(self):
+        """Test that a repeated token request skips the token, user and profile lookups"""
+        self.client.get('/api/profiles/me/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/profiles/me/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.patch('/api/profiles/me/', {'city': 'Pune'}, format='json').status_code, 200)
+        self.assertEqual(self.client.get('/api/profiles/me/').data['city'], 'Pune')
+        
+        stats = auth_cache.auth_cache_stats()
+        self.assertEqual(stats['token'], {'hits': 3, 'misses': 1, 'hit_rate': 0.75})
+        self.assertEqual(stats['profile']['misses'], 2)
+    
+    def test_profile_update_does_not_write_back_a_stale_copy(self):
+        """Test that PATCH on profiles/me keeps fields changed since the profile was cached"""
+        self.client.get('/api/profiles/me/')
+        # Changed elsewhere (another worker's cache, a bulk update) without invalidating this one
+        UserProfile.objects.filter(user=self.user).update(phone='9876543210')
+        self.assertEqual(self.client.patch('/api/profiles/me/', {'city': 'Pune'}, format='json').status_code, 200)
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertEqual((profile.phone, profile.city), ('9876543210', 'Pune'))
+    
+    def test_user_update_does_not_write_back_a_stale_copy(self):
+        """Test that PATCH on auth/user keeps a staff revocation and password change made since caching"""
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        auth_cache.user_changed(self.user.pk)
+        self.client.get('/api/auth/user/')
+        # Changed elsewhere (another worker) without invalidating this worker's cache
+        User.objects.filter(pk=self.user.pk).update(is_staff=False, password='md5$new$hash')
+        response = self.client.patch('/api/auth/user/', {'first_name': 'Priya'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        user = User.objects.get(pk=self.user.pk)
+        self.assertEqual((user.first_name, user.is_staff, user.password), ('Priya', False, 'md5$new$hash'))
+    
+    def test_logout_and_user_changes_invalidate(self):
+        """Test logout, staff flag and active flag changes take effect on the next request"""
+        self.assertEqual(self.client.get('/api/reports/sales/').status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.client.get('/api/reports/sales/').status_code, 200)
+        stats = self.client.get('/api/auth/cache-stats/').data
+        self.assertEqual((stats['user']['hits'], stats['user']['misses']), (1, 1))
+        
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/auth/user/').status_code, 403)
+        self.user.is_active = True
+        self.user.save()
+        self.assertEqual(self.client.post('/api/auth/logout/').status_code, 200)
+        self.assertEqual(self.client.get('/api/auth/user/').status_code, 403)
+    
+    def test_sessions(self):
+        """Test cached session requests, and that password changes and logout end them"""
+        client = APIClient()
+        client.login(username='auth@test.com', password='testpass123')
+        client.get('/api/auth/user/')
+        with self.assertNumQueries(0):
+            self.assertEqual(client.get('/api/auth/user/').data['email'], 'auth@test.com')
+        
+        self.user.set_password('newpass456')
+        self.user.save()
+        self.assertEqual(client.get('/api/auth/user/').status_code, 403)
+        
+        client.login(username='auth@test.com', password='newpass456')
+        self.assertEqual(client.get('/api/auth/user/').status_code, 200)
+        client.get('/logout/')
+        self.assertEqual(client.get('/api/auth/user/').status_code, 403)
+
+
+@override_settings(ASYNC_API=True)
+class AsyncApiTestCase(TestCase):
+    def setUp(self):
+        caches['auth'].clear()
+        cache.clear()
+        self.customer = User.objects.create_user(username='async@test.com', email='async@test.com', password='testpass123')
+        self.token = Token.objects.create(user=self.customer)
+        self.cake = MenuItem.objects.create(name="Async Cake", price=Decimal('12.50'), category="cake")
+        MenuItem.objects.create(name="Async Bun", price=3, category="bun")
+        MenuItem.objects.create(name="Hidden Tart", price=4, category="tart", available=False)
+        for n, status in enumerate(['pending', 'confirmed', 'delivered', 'cancelled']):
+            order = Order.objects.create(user=self.customer, order_id=f"ASY{n}", status=status, total_amount=Decimal('25.00'))
+            OrderItem.objects.create(order=order, menu_item=self.cake, quantity=2, price=Decimal('12.50'))
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.factory = AsyncRequestFactory()
+    
+    def call(self, view, path, method='get', **kwargs):
+        """Run an async view on a request for path, as the ASGI handler would"""
+        request = getattr(self.factory, method)(path, headers={'Authorization': f'Token {self.token.key}'})
+        response = async_to_sync(view)(request, **kwargs)
+        response.render()
+        return response
+    
+    def test_views_are_async_only_when_enabled(self):
+        """Test that GET actions with a twin get coroutine views, and only with ASYNC_API on"""
+        self.assertTrue(asyncio.iscoroutinefunction(MenuItemViewSet.as_view({'get': 'list'})))
+        self.assertFalse(asyncio.iscoroutinefunction(OrderViewSet.as_view({'get': 'list'})))
+        self.assertTrue(asyncio.iscoroutinefunction(async_get_view(dashboard_stats_api, adashboard_stats)))
+        with self.settings(ASYNC_API=False):
+            self.assertFalse(asyncio.iscoroutinefunction(MenuItemViewSet.as_view({'get': 'list'})))
+            self.assertIs(async_get_view(dashboard_stats_api, adashboard_stats), dashboard_stats_api)
+    
+    @override_settings(DEBUG=True)
+    def test_asgi_middleware_stack_stays_async(self):
+        """Test that no middleware makes the ASGI handler run requests through async_to_sync"""
+        read_only = [*settings.MIDDLEWARE[:1], 'bakery.db_routing.ReadOnlyRequestMiddleware', *settings.MIDDLEWARE[1:]]
+        for middleware in [settings.MIDDLEWARE, read_only]:
+            with self.subTest(middleware=middleware), self.settings(MIDDLEWARE=middleware):
+                with self.assertNoLogs('django.request', 'DEBUG'):
+                    handler = ASGIHandler()
+                self.assertTrue(iscoroutinefunction(handler._middleware_chain))
+        response = async_to_sync(AsyncClient().get)('/api/menu-items/', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(response.status_code, 200)
+    
+    def test_menu_matches_sync_views(self):
+        """Test the async menu list, item, 404 and categories against the sync responses"""
+        menu_list = MenuItemViewSet.as_view({'get': 'list', 'post': 'create'})
+        for path in ['/api/menu-items/', '/api/menu-items/?category=cake', '/api/menu-items/?search=bun']:
+            with self.subTest(path=path):
+                cache.clear()
+                expected = self.client.get(path).content
+                cache.clear()
+                self.assertEqual(self.call(menu_list, path).content, expected)
+        
+        detail = MenuItemViewSet.as_view({'get': 'retrieve'})
+        path = f'/api/menu-items/{self.cake.id}/'
+        self.assertEqual(self.call(detail, path, pk=self.cake.id).content, self.client.get(path).content)
+        hidden = MenuItem.objects.get(name="Hidden Tart")
+        for pk in [hidden.id, 'abc']:
+            self.assertEqual(self.call(detail, f'/api/menu-items/{pk}/', pk=pk).status_code, 404)
+        
+        categories = MenuItemViewSet.as_view({'get': 'categories'})
+        response = self.call(categories, '/api/menu-items/categories/')
+        self.assertEqual(json.loads(response.content), {'categories': ['bun', 'cake']})
+        self.assertEqual(response['ETag'], self.client.get('/api/menu-items/categories/')['ETag'])
+        
+        # Writes on the same URL still run the sync action (admin only)
+        self.assertEqual(self.call(menu_list, '/api/menu-items/', method='post').status_code, 403)
+    
+    def test_orders_and_dashboard_match_sync_views(self):
+        """Test the async current, history and dashboard responses against the sync ones"""
+        for action in ['current', 'history']:
+            with self.subTest(action=action):
+                view = OrderViewSet.as_view({'get': action})
+                path = f'/api/orders/{action}/?page_size=1'
+                self.assertEqual(self.call(view, path).content, self.client.get(path).content)
+        
+        dashboard = async_get_view(dashboard_stats_api, adashboard_stats)
+        self.assertEqual(self.call(dashboard, '/api/dashboard/stats/').content,
+                         self.client.get('/api/dashboard/stats/').content)
+        
+        anonymous = async_to_sync(dashboard)(AsyncRequestFactory().get('/api/dashboard/stats/'))
+        self.assertEqual(anonymous.status_code, 403)
+
+
+class FakeConnection:
+    """Just enough of a psycopg2 connection for ConnectionPool"""
+    
+    def __init__(self):
+        self.closed = 0
+        self.autocommit = True
+        self.in_transaction = False
+        self.broken = False
+        self.checks = 0
+    
+    def get_transaction_status(self):
+        return 2 if self.in_transaction else 0
+    
+    def rollback(self):
+        if self.broken:
+            raise OSError('server closed the connection')
+        self.in_transaction = False
+    
+    def cursor(self):
+        connection = self
+        
+        class Cursor:
+            def __enter__(self):
+                return self
+            
+            def __exit__(self, *exc):
+                return False
+            
+            def execute(self, sql):
+                connection.checks += 1
+                if connection.broken:
+                    raise OSError('server closed the connection')
+        return Cursor()
+    
+    def close(self):
+        self.closed = 1
+
+
+class ConnectionPoolTestCase(SimpleTestCase):
+    def make_pool(self, **kwargs):
+        self.opened = []
+        
+        def connect():
+            self.opened.append(FakeConnection())
+            return self.opened[-1]
+        return db_pool.ConnectionPool(connect, **{'max_size': 2, 'timeout': 0.2, 'check_after': 60, **kwargs})
+    
+    def test_checkouts_reuse_connections_and_wait_at_max_size(self):
+        """Test reuse, the size limit, waiting for a returned connection and timing out"""
+        pool = self.make_pool()
+        first = pool.getconn()
+        pool.putconn(first)
+        self.assertIs(pool.getconn(), first)
+        second = pool.getconn()
+        self.assertEqual(len(self.opened), 2)
+        
+        with self.assertRaises(db_pool.PoolTimeout):
+            pool.getconn()
+        threading.Timer(0.05, pool.putconn, [second]).start()
+        self.assertIs(pool.getconn(), second)
+        
+        stats = pool.get_stats()
+        self.assertEqual((stats['size'], stats['in_use'], stats['opened']), (2, 2, 2))
+        self.assertEqual((stats['checkouts'], stats['waits'], stats['timeouts']), (4, 1, 1))
+        self.assertGreater(stats['wait_ms_max'], 0)
+    
+    def test_health_checks_and_reset(self):
+        """Test that broken or mid-transaction connections are never handed out again"""
+        pool = self.make_pool(check_after=0)
+        conn = pool.getconn()
+        conn.in_transaction = True
+        pool.putconn(conn)
+        self.assertIs(pool.getconn(), conn)
+        self.assertFalse(conn.in_transaction)
+        self.assertEqual(conn.checks, 1)
+        
+        # Broken while idle: fails the SELECT 1 and is replaced
+        pool.putconn(conn)
+        conn.broken = True
+        replacement = pool.getconn()
+        self.assertIsNot(replacement, conn)
+        self.assertTrue(conn.closed)
+        # Returned mid-transaction and can't roll back: dropped
+        replacement.in_transaction = replacement.broken = True
+        pool.putconn(replacement)
+        stats = pool.get_stats()
+        self.assertEqual((stats['size'], stats['failed_checks'], stats['discarded']), (0, 1, 1))
+    
+    def test_fill_and_reap(self):
+        """Test that min_size connections are opened and idle ones are reaped down to min_size"""
+        pool = self.make_pool(min_size=1, max_size=3, max_idle=0)
+        pool.fill()
+        self.assertEqual(pool.get_stats()['idle'], 1)
+        conns = [pool.getconn() for _ in range(3)]
+        for conn in conns:
+            pool.putconn(conn)
+        pool.reap()
+        self.assertEqual(sum(not conn.closed for conn in conns), 1)
+        self.assertEqual(pool.get_stats()['size'], 1)
+        pool.close()
+        self.assertTrue(all(conn.closed for conn in conns))
+
+
+@skipUnless(connection.vendor == 'postgresql' and settings.DB_POOL, 'needs PostgreSQL with DB_POOL=True')
+class PooledPostgresTestCase(TransactionTestCase):
+    def test_connections_are_reused_across_requests(self):
+        """Test that closing Django's connection returns it to the pool for the next request"""
+        def backend_pid():
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_backend_pid()')
+                pid = cursor.fetchone()[0]
+            connection.close()
+            return pid
+        
+        db_pool.reset_pool_stats()
+        self.assertEqual(backend_pid(), backend_pid())
+        pool = connection.pool.get_stats()
+        self.assertEqual(pool['checkouts'], 2)
+        self.assertLessEqual(pool['size'], pool['max_size'])
+
+
+class TunedSqliteTestCase(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = f'{directory.name}/db.sqlite3'
+        pragmas = {'busy_timeout': 50, 'synchronous': 'NORMAL', 'mmap_size': 1 << 20}
+        self.connections = ConnectionHandler({
+            'default': {'ENGINE': 'bakery.tuned_sqlite', 'NAME': self.path, 'TRANSACTION_MODE': 'IMMEDIATE',
+                        'PRAGMAS': {'journal_mode': 'WAL', **pragmas}},
+            'read': {'ENGINE': 'bakery.tuned_sqlite', 'NAME': f'file:{self.path}?mode=ro', 'PRAGMAS': pragmas},
+        })
+        self.addCleanup(self.connections.close_all)
+    
+    def pragma(self, alias, name):
+        with self.connections[alias].cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+    
+    def test_pragmas_and_immediate_transactions(self):
+        """Test that the tuned connection is in WAL mode and takes the write lock when a transaction begins"""
+        default = self.connections['default']
+        self.assertEqual(self.pragma('default', 'journal_mode'), 'wal')
+        self.assertEqual((self.pragma('default', 'synchronous'), self.pragma('default', 'busy_timeout')), (1, 50))
+        with default.cursor() as cursor:
+            cursor.execute('CREATE TABLE bun (id integer PRIMARY KEY)')
+        
+        other = sqlite3.connect(self.path, timeout=0)
+        self.addCleanup(other.close)
+        with mock.patch.object(transaction, 'get_connection', lambda using=None: default), transaction.atomic():
+            # No write yet, but the write lock is already held
+            default.cursor().execute('SELECT COUNT(*) FROM bun')
+            with self.assertRaisesRegex(sqlite3.OperationalError, 'locked'):
+                other.execute('INSERT INTO bun DEFAULT VALUES')
+            # ...while readers carry on (WAL)
+            self.assertEqual(other.execute('SELECT COUNT(*) FROM bun').fetchone(), (0,))
+    
+    def test_read_connection_is_read_only(self):
+        """Test that the read-only connection sees committed rows and can't write"""
+        with self.connections['default'].cursor() as cursor:
+            cursor.execute('CREATE TABLE bun (id integer PRIMARY KEY)')
+            cursor.execute('INSERT INTO bun DEFAULT VALUES')
+        with self.connections['read'].cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM bun')
+            self.assertEqual(cursor.fetchone(), (1,))
+            with self.assertRaisesRegex(OperationalError, 'readonly'):
+                cursor.execute('INSERT INTO bun DEFAULT VALUES')
+    
+    @override_settings(READ_DATABASE='read')
+    def test_router_sends_only_safe_request_reads_to_the_read_connection(self):
+        """Test routing for GET, POST, GETs inside a transaction and writes"""
+        router = ReadOnlyRequestRouter()
+        
+        def route(request):
+            return ReadOnlyRequestMiddleware(lambda request: router.db_for_read(MenuItem))(request)
+        
+        factory = RequestFactory()
+        self.assertEqual(route(factory.get('/api/menu-items/')), 'read')
+        self.assertIsNone(route(factory.post('/api/orders/')))
+        self.assertIsNone(router.db_for_read(MenuItem))
+        with mock.patch.object(connections['default'], 'in_atomic_block', True):
+            self.assertIsNone(route(factory.get('/api/orders/current/')))
+        self.assertEqual(router.db_for_write(MenuItem, instance=MenuItem()), 'default')
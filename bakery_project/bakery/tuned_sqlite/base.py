@@ -0,0 +1,21 @@
+"""
+SQLite backend for concurrent requests (settings.py sets it when SQLITE_TUNED=True)
+
+Every connection applies the database's PRAGMAS (WAL, busy_timeout, ...).
+Transactions begin with TRANSACTION_MODE: IMMEDIATE for the read-write
+connection, so a checkout takes the write lock up front and waits for it,
+instead of reading under a deferred BEGIN and failing with "database is
+locked" when it upgrades to a write while another writer holds the lock.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.settings_dict.get('PRAGMAS', {}).items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.settings_dict.get("TRANSACTION_MODE", "DEFERRED")}')
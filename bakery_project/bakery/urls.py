@@ -9,6 +9,8 @@ urlpatterns = [
     path('cart/', views.cart_view, name='cart'),
     path('checkout/', views.cart_view, name='checkout'),
     path('orders/', views.orders_view, name='orders'),
+    path('orders/history/', views.order_history_page, name='order_history_page'),
+    path('orders/stream/', views.order_status_stream, name='order_status_stream'),
     path('payment/', views.payment_view, name='payment'),
     path('upi-payment/', views.upi_payment_view, name='upi_payment'),
     path('login/', views.login_view, name='login'),
@@ -3,43 +3,44 @@ from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.contrib import messages
-from django.db.models import Prefetch
-from .models import MenuItem, Order, OrderItem, Payment, UserProfile
+from django.db import transaction
+from django.db.models import Prefetch, Q
+from django.conf import settings
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from asgiref.sync import sync_to_async
+from .models import MenuItem, Order, UserProfile
+from .pricing import CartError, price_cart
+from .checkout import place_order
+from .jobs import enqueue
+from .tasks import delete_payment_screenshot, store_payment_screenshot
+from .events import order_event_stream
+from .stats import get_user_stats
+from .pagination import decode_cursor, encode_cursor, keyset_page
 import json
-import uuid
 from django.utils import timezone
-from decimal import Decimal
 
 
 # Utility function to handle cart processing
 def process_cart_items(cart_data):
-    """Process cart data and return valid order items with total amount"""
+    """Price cart data server-side and return (quote, error)"""
     cart = json.loads(cart_data)
     if not cart:
-        return None, None, "Cart is empty"
+        return None, "Cart is empty"
     
-    total_amount = Decimal('0.00')
-    order_items = []
-    
-    for item_id, item_data in cart.items():
-        try:
-            menu_item = MenuItem.objects.get(id=int(item_id))
-            quantity = int(item_data.get('quantity', 0))
-            if quantity > 0:
-                subtotal = menu_item.price * quantity
-                total_amount += subtotal
-                order_items.append({
-                    'menu_item': menu_item,
-                    'quantity': quantity,
-                    'price': menu_item.price
-                })
-        except (MenuItem.DoesNotExist, ValueError):
-            continue
+    try:
+        quote = price_cart(
+            (item_id, item_data.get('quantity', 0)) for item_id, item_data in cart.items()
+        )
+    except (CartError, AttributeError):
+        return None, "Invalid cart data"
     
-    if not order_items:
-        return None, None, "No valid items in cart"
+    if quote.unavailable:
+        return None, "Some items in your cart are no longer available"
+    if not quote.lines:
+        return None, "No valid items in cart"
     
-    return order_items, total_amount, None
+    return quote, None
 
 
 # Simple template views
@@ -65,36 +66,90 @@ def cart_view(request):
     return render(request, 'bakery/cart.html')
 
 
+def user_orders(user):
+    """A user's orders with everything the order cards render"""
+    return Order.objects.filter(user=user).select_related('payment').prefetch_related('items__menu_item')
+
+
+def history_page_size():
+    return getattr(settings, 'ORDER_HISTORY_PAGE_SIZE', 10)
+
+
 @login_required
 def orders_view(request):
-    """Display user-specific orders - only orders belonging to the logged-in user"""
-    # Optimized query with prefetch to reduce database hits
-    orders_queryset = Order.objects.filter(user=request.user).select_related(
-        'payment'
-    ).prefetch_related(
-        'items__menu_item'
-    ).order_by('-created_at')
+    """Display user-specific orders - only orders belonging to the logged-in user.
+    
+    Active orders and the first page of history come from one order query
+    (plus its two prefetches) and are split in memory; counts come from the
+    user's stats row. The number of queries doesn't grow with order count.
+    """
+    page_size = history_page_size()
+    first_history_page = Order.objects.filter(
+        user=request.user, status__in=Order.HISTORY_STATUSES
+    ).order_by('-created_at', '-id').values('id')[:page_size + 1]
     
-    # Get current active orders
-    current_orders = orders_queryset.filter(status__in=['pending', 'confirmed', 'preparing', 'ready'])
+    orders = user_orders(request.user).filter(
+        Q(status__in=Order.ACTIVE_STATUSES) | Q(id__in=first_history_page)
+    ).order_by('-created_at', '-id')
     
-    # Get order history
-    order_history = orders_queryset.filter(status__in=['delivered', 'cancelled'])
+    current_orders, order_history = [], []
+    for order in orders:
+        (current_orders if order.status in Order.ACTIVE_STATUSES else order_history).append(order)
     
-    # Calculate statistics
-    total_orders = orders_queryset.count()
-    delivered_orders = orders_queryset.filter(status='delivered').count()
+    has_more_history = len(order_history) > page_size
+    order_history = order_history[:page_size]
+    
+    # Statistics come from the incrementally maintained stats row
+    stats = get_user_stats(request.user)
     
     context = {
         'current_orders': current_orders,
         'order_history': order_history,
-        'total_orders': total_orders,
-        'delivered_orders': delivered_orders,
+        'history_count': stats.completed_orders + stats.cancelled_orders,
+        'history_cursor': encode_cursor(order_history[-1]) if has_more_history else '',
+        'total_orders': stats.total_orders,
+        'delivered_orders': stats.completed_orders,
         'user_full_name': request.user.get_full_name() or request.user.username
     }
     return render(request, 'bakery/orders.html', context)
 
 
+@login_required
+def order_history_page(request):
+    """Next page of order history cards, loaded by the orders page"""
+    cursor = request.GET.get('cursor')
+    try:
+        position = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise Http404('Invalid cursor')
+    
+    orders, has_next = keyset_page(
+        user_orders(request.user).filter(status__in=Order.HISTORY_STATUSES), position, history_page_size()
+    )
+    response = render(request, 'bakery/order_cards.html', {'orders': orders, 'history': True})
+    response['X-Next-Cursor'] = encode_cursor(orders[-1]) if has_next else ''
+    return response
+
+
+async def order_status_stream(request):
+    """Server-sent events with live status changes for the user's orders"""
+    user = await sync_to_async(lambda: request.user if request.user.is_authenticated else None)()
+    if user is None:
+        return HttpResponse(status=401)
+    if not isinstance(request, ASGIRequest):
+        # Under WSGI each open stream would pin a worker; 204 tells EventSource to stop
+        return HttpResponse(status=204)
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    response = StreamingHttpResponse(
+        order_event_stream(user.id, int(last_event_id) if last_event_id and last_event_id.isdigit() else None),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @login_required
 def payment_view(request):
     return render(request, 'bakery/payment.html')
@@ -120,44 +175,32 @@ def upi_payment_view(request):
     
     try:
         # Process cart items
-        order_items, total_amount, error = process_cart_items(cart_data)
+        quote, error = process_cart_items(cart_data)
         if error:
             messages.error(request, error)
             return redirect('cart')
         
-        # Create order
-        order_id = f"ORD-{uuid.uuid4().hex[:8].upper()}"
-        order = Order.objects.create(
-            user=request.user,
-            order_id=order_id,
-            status='pending',
-            total_amount=total_amount,
-            delivery_address=delivery_address,
-            delivery_phone=delivery_phone,
-            delivery_notes=delivery_notes
-        )
-        
-        # Create order items
-        OrderItem.objects.bulk_create([
-            OrderItem(
-                order=order,
-                menu_item=item['menu_item'],
-                quantity=item['quantity'],
-                price=item['price']
-            ) for item in order_items
-        ])
-        
-        # Create payment record
-        transaction_id = f"TXN-{uuid.uuid4().hex[:12].upper()}"
-        Payment.objects.create(
-            order=order,
-            payment_method='upi',
-            payment_status='pending',
-            transaction_id=transaction_id,
-            amount=order.grand_total,
-            upi_id=upi_transaction_id,
-            payment_screenshot=payment_screenshot
-        )
+        # Create order, items and payment in one transaction; the screenshot
+        # goes to media storage first and a background job verifies it
+        screenshot_name = store_payment_screenshot(payment_screenshot)
+        try:
+            with transaction.atomic():
+                order = place_order(
+                    request.user,
+                    quote,
+                    delivery_address=delivery_address,
+                    delivery_phone=delivery_phone,
+                    delivery_notes=delivery_notes,
+                    payment_method='upi',
+                    upi_id=upi_transaction_id,
+                    payment_screenshot=screenshot_name
+                )
+                enqueue('verify_payment_screenshot', payment_id=order.payment.id)
+        except Exception:
+            # No order refers to the screenshot
+            delete_payment_screenshot(screenshot_name)
+            raise
+        order_id = order.order_id
         
         success_message = f'Order placed successfully! Order ID: {order_id}. Your payment will be verified within 24 hours.'
         messages.success(request, success_message)
@@ -9,6 +9,16 @@ try:
 except ImportError:
     dj_database_url = None
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = os.environ.get('SECRET_KEY', 'django-insecure-your-secret-key-here-change-in-production')
 
@@ -40,7 +50,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # Add WhiteNoise for static files
+    'bakery.middleware.AsyncWhiteNoiseMiddleware',  # WhiteNoise for static files, sync or async
+    'bakery.middleware.StaticSnapshotMiddleware',  # Pre-rendered public pages for anonymous visitors
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -80,10 +91,93 @@ else:
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
-            'NAME': BASE_DIR / 'db.sqlite3',
+            'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
         }
     }
 
+# Connection pool per worker process for PostgreSQL (see bakery/db_pool.py).
+# Connections go back to the pool after every request, so CONN_MAX_AGE is 0.
+DB_POOL = os.environ.get('DB_POOL', 'False') == 'True'
+if DB_POOL and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    DATABASES['default'].update({
+        'ENGINE': 'bakery.pooled_postgresql',
+        'CONN_MAX_AGE': 0,
+        'POOL': {
+            'MIN_SIZE': int(os.environ.get('DB_POOL_MIN_SIZE', '2')),
+            'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', '10')),
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', '10')),  # wait for a free connection
+            'MAX_IDLE': float(os.environ.get('DB_POOL_MAX_IDLE', '300')),  # then closed, down to MIN_SIZE
+            'CHECK_AFTER': float(os.environ.get('DB_POOL_CHECK_AFTER', '30')),  # idle time before SELECT 1
+        },
+    })
+
+# SQLite tuned for concurrent requests on local and single-box deployments
+# (see bakery/tuned_sqlite): WAL, immediate write transactions, and GET
+# requests reading through a separate read-only connection (bakery/db_routing.py)
+SQLITE_TUNED = os.environ.get('SQLITE_TUNED', 'False') == 'True'
+READ_DATABASE = None
+if SQLITE_TUNED and DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    sqlite_pragmas = {
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', '10000')),  # ms to wait for the write lock
+        'synchronous': 'NORMAL',  # fsync at checkpoints only; safe with WAL
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),
+    }
+    DATABASES['default'].update({
+        'ENGINE': 'bakery.tuned_sqlite',
+        'TRANSACTION_MODE': 'IMMEDIATE',
+        'PRAGMAS': {'journal_mode': 'WAL', **sqlite_pragmas},
+    })
+    if os.environ.get('SQLITE_READ_CONNECTION', 'True') == 'True':
+        DATABASES['read'] = {
+            'ENGINE': 'bakery.tuned_sqlite',
+            'NAME': f"file:{DATABASES['default']['NAME']}?mode=ro",
+            'PRAGMAS': sqlite_pragmas,
+            'TEST': {'MIRROR': 'default'},
+        }
+        READ_DATABASE = 'read'
+        DATABASE_ROUTERS = ['bakery.db_routing.ReadOnlyRequestRouter']
+        MIDDLEWARE.insert(1, 'bakery.db_routing.ReadOnlyRequestMiddleware')
+
+# Cache configuration
+# Local memory by default; point REDIS_URL at a shared Redis so catalog
+# invalidations reach every worker process.
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'bakery-cache',
+        }
+    }
+
+# Token/session -> user and user -> profile lookups, cached per worker (see
+# bakery/auth_cache.py). A logout or password change reaches the other
+# workers within AUTH_CACHE_TIMEOUT seconds.
+AUTH_CACHE_TIMEOUT = int(os.environ.get('AUTH_CACHE_TIMEOUT', '30'))
+CACHES['auth'] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'bakery-auth',
+    'OPTIONS': {'MAX_ENTRIES': 20000},
+}
+SESSION_ENGINE = 'bakery.auth_cache'
+# ModelBackend stays listed so sessions logged in before the cached backend
+# keep working until they expire
+AUTHENTICATION_BACKENDS = [
+    'bakery.auth_cache.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+# Seconds a cached menu API response lives (entries are also dropped
+# immediately whenever the menu catalog changes)
+MENU_CACHE_TIMEOUT = int(os.environ.get('MENU_CACHE_TIMEOUT', '300'))
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -109,18 +203,75 @@ MEDIA_ROOT = BASE_DIR / 'media'
 if not DEBUG:
     STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# Static snapshots of the public pages (see bakery/snapshots.py)
+SNAPSHOTS_ENABLED = os.environ.get('SNAPSHOTS_ENABLED', str(not DEBUG)) == 'True'
+SNAPSHOT_ROOT = BASE_DIR / 'snapshots'
+SNAPSHOT_MAX_AGE = 60
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# API encoders (see bakery/renderers.py): API_ORJSON=True encodes and parses
+# application/json with orjson; MessagePack is offered to clients that ask for
+# application/msgpack whenever msgpack is installed
+API_ORJSON = orjson is not None and os.environ.get('API_ORJSON', 'False') == 'True'
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
+        'bakery.auth_cache.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'bakery.renderers.ORJSONRenderer' if API_ORJSON else 'rest_framework.renderers.JSONRenderer',
+        *(['bakery.renderers.MessagePackRenderer'] if msgpack else []),
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'bakery.renderers.ORJSONParser' if API_ORJSON else 'rest_framework.parsers.JSONParser',
+        *(['bakery.renderers.MessagePackParser'] if msgpack else []),
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+# Serve the read-heavy API endpoints from their async twins (bakery/async_api.py).
+# Opt in under an ASGI server only; WSGI servers need the plain sync views
+ASYNC_API = os.environ.get('ASYNC_API', 'False') == 'True'
+
+# Keyset pagination for the order and payment APIs (?page_size= is capped at the max)
+API_PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE', '20'))
+API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', '100'))
+
+# Order history cards per page on the orders page ("Load More Orders")
+ORDER_HISTORY_PAGE_SIZE = 10
+
+# Admin changelists show the database's row estimate instead of an exact
+# COUNT(*) once a list has more rows than this
+ADMIN_EXACT_COUNT_LIMIT = 100000
+
+# Idempotency-Key handling for order and payment creation (seconds)
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+IDEMPOTENCY_WAIT_TIMEOUT = 10
+IDEMPOTENCY_LOCK_TIMEOUT = 60
+
+# Background jobs (manage.py run_workers). With JOBS_ASYNC=False jobs run
+# inline in the request, for deployments without a worker process.
+JOBS_ASYNC = os.environ.get('JOBS_ASYNC', 'True') == 'True'
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BASE_DELAY = 5
+JOB_LEASE_SECONDS = 600
+
+# Live order status stream (/orders/stream/, served by asgi.py; seconds)
+ORDER_EVENTS_POLL_INTERVAL = 1.0
+ORDER_EVENTS_KEEPALIVE = 15
+ORDER_EVENTS_MAX_AGE = 300
+ORDER_EVENTS_RETENTION_HOURS = 24
+
+# Flat delivery fee charged on every order (must match the cart page)
+DELIVERY_FEE = os.environ.get('DELIVERY_FEE', '50.00')
+
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'